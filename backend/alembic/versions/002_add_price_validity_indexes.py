@@ -0,0 +1,48 @@
+"""Add point-in-time indexes for base and customer prices
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    # Price valid at a given moment: product_id = ? AND valid_from <= ? ORDER BY valid_from DESC
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_product_base_prices_product_valid_from
+        ON product_base_prices(product_id, valid_from)
+    """))
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_customer_product_prices_product_customer_valid_from
+        ON customer_product_prices(product_id, customer_id, valid_from)
+    """))
+
+    # Currently open price periods (valid_to IS NULL), used when closing prices on write
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_product_base_prices_open
+        ON product_base_prices(product_id)
+        WHERE valid_to IS NULL
+    """))
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_customer_product_prices_open
+        ON customer_product_prices(product_id, customer_id)
+        WHERE valid_to IS NULL
+    """))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_customer_product_prices_open', table_name='customer_product_prices')
+    op.drop_index('ix_product_base_prices_open', table_name='product_base_prices')
+    op.drop_index('ix_customer_product_prices_product_customer_valid_from', table_name='customer_product_prices')
+    op.drop_index('ix_product_base_prices_product_valid_from', table_name='product_base_prices')
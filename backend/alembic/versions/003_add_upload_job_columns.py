@@ -0,0 +1,38 @@
+"""Add background job columns to upload_history
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        ALTER TABLE upload_history
+            ADD COLUMN IF NOT EXISTS storage_path VARCHAR(500),
+            ADD COLUMN IF NOT EXISTS rows_total INTEGER,
+            ADD COLUMN IF NOT EXISTS rows_processed INTEGER DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS result JSON,
+            ADD COLUMN IF NOT EXISTS worker_id VARCHAR(100),
+            ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE
+    """))
+
+    # Startup scan for jobs to resume
+    connection.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_upload_history_status ON upload_history(status)"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_upload_history_status', table_name='upload_history')
+    for column in ['heartbeat_at', 'worker_id', 'result', 'rows_processed', 'rows_total', 'storage_path']:
+        op.drop_column('upload_history', column)
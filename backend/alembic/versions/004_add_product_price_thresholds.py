@@ -0,0 +1,54 @@
+"""Add precomputed product price thresholds
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS product_price_thresholds (
+            product_id INTEGER PRIMARY KEY REFERENCES products(id),
+            industry_id INTEGER NOT NULL REFERENCES industries(id),
+            base_price_id INTEGER NOT NULL REFERENCES product_base_prices(id),
+            lc DOUBLE PRECISION NOT NULL,
+            production_factor DOUBLE PRECISION NOT NULL,
+            threshold DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """))
+
+    connection.execute(sa.text(
+        "CREATE INDEX IF NOT EXISTS ix_product_price_thresholds_industry_id ON product_price_thresholds(industry_id)"
+    ))
+
+    # Populate from the currently open base prices
+    connection.execute(sa.text("""
+        INSERT INTO product_price_thresholds (product_id, industry_id, base_price_id, lc, production_factor, threshold)
+        SELECT DISTINCT ON (bp.product_id)
+            bp.product_id, p.industry_id, bp.id, bp.lc,
+            COALESCE(f.production_factor, 1.20), bp.lc * COALESCE(f.production_factor, 1.20)
+        FROM product_base_prices bp
+        JOIN products p ON p.id = bp.product_id
+        LEFT JOIN industry_production_factors f ON f.industry_id = p.industry_id
+        WHERE bp.valid_to IS NULL
+        ORDER BY bp.product_id, bp.valid_from DESC
+        ON CONFLICT (product_id) DO NOTHING
+    """))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_price_thresholds_industry_id', table_name='product_price_thresholds')
+    op.drop_table('product_price_thresholds')
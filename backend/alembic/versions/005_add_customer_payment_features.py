@@ -0,0 +1,76 @@
+"""Add customer payment feature store
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS customer_payment_features (
+            id SERIAL PRIMARY KEY,
+            customer_id INTEGER NOT NULL REFERENCES customers(id),
+            as_of_date DATE NOT NULL,
+            payment_count INTEGER NOT NULL DEFAULT 0,
+            amount_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            delay_count INTEGER NOT NULL DEFAULT 0,
+            delay_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            delay_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+            on_time_count INTEGER NOT NULL DEFAULT 0,
+            late_count INTEGER NOT NULL DEFAULT 0,
+            very_late_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """))
+
+    connection.execute(sa.text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_customer_payment_features_customer_as_of
+        ON customer_payment_features(customer_id, as_of_date)
+    """))
+
+    # Backfill: running totals over each customer's payment days
+    connection.execute(sa.text("""
+        INSERT INTO customer_payment_features (
+            customer_id, as_of_date, payment_count, amount_sum, delay_count, delay_sum,
+            delay_sum_sq, on_time_count, late_count, very_late_count
+        )
+        SELECT
+            customer_id, payment_date,
+            SUM(payment_count) OVER w, SUM(amount_sum) OVER w, SUM(delay_count) OVER w,
+            SUM(delay_sum) OVER w, SUM(delay_sum_sq) OVER w, SUM(on_time_count) OVER w,
+            SUM(late_count) OVER w, SUM(very_late_count) OVER w
+        FROM (
+            SELECT
+                i.customer_id, p.payment_date,
+                COUNT(*) AS payment_count,
+                SUM(p.amount) AS amount_sum,
+                COUNT(p.delay_days) AS delay_count,
+                COALESCE(SUM(p.delay_days), 0) AS delay_sum,
+                COALESCE(SUM(p.delay_days * p.delay_days), 0) AS delay_sum_sq,
+                SUM(CASE WHEN p.delay_days <= 0 THEN 1 ELSE 0 END) AS on_time_count,
+                SUM(CASE WHEN p.delay_days > 0 THEN 1 ELSE 0 END) AS late_count,
+                SUM(CASE WHEN p.delay_days > 30 THEN 1 ELSE 0 END) AS very_late_count
+            FROM payments p
+            JOIN invoices i ON i.id = p.invoice_id
+            GROUP BY i.customer_id, p.payment_date
+        ) daily
+        WINDOW w AS (PARTITION BY customer_id ORDER BY payment_date)
+        ON CONFLICT (customer_id, as_of_date) DO NOTHING
+    """))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_customer_payment_features_customer_as_of', table_name='customer_payment_features')
+    op.drop_table('customer_payment_features')
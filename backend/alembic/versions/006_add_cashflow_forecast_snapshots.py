@@ -0,0 +1,43 @@
+"""Add cash flow forecast snapshots
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS cashflow_forecast_snapshots (
+            id SERIAL PRIMARY KEY,
+            kind VARCHAR(20) NOT NULL,
+            ml_model_id INTEGER NOT NULL REFERENCES ml_models(id),
+            model_version VARCHAR(50) NOT NULL,
+            as_of_date DATE NOT NULL,
+            horizon_days INTEGER NOT NULL,
+            granularity VARCHAR(10) NOT NULL,
+            payload JSON NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """))
+
+    connection.execute(sa.text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_cashflow_forecast_snapshots_key
+        ON cashflow_forecast_snapshots(kind, ml_model_id, as_of_date, horizon_days, granularity)
+    """))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cashflow_forecast_snapshots_key', table_name='cashflow_forecast_snapshots')
+    op.drop_table('cashflow_forecast_snapshots')
@@ -0,0 +1,45 @@
+"""Add denormalized current prediction to invoices
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("ALTER TABLE invoices ADD COLUMN IF NOT EXISTS current_prediction_id INTEGER"))
+    connection.execute(sa.text("ALTER TABLE invoices ADD COLUMN IF NOT EXISTS current_risk_score DOUBLE PRECISION"))
+
+    connection.execute(sa.text(
+        "CREATE INDEX IF NOT EXISTS ix_invoices_status_current_risk ON invoices(status, current_risk_score)"
+    ))
+
+    # Backfill from the latest prediction of each invoice
+    connection.execute(sa.text("""
+        UPDATE invoices i
+        SET current_prediction_id = latest.id,
+            current_risk_score = latest.risk_score
+        FROM (
+            SELECT DISTINCT ON (invoice_id) id, invoice_id, risk_score
+            FROM predictions
+            ORDER BY invoice_id, created_at DESC, id DESC
+        ) latest
+        WHERE latest.invoice_id = i.id
+    """))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoices_status_current_risk', table_name='invoices')
+    op.drop_column('invoices', 'current_risk_score')
+    op.drop_column('invoices', 'current_prediction_id')
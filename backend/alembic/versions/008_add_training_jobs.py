@@ -0,0 +1,45 @@
+"""Add model training jobs
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    connection.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS training_jobs (
+            id SERIAL PRIMARY KEY,
+            model_type VARCHAR(100) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            error TEXT,
+            ml_model_id INTEGER REFERENCES ml_models(id),
+            worker_id VARCHAR(100),
+            heartbeat_at TIMESTAMP WITH TIME ZONE,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            started_at TIMESTAMP WITH TIME ZONE,
+            completed_at TIMESTAMP WITH TIME ZONE,
+            requested_by VARCHAR(100)
+        )
+    """))
+
+    connection.execute(sa.text("""
+        CREATE INDEX IF NOT EXISTS ix_training_jobs_status
+        ON training_jobs(status)
+    """))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_training_jobs_status', table_name='training_jobs')
+    op.drop_table('training_jobs')
@@ -0,0 +1,31 @@
+"""Keep pricing upload files in upload_history
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    # Any worker can resume a job, so the file cannot live on the host that received it
+    connection.execute(sa.text("""
+        ALTER TABLE upload_history
+            ADD COLUMN IF NOT EXISTS file_contents BYTEA,
+            DROP COLUMN IF EXISTS storage_path
+    """))
+
+
+def downgrade() -> None:
+    op.add_column('upload_history', sa.Column('storage_path', sa.String(500)))
+    op.drop_column('upload_history', 'file_contents')
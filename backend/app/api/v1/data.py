@@ -13,6 +13,9 @@ from app.models.customer import Customer
 from app.models.invoice import Invoice
 from app.models.payment import Payment
 from app.schemas import customer as customer_schema
+from app.ml.features.feature_store import record_payments, rebuild_customer_features
+from app.services.margin_analytics import invalidate_margin_analytics
+from app.services.forecast_snapshots import refresh_forecast_snapshots_async
 
 router = APIRouter()
 
@@ -148,6 +151,8 @@ async def upload_invoices(
                 errors.append(f"Row {idx + 2}: {str(e)}")
 
         db.commit()
+        invalidate_margin_analytics()
+        refresh_forecast_snapshots_async()
 
         return {
             "status": "success",
@@ -184,6 +189,7 @@ async def upload_payments(
 
         created = 0
         errors = []
+        new_payments = []
 
         for idx, row in df.iterrows():
             try:
@@ -210,11 +216,21 @@ async def upload_payments(
                 # Update invoice status
                 invoice.status = 'paid'
                 created += 1
+                new_payments.append({
+                    'customer_id': invoice.customer_id,
+                    'payment_date': payment_date,
+                    'amount': payment.amount,
+                    'delay_days': delay_days,
+                })
 
             except Exception as e:
                 errors.append(f"Row {idx + 2}: {str(e)}")
 
+        # Fold the new payments into the customer feature store
+        db.flush()
+        record_payments(db, pd.DataFrame(new_payments))
         db.commit()
+        refresh_forecast_snapshots_async()
 
         return {
             "status": "success",
@@ -227,6 +243,20 @@ async def upload_payments(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/feature-store/rebuild")
+async def rebuild_feature_store(db: Session = Depends(get_db)):
+    """
+    Rebuild the customer payment feature store from all payments.
+    """
+    try:
+        snapshots = rebuild_customer_features(db)
+        db.commit()
+        return {"status": "success", "snapshots_written": snapshots}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/customers")
 async def list_customers(
     skip: int = 0,
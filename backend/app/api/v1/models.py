@@ -2,43 +2,51 @@
 ML Model training and management API endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Dict, List
-from datetime import datetime
+from typing import Dict, List, Tuple
 import joblib
 import os
+import shutil
 
 from app.core.database import get_db
+from app.models.forecast_snapshot import CashflowForecastSnapshot
 from app.models.ml_model import MLModel
-from app.models.invoice import Invoice
-from app.models.payment import Payment
-from app.ml.features.feature_engineering import FeatureEngineer
+from app.models.prediction import Prediction
+from app.models.training_job import TrainingJob
 from app.ml.models.payment_predictor import PaymentPredictor
-from app.ml.models.cashflow_forecaster import CashFlowForecaster
-import pandas as pd
+from app.services import model_training
+from app.services.model_registry import model_registry
+from app.services.prediction_cache import refresh_current_predictions
 
 router = APIRouter()
 
-# In-memory cache for active models
-_model_cache = {}
+
+def get_active_model_with_id(model_type: str = "payment_predictor") -> Tuple[int, PaymentPredictor]:
+    """Get the currently active model and its MLModel id from the model registry."""
+    entry = model_registry.get_with_id(model_type)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No active {model_type} model loaded")
+    return entry
 
 
 def get_active_model(model_type: str = "payment_predictor") -> PaymentPredictor:
-    """Get the currently active model from cache."""
-    if model_type not in _model_cache:
-        raise HTTPException(status_code=404, detail=f"No active {model_type} model loaded")
-    return _model_cache[model_type]
+    """Get the currently active model from the model registry."""
+    return get_active_model_with_id(model_type)[1]
 
 
-@router.post("/train")
+@router.post("/train", status_code=202)
 async def train_model(
-    background_tasks: BackgroundTasks,
     model_type: str = "payment_predictor",
     db: Session = Depends(get_db)
 ):
     """
-    Train a new ML model on historical data.
+    Queue training of a new ML model on historical data.
+
+    Training runs in a background process; poll GET /train/jobs/{job_id}
+    for its status. The trained model becomes the active version.
 
     Args:
         model_type: Type of model to train
@@ -46,111 +54,48 @@ async def train_model(
             - "cashflow_forecaster": Prophet time series model for cash flow trends
     """
     try:
-        if model_type == "payment_predictor":
-            # XGBoost Payment Predictor
-            paid_invoices = db.query(Invoice).filter(Invoice.status == 'paid').count()
-
-            if paid_invoices < 50:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Insufficient training data. Need at least 50 paid invoices, found {paid_invoices}"
-                )
-
-            # Prepare training data
-            print("Preparing training data...")
-            feature_engineer = FeatureEngineer(db)
-            training_df = feature_engineer.prepare_training_data()
-
-            if len(training_df) < 50:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"After feature engineering, only {len(training_df)} samples. Need at least 50."
-                )
-
-            # Train model
-            print(f"Training {model_type}...")
-            model = PaymentPredictor()
-            metrics = model.train(training_df, test_size=0.2)
-            model_type_label = "xgboost_ensemble"
-
-        elif model_type == "cashflow_forecaster":
-            # Prophet Time Series Forecaster
-            payments = db.query(Payment).all()
-
-            if len(payments) < 60:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Insufficient payment history. Need at least 60 days, found {len(payments)}"
-                )
-
-            # Prepare time series data
-            print("Preparing time series data...")
-            payments_df = pd.DataFrame([
-                {
-                    'payment_date': p.payment_date,
-                    'amount': p.amount
-                }
-                for p in payments
-            ])
-
-            # Train Prophet model
-            print(f"Training {model_type}...")
-            model = CashFlowForecaster()
-            metrics = model.train(payments_df, validation_days=30)
-            model_type_label = "prophet_timeseries"
-
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unknown model type: {model_type}"
-            )
-
-        # Save model
-        model_dir = "/tmp/models"
-        os.makedirs(model_dir, exist_ok=True)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        version = f"v_{timestamp}"
-        model_path = f"{model_dir}/{model_type}_{version}.joblib"
-
-        model.save(model_path)
-
-        # Store model metadata
-        ml_model = MLModel(
-            name=model_type,
-            version=version,
-            model_type=model_type_label,
-            s3_path=model_path,  # In production, upload to S3
-            metrics=metrics,
-            is_active=True,
-            created_at=datetime.now(),
-            training_samples=metrics.get('training_samples', metrics.get('training_days', 0)),
-            test_samples=metrics.get('test_samples', metrics.get('validation_days', 0))
-        )
+        model_training.check_training_data(db, model_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Deactivate previous models
-        db.query(MLModel).filter(
-            MLModel.name == model_type,
-            MLModel.is_active == True
-        ).update({"is_active": False})
+    job = model_training.enqueue_training_job(db, model_type)
+    return model_training.job_status(job)
 
-        db.add(ml_model)
-        db.commit()
-        db.refresh(ml_model)
 
-        # Load into cache
-        _model_cache[model_type] = model
+@router.get("/train/jobs")
+async def list_training_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_db)
+):
+    """List training jobs, newest first."""
+    jobs = db.query(TrainingJob).order_by(
+        TrainingJob.id.desc()
+    ).offset(skip).limit(limit).all()
+
+    return {"jobs": [model_training.job_status(job) for job in jobs]}
 
-        return {
-            "status": "success",
-            "model_id": ml_model.id,
-            "version": version,
-            "metrics": metrics,
-            "message": f"Model trained successfully"
-        }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/train/jobs/{job_id}")
+async def get_training_job(job_id: int, db: Session = Depends(get_db)):
+    """Get the status of a training job."""
+    job = db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return model_training.job_status(job)
+
+
+@router.post("/train/jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a queued or running training job."""
+    job = db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+
+    if not model_training.cancel_training_job(db, job):
+        raise HTTPException(status_code=400, detail=f"Training job already {job.status}")
+
+    return model_training.job_status(job)
 
 
 @router.get("/models")
@@ -161,7 +106,7 @@ async def list_models(
 ):
     """List all trained models."""
     models = db.query(MLModel).order_by(
-        MLModel.created_at.desc()
+        MLModel.trained_at.desc(), MLModel.id.desc()
     ).offset(skip).limit(limit).all()
 
     return {
@@ -172,15 +117,22 @@ async def list_models(
                 "version": m.version,
                 "model_type": m.model_type,
                 "is_active": m.is_active,
-                "created_at": m.created_at,
+                "created_at": m.trained_at,
                 "metrics": m.metrics,
-                "training_samples": m.training_samples
+                "training_samples": m.training_samples,
+                "training_duration_seconds": m.training_duration_seconds
             }
             for m in models
         ]
     }
 
 
+@router.get("/models/loaded")
+async def list_loaded_models():
+    """Model versions loaded in this worker with load time, warm-up time and memory estimate."""
+    return {"models": model_registry.loaded_versions()}
+
+
 @router.get("/models/{model_id}")
 async def get_model(model_id: int, db: Session = Depends(get_db)):
     """Get details of a specific model."""
@@ -195,10 +147,11 @@ async def get_model(model_id: int, db: Session = Depends(get_db)):
         "version": model.version,
         "model_type": model.model_type,
         "is_active": model.is_active,
-        "created_at": model.created_at,
+        "created_at": model.trained_at,
         "metrics": model.metrics,
         "training_samples": model.training_samples,
-        "test_samples": model.test_samples
+        "test_samples": (model.metrics or {}).get('test_samples', (model.metrics or {}).get('validation_days')),
+        "training_duration_seconds": model.training_duration_seconds
     }
 
 
@@ -210,6 +163,12 @@ async def activate_model(model_id: int, db: Session = Depends(get_db)):
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
 
+    # Load and warm it up (off the event loop) before anyone can be served it
+    try:
+        await run_in_threadpool(model_registry.preload, model)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load model: {str(e)}")
+
     # Deactivate other models of same type
     db.query(MLModel).filter(
         MLModel.name == model.name,
@@ -219,13 +178,8 @@ async def activate_model(model_id: int, db: Session = Depends(get_db)):
     model.is_active = True
     db.commit()
 
-    # Load model into cache
-    try:
-        predictor = PaymentPredictor()
-        predictor.load(model.s3_path)
-        _model_cache[model.name] = predictor
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to load model: {str(e)}")
+    # Swap it in for this worker now (already loaded); other workers load it when polling
+    await run_in_threadpool(model_registry.sync)
 
     return {
         "status": "success",
@@ -251,7 +205,7 @@ async def get_active_model_info(
         "id": model.id,
         "name": model.name,
         "version": model.version,
-        "created_at": model.created_at,
+        "created_at": model.trained_at,
         "metrics": model.metrics,
         "training_samples": model.training_samples
     }
@@ -259,7 +213,13 @@ async def get_active_model_info(
 
 @router.delete("/models/{model_id}")
 async def delete_model(model_id: int, db: Session = Depends(get_db)):
-    """Delete a model (only if not active)."""
+    """
+    Delete a model (only if not active).
+
+    Its stored predictions and forecast snapshots are deleted with it and
+    training jobs that produced it keep no reference to it. The artifact is
+    removed once the rows are gone.
+    """
     model = db.query(MLModel).filter(MLModel.id == model_id).first()
 
     if not model:
@@ -271,14 +231,40 @@ async def delete_model(model_id: int, db: Session = Depends(get_db)):
             detail="Cannot delete active model. Activate another model first."
         )
 
+    model_path = model.s3_path
+
+    try:
+        invoice_ids = [
+            invoice_id for (invoice_id,) in db.query(Prediction.invoice_id).filter(
+                Prediction.ml_model_id == model_id
+            ).distinct().all()
+        ]
+        db.query(Prediction).filter(Prediction.ml_model_id == model_id).delete(synchronize_session=False)
+        # Invoices fall back to their latest prediction of another model
+        refresh_current_predictions(db, invoice_ids)
+
+        db.query(CashflowForecastSnapshot).filter(
+            CashflowForecastSnapshot.ml_model_id == model_id
+        ).delete(synchronize_session=False)
+        db.query(TrainingJob).filter(TrainingJob.ml_model_id == model_id).update(
+            {"ml_model_id": None}, synchronize_session=False
+        )
+
+        db.delete(model)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Model is still referenced: {e.orig}")
+
+    model_registry.discard(model_id)
+
     # Delete model file
     try:
-        if os.path.exists(model.s3_path):
-            os.remove(model.s3_path)
+        if os.path.isdir(model_path):
+            shutil.rmtree(model_path)
+        elif os.path.exists(model_path):
+            os.remove(model_path)
     except Exception as e:
         print(f"Warning: Could not delete model file: {e}")
 
-    db.delete(model)
-    db.commit()
-
     return {"status": "success", "message": "Model deleted"}
@@ -3,19 +3,26 @@ Prediction API endpoints for cash flow forecasting.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, func, or_
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta, date
-from collections import defaultdict
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.invoice import Invoice
 from app.models.prediction import Prediction
-from app.models.customer import Customer
 from app.models.payment import Payment
 from app.ml.features.feature_engineering import FeatureEngineer
-from app.api.v1.models import get_active_model
+from app.ml.models.cashflow_simulator import CashFlowSimulator
+from app.api.v1.models import get_active_model, get_active_model_with_id
+from app.services.cashflow import DEFAULT_CURRENCY, SCENARIOS, aggregate_cashflow, predicted_invoice_payments, forecast_timeseries
+from app.services.customer_forecasts import customer_forecasts
+from app.services.prediction_cache import refresh_current_predictions
+from app.services.forecast_snapshots import (
+    INVOICES_KIND, SNAPSHOT_HORIZONS, TIMESERIES_KIND, latest_snapshot, refresh_forecast_snapshots,
+)
 import pandas as pd
 
 router = APIRouter()
@@ -43,7 +50,7 @@ async def predict_invoice(
             )
 
         # Get active model
-        model = get_active_model("payment_predictor")
+        ml_model_id, model = get_active_model_with_id("payment_predictor")
 
         # Extract features
         feature_engineer = FeatureEngineer(db)
@@ -55,6 +62,7 @@ async def predict_invoice(
         # Store prediction
         prediction = Prediction(
             invoice_id=invoice_id,
+            ml_model_id=ml_model_id,
             predicted_payment_date=prediction_result['predicted_payment_date'],
             on_time_probability=prediction_result['on_time_probability'],
             predicted_delay_days=prediction_result['predicted_delay_days'],
@@ -68,6 +76,8 @@ async def predict_invoice(
         )
 
         db.add(prediction)
+        db.flush()
+        refresh_current_predictions(db, [invoice_id])
         db.commit()
         db.refresh(prediction)
 
@@ -120,49 +130,49 @@ async def predict_batch(
             return {"predictions": [], "count": 0}
 
         # Get active model
-        model = get_active_model("payment_predictor")
+        ml_model_id, model = get_active_model_with_id("payment_predictor")
         feature_engineer = FeatureEngineer(db)
 
+        # Score all invoices in one model call
+        features = feature_engineer.create_feature_matrix(invoices, model.feature_columns)
+        results = model.predict_many(features).to_dict('index')
+        features_by_invoice = features.to_dict('index')
+
         predictions = []
 
         for invoice in invoices:
-            try:
-                # Extract features
-                features = feature_engineer.create_feature_vector(invoice)
-
-                # Make prediction
-                prediction_result = model.predict(features)
-
-                # Store prediction
-                prediction = Prediction(
-                    invoice_id=invoice.id,
-                    predicted_payment_date=prediction_result['predicted_payment_date'],
-                    on_time_probability=prediction_result['on_time_probability'],
-                    predicted_delay_days=prediction_result['predicted_delay_days'],
-                    risk_score=prediction_result['risk_score'],
-                    confidence=prediction_result['confidence'],
-                    optimistic_date=prediction_result['optimistic_date'],
-                    realistic_date=prediction_result['realistic_date'],
-                    pessimistic_date=prediction_result['pessimistic_date'],
-                    features=features,
-                    created_at=datetime.now()
-                )
-
-                db.add(prediction)
+            prediction_result = results[invoice.id]
+
+            # Store prediction
+            prediction = Prediction(
+                invoice_id=invoice.id,
+                ml_model_id=ml_model_id,
+                predicted_payment_date=prediction_result['predicted_payment_date'],
+                on_time_probability=prediction_result['on_time_probability'],
+                predicted_delay_days=prediction_result['predicted_delay_days'],
+                risk_score=prediction_result['risk_score'],
+                confidence=prediction_result['confidence'],
+                optimistic_date=prediction_result['optimistic_date'],
+                realistic_date=prediction_result['realistic_date'],
+                pessimistic_date=prediction_result['pessimistic_date'],
+                features=features_by_invoice[invoice.id],
+                created_at=datetime.now()
+            )
 
-                predictions.append({
-                    "invoice_id": invoice.id,
-                    "invoice_number": invoice.invoice_number,
-                    "customer": invoice.customer.name,
-                    "amount": invoice.amount,
-                    "due_date": invoice.due_date,
-                    "predicted_payment_date": prediction_result['predicted_payment_date'],
-                    "risk_score": prediction_result['risk_score']
-                })
+            db.add(prediction)
 
-            except Exception as e:
-                print(f"Error predicting invoice {invoice.id}: {e}")
+            predictions.append({
+                "invoice_id": invoice.id,
+                "invoice_number": invoice.invoice_number,
+                "customer": invoice.customer.name,
+                "amount": invoice.amount,
+                "due_date": invoice.due_date,
+                "predicted_payment_date": prediction_result['predicted_payment_date'],
+                "risk_score": prediction_result['risk_score']
+            })
 
+        db.flush()
+        refresh_current_predictions(db, list(results))
         db.commit()
 
         return {
@@ -178,7 +188,7 @@ async def predict_batch(
 async def predict_cashflow(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    scenario: str = Query("realistic", regex="^(optimistic|realistic|pessimistic)$"),
+    scenario: str = Query("realistic", regex="^(optimistic|realistic|pessimistic|all)$"),
     granularity: str = Query("day", regex="^(day|week|month)$"),
     db: Session = Depends(get_db)
 ):
@@ -188,7 +198,8 @@ async def predict_cashflow(
     Args:
         start_date: Start date (default: today)
         end_date: End date (default: 90 days from start)
-        scenario: Prediction scenario (optimistic/realistic/pessimistic)
+        scenario: Prediction scenario (optimistic/realistic/pessimistic), or
+            "all" to return every scenario under "scenarios"
         granularity: Aggregation level (day/week/month)
     """
     try:
@@ -199,112 +210,149 @@ async def predict_cashflow(
         if not end_date:
             end_date = start_date + timedelta(days=90)
 
-        # Get all pending invoices
-        pending_invoices = db.query(Invoice).filter(
+        scenarios = SCENARIOS if scenario == "all" else [scenario]
+
+        # Active model is only needed when there is something to score
+        has_pending = db.query(Invoice.id).filter(
             Invoice.status == 'pending',
             Invoice.due_date >= start_date,
             Invoice.due_date <= end_date
-        ).all()
-
-        if not pending_invoices:
-            return {
-                "start_date": start_date,
-                "end_date": end_date,
-                "scenario": scenario,
-                "granularity": granularity,
-                "cashflow": [],
-                "summary": {
-                    "total_expected": 0,
-                    "invoice_count": 0
-                }
-            }
+        ).first() is not None
+        ml_model_id, model = get_active_model_with_id("payment_predictor") if has_pending else (None, None)
 
-        # Get active model
-        model = get_active_model("payment_predictor")
-        feature_engineer = FeatureEngineer(db)
+        # Reuse valid stored predictions, score and store the rest
+        invoices_df = predicted_invoice_payments(db, model, ml_model_id, start_date, end_date)
+        db.commit()
 
-        # Aggregate cash flow by date
-        cashflow_by_date = defaultdict(float)
-        total_expected = 0
-        predictions_data = []
-
-        for invoice in pending_invoices:
-            try:
-                # Get or create prediction
-                existing_prediction = db.query(Prediction).filter(
-                    Prediction.invoice_id == invoice.id
-                ).order_by(Prediction.created_at.desc()).first()
-
-                if existing_prediction:
-                    # Use existing prediction
-                    if scenario == "optimistic":
-                        payment_date = existing_prediction.optimistic_date
-                    elif scenario == "pessimistic":
-                        payment_date = existing_prediction.pessimistic_date
-                    else:
-                        payment_date = existing_prediction.realistic_date
-                else:
-                    # Make new prediction
-                    features = feature_engineer.create_feature_vector(invoice)
-                    prediction_result = model.predict(features)
-
-                    if scenario == "optimistic":
-                        payment_date = prediction_result['optimistic_date']
-                    elif scenario == "pessimistic":
-                        payment_date = prediction_result['pessimistic_date']
-                    else:
-                        payment_date = prediction_result['realistic_date']
-
-                # Aggregate by granularity
-                if granularity == "day":
-                    bucket_key = payment_date
-                elif granularity == "week":
-                    bucket_key = payment_date - timedelta(days=payment_date.weekday())
-                else:  # month
-                    bucket_key = date(payment_date.year, payment_date.month, 1)
-
-                cashflow_by_date[bucket_key] += invoice.amount
-                total_expected += invoice.amount
-
-                predictions_data.append({
-                    "invoice_id": invoice.id,
-                    "invoice_number": invoice.invoice_number,
-                    "customer": invoice.customer.name,
-                    "amount": invoice.amount,
-                    "due_date": invoice.due_date,
-                    "predicted_payment_date": payment_date
-                })
-
-            except Exception as e:
-                print(f"Error processing invoice {invoice.id}: {e}")
-
-        # Convert to sorted list
-        cashflow = [
-            {
-                "date": bucket_date,
-                "amount": amount,
-                "cumulative": sum(
-                    cashflow_by_date[d] for d in sorted(cashflow_by_date.keys())
-                    if d <= bucket_date
-                )
-            }
-            for bucket_date, amount in sorted(cashflow_by_date.items())
-        ]
+        aggregated = aggregate_cashflow(invoices_df, granularity, scenarios)
 
-        return {
+        invoices_df = invoices_df.drop(columns=[
+            f"{name}_date" for name in SCENARIOS if name not in scenarios
+        ])
+        if scenario != "all":
+            invoices_df = invoices_df.rename(columns={f"{scenario}_date": "predicted_payment_date"})
+        predictions_data = invoices_df.astype(object).to_dict('records')
+
+        response = {
             "start_date": start_date,
             "end_date": end_date,
             "scenario": scenario,
             "granularity": granularity,
-            "cashflow": cashflow,
             "predictions": predictions_data,
             "summary": {
-                "total_expected": total_expected,
-                "invoice_count": len(pending_invoices),
+                "total_expected": float(invoices_df["amount"].sum()),
+                "totals_by_currency": aggregated[scenarios[0]]["totals_by_currency"],
+                "invoice_count": len(invoices_df),
                 "prediction_count": len(predictions_data)
             }
         }
+        if scenario == "all":
+            response["scenarios"] = {name: aggregated[name]["cashflow"] for name in scenarios}
+        else:
+            response["cashflow"] = aggregated[scenario]["cashflow"]
+        return response
 
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cashflow/simulation")
+def simulate_cashflow(
+    days_ahead: int = Query(90, ge=7, le=365),
+    granularity: str = Query("week", regex="^(day|week|month)$"),
+    n_scenarios: int = Query(10000, ge=100, le=100000),
+    opening_balance: float = 0.0,
+    minimum_balance: float = 0.0,
+    daily_outflow: float = Query(0.0, ge=0.0),
+    currency: Optional[str] = None,
+    seed: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Monte Carlo cash flow distribution of all pending invoices.
+
+    Payment dates are sampled from each customer's observed payment delays
+    (pooled delays for customers with fewer than MIN_PAYMENT_SAMPLES payments).
+    Balances are only meaningful in one currency, so a book with pending
+    invoices in several currencies must be simulated one currency at a time.
+    Runs in the threadpool (plain def): the sampling is CPU bound.
+
+    Args:
+        days_ahead: Simulated horizon in days (7-365)
+        granularity: Aggregation level (day/week/month)
+        n_scenarios: Number of simulated scenarios
+        opening_balance: Cash balance today
+        minimum_balance: Balance whose breach probability is reported
+        daily_outflow: Expected outgoing payments per day
+        currency: Currency to simulate (required when pending invoices are in several currencies)
+        seed: Random seed for reproducible results
+    """
+    try:
+        start_date = datetime.now().date()
+        invoice_currency = func.coalesce(Invoice.currency, DEFAULT_CURRENCY)
+
+        if not currency:
+            currencies = [
+                row[0] for row in db.query(invoice_currency).filter(Invoice.status == 'pending').distinct().all()
+            ]
+            if len(currencies) > 1:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Pending invoices are in several currencies ({', '.join(sorted(currencies))}); pass currency"
+                )
+            currency = currencies[0] if currencies else DEFAULT_CURRENCY
+
+        invoices_df = pd.DataFrame(
+            db.query(Invoice.customer_id, Invoice.amount, Invoice.due_date).filter(
+                Invoice.status == 'pending',
+                invoice_currency == currency
+            ).all(),
+            columns=['customer_id', 'amount', 'due_date']
+        )
+
+        # Sampling time grows with scenarios x invoices, memory with scenarios x days
+        if n_scenarios * len(invoices_df) > settings.CASHFLOW_SIMULATION_MAX_SAMPLES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"n_scenarios x pending invoices ({len(invoices_df)}) must not exceed "
+                       f"{settings.CASHFLOW_SIMULATION_MAX_SAMPLES}"
+            )
+        if n_scenarios * days_ahead > settings.CASHFLOW_SIMULATION_MAX_DAY_CELLS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"n_scenarios x days_ahead must not exceed {settings.CASHFLOW_SIMULATION_MAX_DAY_CELLS}"
+            )
+
+        payments_df = pd.DataFrame(
+            db.query(Invoice.customer_id, Payment.delay_days).join(
+                Invoice, Invoice.id == Payment.invoice_id
+            ).all(),
+            columns=['customer_id', 'delay_days']
+        )
+
+        simulator = CashFlowSimulator(min_customer_samples=settings.MIN_PAYMENT_SAMPLES).fit(payments_df)
+        collections = simulator.simulate(invoices_df, start_date, days_ahead, n_scenarios, seed)
+        summary = simulator.summarize(
+            collections, start_date, granularity, opening_balance, minimum_balance, daily_outflow
+        )
+
+        return {
+            "start_date": start_date,
+            "days_ahead": days_ahead,
+            "granularity": granularity,
+            "currency": currency,
+            "opening_balance": opening_balance,
+            "minimum_balance": minimum_balance,
+            "daily_outflow": daily_outflow,
+            "invoice_count": len(invoices_df),
+            "outstanding_total": float(invoices_df['amount'].sum()),
+            **summary
+        }
+
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -319,59 +367,48 @@ async def predict_customer_cashflow(
     Predict cash flow for a specific customer.
     """
     try:
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
+        forecasts = customer_forecasts(db, [customer_id], lambda: get_active_model_with_id("payment_predictor"))
 
-        if not customer:
+        if customer_id not in forecasts:
             raise HTTPException(status_code=404, detail="Customer not found")
 
-        # Get pending invoices for customer
-        pending_invoices = db.query(Invoice).filter(
-            Invoice.customer_id == customer_id,
-            Invoice.status == 'pending'
-        ).all()
-
-        if not pending_invoices:
-            return {
-                "customer_id": customer_id,
-                "customer_name": customer.name,
-                "pending_invoices": 0,
-                "total_outstanding": 0,
-                "predictions": []
-            }
+        return forecasts[customer_id]
 
-        # Get model and feature engineer
-        model = get_active_model("payment_predictor")
-        feature_engineer = FeatureEngineer(db)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        predictions = []
-        total_outstanding = 0
 
-        for invoice in pending_invoices:
-            features = feature_engineer.create_feature_vector(invoice)
-            prediction_result = model.predict(features)
+@router.get("/customers")
+async def predict_customers_cashflow(
+    customer_ids: List[int] = Query(..., description="Customers to forecast (repeat the parameter)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Predict cash flow for many customers at once (e.g. a portfolio page).
 
-            predictions.append({
-                "invoice_id": invoice.id,
-                "invoice_number": invoice.invoice_number,
-                "amount": invoice.amount,
-                "due_date": invoice.due_date,
-                "predicted_payment_date": prediction_result['predicted_payment_date'],
-                "on_time_probability": prediction_result['on_time_probability'],
-                "risk_score": prediction_result['risk_score']
-            })
+    Customers whose invoices, payments and active model are unchanged are
+    served from cache; all others are scored together in one model call.
+    """
+    try:
+        customer_ids = list(dict.fromkeys(customer_ids))
+        if len(customer_ids) > settings.PREDICTION_BATCH_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.PREDICTION_BATCH_SIZE} customers per request"
+            )
 
-            total_outstanding += invoice.amount
+        forecasts = customer_forecasts(db, customer_ids, lambda: get_active_model_with_id("payment_predictor"))
 
         return {
-            "customer_id": customer_id,
-            "customer_name": customer.name,
-            "customer_segment": customer.segment,
-            "customer_risk_score": customer.risk_score,
-            "pending_invoices": len(pending_invoices),
-            "total_outstanding": total_outstanding,
-            "predictions": predictions
+            "customers": [forecasts[customer_id] for customer_id in customer_ids if customer_id in forecasts],
+            "not_found": [customer_id for customer_id in customer_ids if customer_id not in forecasts],
+            "total_outstanding": sum(forecast["total_outstanding"] for forecast in forecasts.values())
         }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -380,40 +417,68 @@ async def predict_customer_cashflow(
 async def get_high_risk_invoices(
     threshold: float = Query(0.7, ge=0.0, le=1.0),
     limit: int = Query(50, le=200),
+    after_risk_score: Optional[float] = Query(None, description="Cursor: risk_score of the last row of the previous page"),
+    after_id: Optional[int] = Query(None, description="Cursor: invoice_id of the last row of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
-    Get invoices with high risk of late payment.
+    Get pending invoices with high risk of late payment, riskiest first.
+
+    Reads each invoice's current (latest) prediction through the
+    (status, current_risk_score) index. Uses keyset pagination: pass the
+    returned next_cursor values as after_risk_score and after_id to get the
+    next page.
     """
     try:
-        # Get recent predictions with high risk
-        high_risk_predictions = db.query(Prediction).filter(
-            Prediction.risk_score >= threshold
-        ).order_by(Prediction.risk_score.desc()).limit(limit).all()
-
-        results = []
-
-        for pred in high_risk_predictions:
-            invoice = pred.invoice
-
-            if invoice.status == 'pending':
-                results.append({
-                    "invoice_id": invoice.id,
-                    "invoice_number": invoice.invoice_number,
-                    "customer": invoice.customer.name,
-                    "customer_segment": invoice.customer.segment,
-                    "amount": invoice.amount,
-                    "due_date": invoice.due_date,
-                    "predicted_payment_date": pred.predicted_payment_date,
-                    "risk_score": pred.risk_score,
-                    "predicted_delay_days": pred.predicted_delay_days
-                })
+        at_risk = [
+            Invoice.status == 'pending',
+            Invoice.current_risk_score >= threshold,
+        ]
+
+        query = db.query(Invoice).options(
+            joinedload(Invoice.customer),
+            joinedload(Invoice.current_prediction)
+        ).filter(*at_risk)
+
+        if after_risk_score is not None and after_id is not None:
+            query = query.filter(or_(
+                Invoice.current_risk_score < after_risk_score,
+                and_(Invoice.current_risk_score == after_risk_score, Invoice.id < after_id)
+            ))
+
+        invoices = query.order_by(
+            Invoice.current_risk_score.desc(), Invoice.id.desc()
+        ).limit(limit).all()
+
+        total_count, total_amount = db.query(
+            func.count(Invoice.id), func.coalesce(func.sum(Invoice.amount), 0)
+        ).filter(*at_risk).one()
+
+        results = [
+            {
+                "invoice_id": invoice.id,
+                "invoice_number": invoice.invoice_number,
+                "customer": invoice.customer.name,
+                "customer_segment": invoice.customer.segment,
+                "amount": invoice.amount,
+                "due_date": invoice.due_date,
+                "predicted_payment_date": invoice.current_prediction.predicted_payment_date,
+                "risk_score": invoice.current_risk_score,
+                "predicted_delay_days": invoice.current_prediction.predicted_delay_days
+            }
+            for invoice in invoices
+        ]
 
         return {
             "threshold": threshold,
             "count": len(results),
             "high_risk_invoices": results,
-            "total_amount_at_risk": sum(r['amount'] for r in results)
+            "total_count": total_count,
+            "total_amount_at_risk": total_amount,
+            "next_cursor": {
+                "after_risk_score": results[-1]["risk_score"],
+                "after_id": results[-1]["invoice_id"]
+            } if len(results) == limit else None
         }
 
     except Exception as e:
@@ -439,46 +504,102 @@ async def timeseries_forecast(
         # Get active Prophet model
         model = get_active_model("cashflow_forecaster")
 
-        # Generate forecast
-        if granularity == "day":
-            forecast_df = model.forecast(days_ahead)
+        return forecast_timeseries(model, days_ahead, granularity)
 
-            forecast_data = [
-                {
-                    "date": row['ds'].strftime('%Y-%m-%d'),
-                    "predicted_amount": float(row['yhat']),
-                    "lower_bound": float(row['yhat_lower']),
-                    "upper_bound": float(row['yhat_upper'])
-                }
-                for _, row in forecast_df.iterrows()
-            ]
-        else:
-            # Weekly or monthly aggregation
-            forecast_df = model.forecast_aggregate(days_ahead, granularity)
-
-            forecast_data = [
-                {
-                    "period": row['period_str'],
-                    "start_date": row['ds'].strftime('%Y-%m-%d'),
-                    "predicted_amount": float(row['yhat']),
-                    "lower_bound": float(row['yhat_lower']),
-                    "upper_bound": float(row['yhat_upper'])
-                }
-                for _, row in forecast_df.iterrows()
-            ]
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _snapshot_or_404(db: Session, kind: str, horizon_days: int, granularity: str, as_of_date: Optional[date]):
+    if horizon_days not in SNAPSHOT_HORIZONS:
+        raise HTTPException(status_code=400, detail=f"horizon_days must be one of {SNAPSHOT_HORIZONS}")
 
-        # Get trend analysis
-        trend_analysis = model.get_trend_analysis()
+    snapshot = latest_snapshot(db, kind, horizon_days, granularity, as_of_date)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail=f"No {kind} forecast snapshot for the active model")
+    return snapshot
+
+
+@router.get("/snapshots/cashflow")
+async def get_cashflow_snapshot(
+    horizon_days: int = 90,
+    scenario: str = Query("all", regex="^(optimistic|realistic|pessimistic|all)$"),
+    granularity: str = Query("day", regex="^(day|week|month)$"),
+    as_of_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Serve the latest precomputed invoice-level cash flow forecast.
+
+    Args:
+        horizon_days: Forecast horizon (90/180/365)
+        scenario: Scenario to return, or "all"
+        granularity: Aggregation level (day/week/month)
+        as_of_date: Latest snapshot taken on or before this date (default: today)
+    """
+    try:
+        snapshot = _snapshot_or_404(db, INVOICES_KIND, horizon_days, granularity, as_of_date)
+        payload = dict(snapshot.payload)
+        if scenario != "all":
+            payload["cashflow"] = payload.pop("scenarios")[scenario]
 
         return {
-            "forecast": forecast_data,
-            "granularity": granularity,
-            "days_ahead": days_ahead,
-            "trend_analysis": trend_analysis,
-            "model_metrics": model.metrics
+            "as_of_date": snapshot.as_of_date,
+            "model_version": snapshot.model_version,
+            "created_at": snapshot.created_at,
+            "horizon_days": horizon_days,
+            "scenario": scenario,
+            **payload
         }
 
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshots/timeseries")
+async def get_timeseries_snapshot(
+    horizon_days: int = 90,
+    granularity: str = Query("day", regex="^(day|week|month)$"),
+    as_of_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Serve the latest precomputed Prophet forecast.
+
+    Args:
+        horizon_days: Forecast horizon (90/180/365)
+        granularity: Aggregation level (day/week/month)
+        as_of_date: Latest snapshot taken on or before this date (default: today)
+    """
+    try:
+        snapshot = _snapshot_or_404(db, TIMESERIES_KIND, horizon_days, granularity, as_of_date)
+
+        return {
+            "as_of_date": snapshot.as_of_date,
+            "model_version": snapshot.model_version,
+            "created_at": snapshot.created_at,
+            **snapshot.payload
+        }
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/snapshots/refresh")
+async def refresh_snapshots():
+    """
+    Retake today's forecast snapshots for the loaded models.
+    """
+    try:
+        # Scores the whole pending book and runs Prophet: keep it off the event loop
+        written = await run_in_threadpool(refresh_forecast_snapshots)
+        return {"status": "success", "snapshots_written": written}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
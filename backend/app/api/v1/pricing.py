@@ -2,9 +2,11 @@
 Pricing API endpoints for managing products, prices, and history.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, UploadFile, File, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_
 from typing import List, Optional
 from datetime import datetime, timezone
 from pydantic import BaseModel
@@ -14,6 +16,13 @@ import traceback
 
 from app.core.database import get_db
 from app.models.product import Product, Industry, ProductBasePrice, CustomerProductPrice, IndustryProductionFactor
+from app.models.upload_history import UploadHistory
+from app.services import margin_analytics, pricing_catalog, pricing_history, pricing_jobs
+from app.services.catalog_identity import industry_id_for_code, invalidate_catalog_identity, product_id_for_code
+from app.services.pricing_import import PricingImporter, detect_simple_price_list_columns
+from app.services.price_evaluation import evaluate_price_matrix
+from app.services.price_resolution import customer_price_valid_at, resolve_price
+from app.services.price_thresholds import below_threshold_prices, refresh_price_thresholds
 
 router = APIRouter()
 
@@ -120,6 +129,39 @@ class CustomerProductPriceResponse(BaseModel):
         from_attributes = True
 
 
+class PriceEvaluationCell(BaseModel):
+    product_code: str
+    customer_id: str
+    strategic_cmin: float
+    discount_invoice: float = 0
+    discount_marketing: float = 0
+    discount_yearend: float = 0
+
+
+class PriceEvaluationCustomer(BaseModel):
+    customer_id: str
+    discount_invoice: float = 0
+    discount_marketing: float = 0
+    discount_yearend: float = 0
+
+
+class PriceEvaluationProduct(BaseModel):
+    product_code: str
+    strategic_cmin: float
+
+
+class PriceEvaluationRequest(BaseModel):
+    """
+    Proposed prices to evaluate. Explicit `items` are evaluated as given;
+    `customers` x `products` is expanded into a full matrix where each cell
+    combines the product's strategic Cmin with the customer's discounts.
+    """
+    items: List[PriceEvaluationCell] = []
+    customers: List[PriceEvaluationCustomer] = []
+    products: List[PriceEvaluationProduct] = []
+    at: Optional[datetime] = None
+
+
 # ============================================================================
 # Industry Endpoints
 # ============================================================================
@@ -135,13 +177,14 @@ async def list_industries(db: Session = Depends(get_db)):
 async def create_industry(industry: IndustryCreate, db: Session = Depends(get_db)):
     """Create a new industry."""
     # Check if already exists
-    existing = db.query(Industry).filter(Industry.code == industry.code).first()
-    if existing:
+    if industry_id_for_code(db, industry.code) is not None:
         raise HTTPException(status_code=400, detail=f"Industry {industry.code} already exists")
 
     db_industry = Industry(**industry.dict())
     db.add(db_industry)
     db.commit()
+    pricing_catalog.invalidate_products_with_prices()
+    invalidate_catalog_identity()
     db.refresh(db_industry)
     return db_industry
 
@@ -163,10 +206,10 @@ async def list_products(
         query = query.filter(Product.is_active == True)
 
     if industry_code:
-        industry = db.query(Industry).filter(Industry.code == industry_code).first()
-        if not industry:
+        industry_id = industry_id_for_code(db, industry_code)
+        if industry_id is None:
             raise HTTPException(status_code=404, detail=f"Industry {industry_code} not found")
-        query = query.filter(Product.industry_id == industry.id)
+        query = query.filter(Product.industry_id == industry_id)
 
     products = query.all()
     return products
@@ -175,7 +218,8 @@ async def list_products(
 @router.get("/products/{product_code}", response_model=ProductResponse)
 async def get_product(product_code: str, db: Session = Depends(get_db)):
     """Get a specific product by code."""
-    product = db.query(Product).filter(Product.code == product_code).first()
+    product_id = product_id_for_code(db, product_code)
+    product = db.get(Product, product_id) if product_id is not None else None
     if not product:
         raise HTTPException(status_code=404, detail=f"Product {product_code} not found")
     return product
@@ -185,13 +229,12 @@ async def get_product(product_code: str, db: Session = Depends(get_db)):
 async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
     """Create a new product."""
     # Check if product already exists
-    existing = db.query(Product).filter(Product.code == product.code).first()
-    if existing:
+    if product_id_for_code(db, product.code) is not None:
         raise HTTPException(status_code=400, detail=f"Product {product.code} already exists")
 
     # Get industry
-    industry = db.query(Industry).filter(Industry.code == product.industry_code).first()
-    if not industry:
+    industry_id = industry_id_for_code(db, product.industry_code)
+    if industry_id is None:
         raise HTTPException(status_code=404, detail=f"Industry {product.industry_code} not found")
 
     db_product = Product(
@@ -199,10 +242,12 @@ async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         name_sl=product.name_sl,
         name_hr=product.name_hr,
         unit=product.unit,
-        industry_id=industry.id
+        industry_id=industry_id
     )
     db.add(db_product)
     db.commit()
+    pricing_catalog.invalidate_products_with_prices()
+    invalidate_catalog_identity()
     db.refresh(db_product)
     return db_product
 
@@ -218,27 +263,18 @@ async def get_product_base_prices(
     db: Session = Depends(get_db)
 ):
     """Get base prices for a product. By default returns only current price."""
-    product = db.query(Product).filter(Product.code == product_code).first()
-    if not product:
+    product_id = product_id_for_code(db, product_code)
+    if product_id is None:
         raise HTTPException(status_code=404, detail=f"Product {product_code} not found")
 
-    query = db.query(ProductBasePrice).filter(ProductBasePrice.product_id == product.id)
-
     if not include_history:
-        # Get current price only (valid_to is NULL or in future)
-        now = datetime.now(timezone.utc)
-        query = query.filter(
-            and_(
-                ProductBasePrice.valid_from <= now,
-                or_(
-                    ProductBasePrice.valid_to == None,
-                    ProductBasePrice.valid_to > now
-                )
-            )
-        )
+        # Current price only
+        base_price, _ = resolve_price(db, product_id, at=datetime.now(timezone.utc))
+        return [base_price] if base_price else []
 
-    prices = query.order_by(ProductBasePrice.valid_from.desc()).all()
-    return prices
+    return db.query(ProductBasePrice).filter(
+        ProductBasePrice.product_id == product_id
+    ).order_by(ProductBasePrice.valid_from.desc()).all()
 
 
 @router.post("/products/{product_code}/base-prices", response_model=ProductBasePriceResponse)
@@ -248,8 +284,8 @@ async def create_product_base_price(
     db: Session = Depends(get_db)
 ):
     """Create a new base price for a product. Automatically closes previous price."""
-    product = db.query(Product).filter(Product.code == product_code).first()
-    if not product:
+    product_id = product_id_for_code(db, product_code)
+    if product_id is None:
         raise HTTPException(status_code=404, detail=f"Product {product_code} not found")
 
     # Calculate C0 and Cmin
@@ -264,7 +300,7 @@ async def create_product_base_price(
     now = datetime.now(timezone.utc)
     existing_open_prices = db.query(ProductBasePrice).filter(
         and_(
-            ProductBasePrice.product_id == product.id,
+            ProductBasePrice.product_id == product_id,
             ProductBasePrice.valid_to == None,
             ProductBasePrice.valid_from < valid_from
         )
@@ -275,7 +311,7 @@ async def create_product_base_price(
 
     # Create new price
     db_price = ProductBasePrice(
-        product_id=product.id,
+        product_id=product_id,
         lc=lc,
         c0=c0,
         cmin=cmin,
@@ -287,7 +323,12 @@ async def create_product_base_price(
     )
 
     db.add(db_price)
+    db.flush()
+    refresh_price_thresholds(db, product_ids=[product_id])
     db.commit()
+    pricing_catalog.invalidate_products_with_prices()
+    # valid_from may be backdated, which changes margins of past sales
+    margin_analytics.invalidate_margin_analytics()
     db.refresh(db_price)
     return db_price
 
@@ -304,11 +345,16 @@ async def get_product_customer_prices(
     db: Session = Depends(get_db)
 ):
     """Get customer-specific prices for a product."""
-    product = db.query(Product).filter(Product.code == product_code).first()
-    if not product:
+    product_id = product_id_for_code(db, product_code)
+    if product_id is None:
         raise HTTPException(status_code=404, detail=f"Product {product_code} not found")
 
-    query = db.query(CustomerProductPrice).filter(CustomerProductPrice.product_id == product.id)
+    if customer_id and not include_history:
+        # Current price of one customer
+        _, customer_price = resolve_price(db, product_id, customer_id, datetime.now(timezone.utc))
+        return [customer_price] if customer_price and customer_price.is_active else []
+
+    query = db.query(CustomerProductPrice).filter(CustomerProductPrice.product_id == product_id)
 
     if customer_id:
         query = query.filter(CustomerProductPrice.customer_id == customer_id)
@@ -319,11 +365,7 @@ async def get_product_customer_prices(
         query = query.filter(
             and_(
                 CustomerProductPrice.is_active == True,
-                CustomerProductPrice.valid_from <= now,
-                or_(
-                    CustomerProductPrice.valid_to == None,
-                    CustomerProductPrice.valid_to > now
-                )
+                customer_price_valid_at(now)
             )
         )
 
@@ -338,22 +380,13 @@ async def create_customer_product_price(
     db: Session = Depends(get_db)
 ):
     """Create a new customer-specific price for a product."""
-    product = db.query(Product).filter(Product.code == product_code).first()
-    if not product:
+    product_id = product_id_for_code(db, product_code)
+    if product_id is None:
         raise HTTPException(status_code=404, detail=f"Product {product_code} not found")
 
     # Get current base price to calculate coverage
     now = datetime.now(timezone.utc)
-    base_price = db.query(ProductBasePrice).filter(
-        and_(
-            ProductBasePrice.product_id == product.id,
-            ProductBasePrice.valid_from <= now,
-            or_(
-                ProductBasePrice.valid_to == None,
-                ProductBasePrice.valid_to > now
-            )
-        )
-    ).first()
+    base_price, _ = resolve_price(db, product_id, at=now)
 
     if not base_price:
         raise HTTPException(status_code=400, detail=f"No base price found for product {product_code}")
@@ -373,7 +406,7 @@ async def create_customer_product_price(
     # Close previous prices for same customer
     existing_open_prices = db.query(CustomerProductPrice).filter(
         and_(
-            CustomerProductPrice.product_id == product.id,
+            CustomerProductPrice.product_id == product_id,
             CustomerProductPrice.customer_id == price.customer_id,
             CustomerProductPrice.valid_to == None,
             CustomerProductPrice.valid_from < valid_from
@@ -386,7 +419,7 @@ async def create_customer_product_price(
 
     # Create new price
     db_price = CustomerProductPrice(
-        product_id=product.id,
+        product_id=product_id,
         customer_id=price.customer_id,
         customer_name=price.customer_name,
         customer_type=price.customer_type,
@@ -411,22 +444,80 @@ async def create_customer_product_price(
     return db_price
 
 
+# ============================================================================
+# Price Evaluation Endpoints
+# ============================================================================
+
+@router.post("/evaluate")
+async def evaluate_prices(request: PriceEvaluationRequest, db: Session = Depends(get_db)):
+    """
+    Evaluate proposed customer prices without saving them.
+    Computes CP, realized price and coverage vs C0/Cmin for every cell
+    against the base prices valid at `at` (default: now).
+    """
+    frames = []
+    if request.items:
+        frames.append(pd.DataFrame([item.model_dump() for item in request.items]))
+    if request.customers and request.products:
+        customers_df = pd.DataFrame([c.model_dump() for c in request.customers])
+        products_df = pd.DataFrame([p.model_dump() for p in request.products])
+        frames.append(customers_df.merge(products_df, how='cross'))
+
+    if not frames:
+        raise HTTPException(status_code=400, detail="Provide items, or both customers and products")
+
+    cells = pd.concat(frames, ignore_index=True)
+    evaluated, summary = evaluate_price_matrix(db, cells, request.at)
+
+    results = evaluated.astype(object).where(pd.notna(evaluated), None).to_dict('records')
+    return JSONResponse(content={
+        "at": (request.at or datetime.now(timezone.utc)).isoformat(),
+        "summary": summary,
+        "results": results
+    })
+
+
 # ============================================================================
 # Excel Upload Endpoint
 # ============================================================================
 
+async def _enqueue_upload(
+    file: UploadFile,
+    data_type: str,
+    background_tasks: BackgroundTasks,
+    db: Session
+) -> JSONResponse:
+    """Queue an uploaded file as a background pricing upload job (202 with the job status)."""
+    contents = await file.read()
+    job = pricing_jobs.enqueue_pricing_upload(db, file.filename, contents, data_type)
+
+    background_tasks.add_task(pricing_jobs.run_pricing_upload_job, job.id)
+
+    return JSONResponse(status_code=202, content=jsonable_encoder(pricing_jobs.job_status(job)))
+
+
 @router.post("/upload-excel")
 async def upload_excel_pricing(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Only report how base prices would change"),
     db: Session = Depends(get_db)
 ):
     """
     Upload Excel file with pricing data.
     Expected sheets: 'Izdelki' and 'Cene_Kupci'.
+    Base prices are only replaced for products whose LC changed.
+
+    The file is applied by a background job: the response (202) is the
+    queued job, poll GET /upload-jobs/{job_id} for progress and row errors.
+    A dry run checks the file and reports base price changes right away.
     """
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="File must be Excel format (.xlsx or .xls)")
 
+    if not dry_run:
+        return await _enqueue_upload(file, pricing_jobs.WORKBOOK_JOB, background_tasks, db)
+
     try:
         # Read Excel file
         contents = await file.read()
@@ -442,178 +533,47 @@ async def upload_excel_pricing(
         cene_kupci_df = pd.read_excel(contents, sheet_name='Cene_Kupci')
 
         # Validate columns
-        required_izdelki_cols = ['šifra', 'naziv', 'enota', 'industrija', 'lc', 'aktiven']
-        required_cene_cols = ['šifra', 'kupec_id', 'kupec_naziv', 'kupec_tip', 'strategic_cmin',
-                              'popust_faktura', 'popust_marketing', 'popust_letni', 'aktiven']
-
-        missing_izdelki = set(required_izdelki_cols) - set(izdelki_df.columns)
-        missing_cene = set(required_cene_cols) - set(cene_kupci_df.columns)
+        missing_izdelki = set(pricing_jobs.REQUIRED_IZDELKI_COLUMNS) - set(izdelki_df.columns)
+        missing_cene = set(pricing_jobs.REQUIRED_CENE_COLUMNS) - set(cene_kupci_df.columns)
 
         if missing_izdelki:
             raise HTTPException(status_code=400, detail=f"Missing columns in Izdelki: {missing_izdelki}")
         if missing_cene:
             raise HTTPException(status_code=400, detail=f"Missing columns in Cene_Kupci: {missing_cene}")
 
-        # Process products
-        products_created = 0
-        base_prices_created = 0
-        customer_prices_created = 0
-
-        for _, row in izdelki_df.iterrows():
-            if str(row['aktiven']).upper() not in ['DA', 'YES', 'TRUE', '1']:
-                continue
-
-            # Get or create industry
-            industry = db.query(Industry).filter(Industry.name_sl == row['industrija']).first()
-            if not industry:
-                # Try Croatian name too
-                industry = db.query(Industry).filter(Industry.name_hr == row['industrija']).first()
-
-            if not industry:
-                raise HTTPException(status_code=400, detail=f"Unknown industry: {row['industrija']}")
-
-            # Get or create product
-            product = db.query(Product).filter(Product.code == row['šifra']).first()
-            if not product:
-                product = Product(
-                    code=row['šifra'],
-                    name_sl=row['naziv'],
-                    name_hr=row['naziv'],  # Same for now, can be different if needed
-                    unit=row['enota'],
-                    industry_id=industry.id,
-                    is_active=True
-                )
-                db.add(product)
-                db.flush()
-                products_created += 1
-
-            # Create base price
-            lc = float(row['lc'])
-            oh_factor = 1.25
-            min_profit_margin = 0.0425
-            c0 = lc * oh_factor
-            cmin = c0 / (1 - min_profit_margin)
-
-            # Check for existing open price
-            now = datetime.now(timezone.utc)
-            existing = db.query(ProductBasePrice).filter(
-                and_(
-                    ProductBasePrice.product_id == product.id,
-                    ProductBasePrice.valid_to == None
-                )
-            ).first()
-
-            if existing:
-                existing.valid_to = now
-
-            base_price = ProductBasePrice(
-                product_id=product.id,
-                lc=lc,
-                c0=c0,
-                cmin=cmin,
-                oh_factor=oh_factor,
-                min_profit_margin=min_profit_margin,
-                valid_from=now,
-                valid_to=None
-            )
-            db.add(base_price)
-            base_prices_created += 1
-
-        # Process customer prices
-        for _, row in cene_kupci_df.iterrows():
-            if str(row['aktiven']).upper() not in ['DA', 'YES', 'TRUE', '1']:
-                continue
-
-            product = db.query(Product).filter(Product.code == row['šifra']).first()
-            if not product:
-                continue  # Skip if product doesn't exist
-
-            # Get current base price
-            base_price = db.query(ProductBasePrice).filter(
-                and_(
-                    ProductBasePrice.product_id == product.id,
-                    ProductBasePrice.valid_to == None
-                )
-            ).first()
-
-            if not base_price:
-                continue
-
-            # Calculate prices
-            strategic_cmin = float(row['strategic_cmin'])
-            discount_invoice = float(row['popust_faktura'])
-            discount_marketing = float(row['popust_marketing'])
-            discount_yearend = float(row['popust_letni'])
-            total_discounts = discount_invoice + discount_marketing + discount_yearend
-
-            cp = strategic_cmin / (1 - total_discounts / 100)
-            realized_price = cp * (1 - total_discounts / 100)
-            coverage_vs_c0 = (realized_price / base_price.c0) * 100
-            coverage_vs_cmin = (realized_price / base_price.cmin) * 100
-
-            # Close existing price for this customer
-            now = datetime.now(timezone.utc)
-            existing = db.query(CustomerProductPrice).filter(
-                and_(
-                    CustomerProductPrice.product_id == product.id,
-                    CustomerProductPrice.customer_id == row['kupec_id'],
-                    CustomerProductPrice.valid_to == None
-                )
-            ).first()
-
-            if existing:
-                existing.valid_to = now
-                existing.is_active = False
-
-            # Create new price
-            customer_price = CustomerProductPrice(
-                product_id=product.id,
-                customer_id=row['kupec_id'],
-                customer_name=row['kupec_naziv'],
-                customer_type=row['kupec_tip'],
-                strategic_cmin=strategic_cmin,
-                discount_invoice=discount_invoice,
-                discount_marketing=discount_marketing,
-                discount_yearend=discount_yearend,
-                total_discounts=total_discounts,
-                cp=cp,
-                realized_price=realized_price,
-                coverage_vs_c0=coverage_vs_c0,
-                coverage_vs_cmin=coverage_vs_cmin,
-                valid_from=now,
-                valid_to=None,
-                is_active=True
-            )
-            db.add(customer_price)
-            customer_prices_created += 1
-
-        db.commit()
-
         return {
-            "status": "success",
-            "message": "Pricing data uploaded successfully",
-            "products_created": products_created,
-            "base_prices_created": base_prices_created,
-            "customer_prices_created": customer_prices_created
+            "status": "dry_run",
+            **PricingImporter(db).diff_products_sheet(izdelki_df)
         }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error processing Excel file: {str(e)}")
 
 
 @router.post("/upload-simple-excel")
 async def upload_simple_excel_pricing(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Only report how base prices would change"),
     db: Session = Depends(get_db)
 ):
     """
     Upload Excel file with simple 3-column format (Article Code, Article Name, LC Price).
     Handles files with or without headers.
+    Base prices are only replaced for products whose LC changed.
+
+    The file is applied by a background job: the response (202) is the
+    queued job, poll GET /upload-jobs/{job_id} for progress and row errors.
+    A dry run checks the file and reports base price changes right away.
     """
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="File must be Excel format (.xlsx or .xls)")
 
+    if not dry_run:
+        return await _enqueue_upload(file, pricing_jobs.SIMPLE_JOB, background_tasks, db)
+
     try:
         # Read Excel file
         contents = await file.read()
@@ -623,24 +583,7 @@ async def upload_simple_excel_pricing(
         headers = df.columns.tolist()
 
         # Find article code column (can be __EMPTY, šifra, article, etc.)
-        code_col = None
-        name_col = None
-        lc_col = None
-
-        for h in headers:
-            h_str = str(h)
-            if h_str == '__EMPTY' and code_col is None:
-                code_col = h
-            elif h_str == '__EMPTY_1' and name_col is None:
-                name_col = h
-            elif h_str.upper() == 'LC':
-                lc_col = h
-            elif not code_col and any(x in h_str.lower() for x in ['šifra', 'artikel', 'article', 'number', 'broj']):
-                code_col = h
-            elif not name_col and any(x in h_str.lower() for x in ['naziv', 'name', 'ime']):
-                name_col = h
-            elif not lc_col and any(x in h_str.lower() for x in ['cena', 'price', 'cijena']):
-                lc_col = h
+        code_col, name_col, lc_col = detect_simple_price_list_columns(headers)
 
         if not code_col or not name_col or not lc_col:
             raise HTTPException(
@@ -648,176 +591,116 @@ async def upload_simple_excel_pricing(
                 detail=f"Could not identify required columns. Found: {headers}"
             )
 
-        # Get or create "imported-products" industry
-        industry = db.query(Industry).filter(Industry.code == 'imported-products').first()
-        if not industry:
-            industry = Industry(
-                code='imported-products',
-                name_sl='Uvoženi proizvodi',
-                name_hr='Uvezeni proizvodi',
-                icon='[Upload]',
-                is_active=True
-            )
-            db.add(industry)
-            db.flush()
-
-        # Process products
-        products_created = 0
-        products_updated = 0
-        base_prices_created = 0
-        now = datetime.now(timezone.utc)
-
-        for _, row in df.iterrows():
-            try:
-                code = str(row[code_col]).strip() if pd.notna(row[code_col]) else ''
-                name = str(row[name_col]).strip() if pd.notna(row[name_col]) else ''
-                lc_value = float(row[lc_col]) if pd.notna(row[lc_col]) else 0
-
-                # Skip invalid rows
-                if not code or not name or lc_value <= 0:
-                    continue
-
-                # Get or create product
-                product = db.query(Product).filter(Product.code == code).first()
-                if not product:
-                    product = Product(
-                        code=code,
-                        name_sl=name,
-                        name_hr=name,
-                        unit='kg',
-                        industry_id=industry.id,
-                        is_active=True
-                    )
-                    db.add(product)
-                    db.flush()
-                    products_created += 1
-                else:
-                    # Update existing product
-                    product.name_sl = name
-                    product.name_hr = name
-                    product.is_active = True
-                    products_updated += 1
-
-                # Calculate prices
-                oh_factor = 1.25
-                min_profit_margin = 0.0425
-                c0 = lc_value * oh_factor
-                cmin = c0 / (1 - min_profit_margin)
-
-                # Close existing open prices
-                existing = db.query(ProductBasePrice).filter(
-                    and_(
-                        ProductBasePrice.product_id == product.id,
-                        ProductBasePrice.valid_to == None
-                    )
-                ).first()
-
-                if existing:
-                    existing.valid_to = now
-
-                # Create new base price
-                base_price = ProductBasePrice(
-                    product_id=product.id,
-                    lc=lc_value,
-                    c0=c0,
-                    cmin=cmin,
-                    oh_factor=oh_factor,
-                    min_profit_margin=min_profit_margin,
-                    valid_from=now,
-                    valid_to=None
-                )
-                db.add(base_price)
-                base_prices_created += 1
-
-            except Exception as e:
-                print(f"Error processing row: {e}")
-                continue
-
-        db.commit()
-
         return {
-            "status": "success",
-            "message": "Simple pricing data uploaded successfully",
-            "products_created": products_created,
-            "products_updated": products_updated,
-            "base_prices_created": base_prices_created
+            "status": "dry_run",
+            **PricingImporter(db).diff_simple_price_list(df, code_col, name_col, lc_col)
         }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        db.rollback()
         error_msg = f"Error processing Excel file: {str(e)}"
         print(f"❌ {error_msg}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=error_msg)
 
 
-@router.get("/products-with-prices")
-async def get_products_with_prices(db: Session = Depends(get_db)):
+# ============================================================================
+# Margin Analytics
+# ============================================================================
+
+@router.get("/analytics/margins")
+async def get_margin_analytics(
+    period_from: str = Query(..., regex=r"^\d{4}-\d{2}$", description="First month, YYYY-MM"),
+    period_to: str = Query(..., regex=r"^\d{4}-\d{2}$", description="Last month (inclusive), YYYY-MM"),
+    group_by: List[str] = Query(["product"], description="Any of: customer, product, industry, month"),
+    db: Session = Depends(get_db)
+):
     """
-    Get all active products grouped by industry with their current base prices.
-    Returns data in format suitable for the pricing UI.
+    Realized margin and coverage of invoiced sales against the C0/Cmin
+    valid on each invoice date, aggregated by the requested dimensions.
     """
     try:
-        # Get all active industries
-        industries = db.query(Industry).filter(Industry.is_active == True).all()
-
-        result = {
-            "industries": [],
-            "products": []
+        return {
+            "period_from": period_from,
+            "period_to": period_to,
+            "group_by": group_by,
+            **margin_analytics.margin_analytics(db, period_from, period_to, group_by)
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        now = datetime.now(timezone.utc)
 
-        for industry in industries:
-            industry_data = {
-                "id": industry.code,
-                "code": industry.code,
-                "nameSl": industry.name_sl,
-                "nameHr": industry.name_hr,
-                "icon": industry.icon,
-                "products": []
-            }
+# ============================================================================
+# Background Upload Jobs
+# ============================================================================
+
+@router.post("/upload-jobs", status_code=202)
+async def create_pricing_upload_job(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: str = Query("workbook", regex="^(workbook|simple)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue an Excel pricing upload for background processing.
+    format: 'workbook' (Izdelki + Cene_Kupci sheets) or 'simple' (code, name, LC).
+    Poll GET /upload-jobs/{job_id} for progress.
+    """
+    if not file.filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="File must be Excel format (.xlsx or .xls)")
+
+    data_type = pricing_jobs.WORKBOOK_JOB if format == "workbook" else pricing_jobs.SIMPLE_JOB
+    return await _enqueue_upload(file, data_type, background_tasks, db)
+
 
-            # Get products for this industry
-            products = db.query(Product).filter(
-                and_(
-                    Product.industry_id == industry.id,
-                    Product.is_active == True
-                )
-            ).all()
-
-            for product in products:
-                # Get current base price
-                base_price = db.query(ProductBasePrice).filter(
-                    and_(
-                        ProductBasePrice.product_id == product.id,
-                        ProductBasePrice.valid_from <= now,
-                        or_(
-                            ProductBasePrice.valid_to == None,
-                            ProductBasePrice.valid_to > now
-                        )
-                    )
-                ).first()
-
-                if base_price:
-                    product_data = {
-                        "id": f"db-{product.id}",
-                        "code": product.code,
-                        "nameSl": product.name_sl,
-                        "nameHr": product.name_hr,
-                        "unit": product.unit,
-                        "lc": base_price.lc
-                    }
-                    industry_data["products"].append(product_data)
-
-            if industry_data["products"]:  # Only add industry if it has products
-                result["industries"].append(industry_data)
-
-        return result
+@router.get("/upload-jobs/{job_id}")
+async def get_pricing_upload_job(job_id: int, db: Session = Depends(get_db)):
+    """Get status, progress and row errors of a pricing upload job."""
+    job = db.query(UploadHistory).filter(UploadHistory.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Upload job {job_id} not found")
+    return pricing_jobs.job_status(job)
 
+
+@router.post("/upload-jobs/{job_id}/resume", status_code=202)
+async def resume_pricing_upload_job(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Resume a failed upload job from its last committed chunk."""
+    job = db.query(UploadHistory).filter(UploadHistory.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Upload job {job_id} not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Upload job already completed")
+
+    if job.status == "failed":
+        job.status = "queued"
+        db.commit()
+
+    background_tasks.add_task(pricing_jobs.run_pricing_upload_job, job.id)
+    return pricing_jobs.job_status(job)
+
+
+@router.get("/products-with-prices")
+async def get_products_with_prices(request: Request, db: Session = Depends(get_db)):
+    """
+    Get all active products grouped by industry with their current base prices.
+    Returns data in format suitable for the pricing UI.
+    Supports If-None-Match: returns 304 when the catalogue has not changed.
+    """
+    try:
+        payload, etag = pricing_catalog.get_products_with_prices(db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
 
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(content=jsonable_encoder(payload), headers={"ETag": etag})
+
 
 # ============================================================================
 # Pricing History Endpoints
@@ -829,7 +712,8 @@ async def get_product_pricing_history(
     db: Session = Depends(get_db)
 ):
     """Get complete pricing history for a product."""
-    product = db.query(Product).filter(Product.code == product_code).first()
+    product_id = product_id_for_code(db, product_code)
+    product = db.get(Product, product_id) if product_id is not None else None
     if not product:
         raise HTTPException(status_code=404, detail=f"Product {product_code} not found")
 
@@ -883,6 +767,66 @@ async def get_product_pricing_history(
     }
 
 
+@router.get("/history")
+async def list_pricing_history(
+    kind: str = Query("base", regex="^(base|customer)$"),
+    product_code: Optional[str] = None,
+    industry_code: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    after_id: Optional[int] = Query(None, description="Cursor: id of the last row of the previous page"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Page through pricing history of a product, an industry or the whole catalogue.
+
+    Uses keyset pagination: pass the returned next_cursor as after_id to get
+    the next page.
+    """
+    stmt = pricing_history.history_query(
+        kind, product_code, industry_code, date_from, date_to, after_id
+    ).limit(limit)
+    items = [dict(row._mapping) for row in db.execute(stmt)]
+
+    return {
+        "kind": kind,
+        "items": items,
+        "next_cursor": items[-1]["id"] if len(items) == limit else None
+    }
+
+
+@router.get("/history/export")
+async def export_pricing_history(
+    kind: str = Query("base", regex="^(base|customer)$"),
+    format: str = Query("ndjson", regex="^(ndjson|csv|parquet)$"),
+    product_code: Optional[str] = None,
+    industry_code: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """
+    Stream pricing history as NDJSON, CSV or Parquet.
+
+    Rows are read with a server-side cursor and written out batch by batch.
+    NDJSON and CSV are gzip-compressed in transit when the client accepts it;
+    Parquet is compressed with zstd.
+    """
+    stmt = pricing_history.history_query(kind, product_code, industry_code, date_from, date_to)
+
+    try:
+        body = pricing_history.export_history(stmt, kind, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"pricing_history_{kind}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=pricing_history.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 # ========================================
 # Industry Production Factors
 # ========================================
@@ -955,6 +899,8 @@ async def update_production_factor(
         # Update existing factor
         factor.production_factor = update.production_factor
 
+    db.flush()
+    refresh_price_thresholds(db, industry_id=industry.id)
     db.commit()
     db.refresh(factor)
 
@@ -966,3 +912,39 @@ async def update_production_factor(
         "industry_name_hr": industry.name_hr,
         "production_factor": factor.production_factor
     }
+
+
+@router.post("/production-factors/thresholds/rebuild")
+async def rebuild_price_thresholds(db: Session = Depends(get_db)):
+    """
+    Recompute the production price threshold (LC × production factor) of every product.
+    Thresholds are kept up to date on base price and factor writes; this is for backfills.
+    """
+    try:
+        thresholds = refresh_price_thresholds(db)
+        db.commit()
+        return {"status": "success", "thresholds": thresholds}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error rebuilding thresholds: {str(e)}")
+
+
+@router.get("/customer-prices/below-threshold")
+async def get_customer_prices_below_threshold(
+    industry_code: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    after_id: Optional[int] = Query(None, description="Cursor: customer_price_id of the last row of the previous page"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    List customer prices valid today whose realized price is below the
+    production price threshold (LC × industry production factor).
+    """
+    items = below_threshold_prices(db, industry_code, customer_id, after_id, limit)
+    # Keep thresholds refreshed on the way
+    db.commit()
+    return {
+        "items": items,
+        "next_cursor": items[-1]["customer_price_id"] if len(items) == limit else None
+    }
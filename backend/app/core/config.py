@@ -84,8 +84,41 @@ class Settings(BaseSettings):
 
     # ML Configuration
     MODEL_TRAINING_TIMEOUT_SECONDS: int = Field(default=300, env="MODEL_TRAINING_TIMEOUT_SECONDS")
+    # Training jobs run concurrently per API worker (each in its own process)
+    MODEL_TRAINING_WORKERS: int = Field(default=1, env="MODEL_TRAINING_WORKERS")
     MODEL_CACHE_TTL_SECONDS: int = Field(default=3600, env="MODEL_CACHE_TTL_SECONDS")
+    # Model artifacts; must be shared by all workers (and hosts) serving predictions
+    MODEL_STORAGE_DIR: str = Field(default="/tmp/models", env="MODEL_STORAGE_DIR")
+    # How often each worker checks ml_models for a newly activated version
+    MODEL_REGISTRY_POLL_SECONDS: int = Field(default=10, env="MODEL_REGISTRY_POLL_SECONDS")
+    # Loaded model versions kept per worker (for instant rollback)
+    MODEL_REGISTRY_MAX_LOADED: int = Field(default=4, env="MODEL_REGISTRY_MAX_LOADED")
+    MODEL_LOAD_WORKERS: int = Field(default=2, env="MODEL_LOAD_WORKERS")
+    # gzip model artifact files (smaller artifacts, slower loads)
+    MODEL_ARTIFACT_COMPRESSION: bool = Field(default=False, env="MODEL_ARTIFACT_COMPRESSION")
     PREDICTION_BATCH_SIZE: int = Field(default=1000, env="PREDICTION_BATCH_SIZE")
+    # Stored predictions older than this are re-scored instead of reused
+    PREDICTION_REUSE_MAX_AGE_HOURS: int = Field(default=24, env="PREDICTION_REUSE_MAX_AGE_HOURS")
+    CUSTOMER_FORECAST_CACHE_SIZE: int = Field(default=10000, env="CUSTOMER_FORECAST_CACHE_SIZE")
+    CUSTOMER_FORECAST_CACHE_TTL_SECONDS: int = Field(default=3600, env="CUSTOMER_FORECAST_CACHE_TTL_SECONDS")
+    # Days of Prophet forecast computed when a cash flow forecaster is loaded (0: on first request)
+    TIMESERIES_PRECOMPUTE_DAYS: int = Field(default=365, env="TIMESERIES_PRECOMPUTE_DAYS")
+    # Limits per Monte Carlo cash flow request: scenarios x pending invoices
+    # (sampling time) and scenarios x days (memory, ~8 bytes per cell per array)
+    CASHFLOW_SIMULATION_MAX_SAMPLES: int = Field(default=50_000_000, env="CASHFLOW_SIMULATION_MAX_SAMPLES")
+    CASHFLOW_SIMULATION_MAX_DAY_CELLS: int = Field(default=5_000_000, env="CASHFLOW_SIMULATION_MAX_DAY_CELLS")
+    # Hour of day (server local time) of the daily cash flow forecast snapshot job
+    FORECAST_SNAPSHOT_HOUR: int = Field(default=5, env="FORECAST_SNAPSHOT_HOUR")
+
+    # Pricing
+    PRICING_CATALOG_CACHE_TTL_SECONDS: int = Field(default=300, env="PRICING_CATALOG_CACHE_TTL_SECONDS")
+    PRICING_UPLOAD_CHUNK_SIZE: int = Field(default=2000, env="PRICING_UPLOAD_CHUNK_SIZE")
+    PRICING_UPLOAD_STALE_SECONDS: int = Field(default=300, env="PRICING_UPLOAD_STALE_SECONDS")
+    # Uploaded LC values within this distance of the current LC count as unchanged
+    PRICING_LC_CHANGE_TOLERANCE: float = Field(default=0.0001, env="PRICING_LC_CHANGE_TOLERANCE")
+    PRICING_ANALYTICS_CACHE_TTL_SECONDS: int = Field(default=3600, env="PRICING_ANALYTICS_CACHE_TTL_SECONDS")
+    PRICING_IDENTITY_CACHE_SIZE: int = Field(default=50000, env="PRICING_IDENTITY_CACHE_SIZE")
+    PRICING_IDENTITY_CACHE_TTL_SECONDS: int = Field(default=600, env="PRICING_IDENTITY_CACHE_TTL_SECONDS")
 
     # Feature Engineering
     MIN_CUSTOMER_HISTORY_DAYS: int = Field(default=90, env="MIN_CUSTOMER_HISTORY_DAYS")
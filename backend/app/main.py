@@ -17,6 +17,10 @@ except ImportError:
 
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.services.pricing_jobs import resume_pricing_upload_jobs
+from app.services.forecast_snapshots import start_forecast_snapshot_scheduler
+from app.services.model_registry import model_registry
+from app.services.model_training import resume_training_jobs
 
 # Initialize Sentry if DSN is provided and sentry is available
 if SENTRY_AVAILABLE and settings.SENTRY_DSN:
@@ -52,6 +56,33 @@ if SENTRY_AVAILABLE and settings.SENTRY_DSN:
 app.include_router(api_router, prefix="/api/v1")
 
 
+@app.on_event("startup")
+async def resume_background_jobs():
+    """
+    Resume pricing upload and training jobs interrupted by a restart, start
+    the forecast snapshot scheduler and start loading the active models.
+    """
+    try:
+        resume_pricing_upload_jobs()
+    except Exception as e:
+        print(f"Warning: could not resume pricing upload jobs: {e}")
+
+    try:
+        resume_training_jobs()
+    except Exception as e:
+        print(f"Warning: could not resume training jobs: {e}")
+
+    try:
+        start_forecast_snapshot_scheduler()
+    except Exception as e:
+        print(f"Warning: could not start forecast snapshot scheduler: {e}")
+
+    try:
+        model_registry.start_polling()
+    except Exception as e:
+        print(f"Warning: could not start model registry polling: {e}")
+
+
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
@@ -2,12 +2,14 @@
 Feature engineering for payment prediction.
 """
 
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pandas as pd
+from datetime import date, datetime
+from typing import List, Optional
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from app.models.customer import Customer
+from app.ml.features import feature_store
 from app.models.invoice import Invoice
 from app.models.payment import Payment
 
@@ -20,136 +22,184 @@ class FeatureEngineer:
     def __init__(self, db: Session):
         self.db = db
 
-    def extract_customer_features(self, customer_id: int) -> dict:
-        """
-        Extract features from customer payment history.
+    def extract_customer_features(self, customer_ids: List[int], as_of: Optional[date] = None) -> pd.DataFrame:
         """
-        payments = self.db.query(Payment).join(Invoice).filter(
-            Invoice.customer_id == customer_id
-        ).all()
-
-        if not payments:
-            return self._default_customer_features()
-
-        delays = [p.delay_days for p in payments if p.delay_days is not None]
-        amounts = [p.amount for p in payments]
-
-        features = {
-            'avg_payment_delay_days': np.mean(delays) if delays else 0,
-            'payment_delay_std': np.std(delays) if len(delays) > 1 else 0,
-            'on_time_payment_rate': len([d for d in delays if d <= 0]) / len(delays) if delays else 0.5,
-            'late_payment_rate': len([d for d in delays if d > 0]) / len(delays) if delays else 0.5,
-            'very_late_payment_rate': len([d for d in delays if d > 30]) / len(delays) if delays else 0,
-            'avg_payment_amount': np.mean(amounts) if amounts else 0,
-            'payment_count_total': len(payments),
-            'payment_count_last_3_months': len([
-                p for p in payments
-                if (datetime.now().date() - p.payment_date).days <= 90
-            ]),
-            'payment_count_last_6_months': len([
-                p for p in payments
-                if (datetime.now().date() - p.payment_date).days <= 180
-            ]),
-            'recency_days': (datetime.now().date() - max([p.payment_date for p in payments])).days if payments else 999,
-        }
+        Read payment history features for many customers from the feature store.
 
-        return features
+        Args:
+            customer_ids: Customers to look up
+            as_of: Only payments up to the end of this day count (default: today)
 
-    def extract_invoice_features(self, invoice: Invoice) -> dict:
+        Returns:
+            DataFrame indexed by customer_id; customers without payments get
+            the default features
         """
-        Extract features from invoice.
+        return feature_store.customer_features(self.db, customer_ids, as_of)
+
+    def extract_invoice_features(
+        self,
+        invoices: pd.DataFrame,
+        customer_features: pd.DataFrame,
+        as_of: Optional[pd.Series] = None
+    ) -> pd.DataFrame:
         """
-        today = datetime.now().date()
-
-        # Get customer's average amount
-        customer_payments = self.db.query(Payment).join(Invoice).filter(
-            Invoice.customer_id == invoice.customer_id
-        ).all()
-
-        avg_customer_amount = np.mean([p.amount for p in customer_payments]) if customer_payments else invoice.amount
-
-        features = {
-            'invoice_amount': invoice.amount,
-            'days_until_due': (invoice.due_date - today).days,
-            'invoice_age_days': (today - invoice.invoice_date).days,
-            'amount_vs_customer_avg': invoice.amount / avg_customer_amount if avg_customer_amount > 0 else 1.0,
-            'is_high_amount': 1 if invoice.amount > avg_customer_amount * 1.5 else 0,
-        }
-
-        return features
+        Extract invoice features column-wise.
 
-    def extract_temporal_features(self, date: datetime.date) -> dict:
+        Args:
+            invoices: DataFrame with customer_id, amount, invoice_date and due_date
+            customer_features: Customer features aligned with invoices (same index)
+            as_of: Per-invoice reference dates for due/age day counts (default: today)
         """
-        Extract temporal features from date.
+        today = pd.Timestamp(datetime.now().date()) if as_of is None else pd.to_datetime(as_of)
+        amount = invoices['amount'].astype(float)
+
+        # Customer's average payment amount, or the invoice amount without payment history
+        has_history = customer_features['payment_count_total'] > 0
+        avg_customer_amount = amount.where(~has_history, customer_features['avg_payment_amount'])
+
+        return pd.DataFrame({
+            'invoice_amount': amount,
+            'days_until_due': (pd.to_datetime(invoices['due_date']) - today).dt.days,
+            'invoice_age_days': (today - pd.to_datetime(invoices['invoice_date'])).dt.days,
+            'amount_vs_customer_avg': (amount / avg_customer_amount).where(avg_customer_amount > 0, 1.0),
+            'is_high_amount': (amount > avg_customer_amount * 1.5).astype(int),
+        }, index=invoices.index)
+
+    def extract_temporal_features(self, dates: pd.Series) -> pd.DataFrame:
         """
-        features = {
-            'month': date.month,
-            'quarter': (date.month - 1) // 3 + 1,
-            'day_of_week': date.weekday(),
-            'day_of_month': date.day,
-            'is_month_start': 1 if date.day <= 7 else 0,
-            'is_month_end': 1 if date.day >= 23 else 0,
-            'is_quarter_end': 1 if date.month in [3, 6, 9, 12] and date.day >= 23 else 0,
-            'is_weekend': 1 if date.weekday() >= 5 else 0,
-        }
-
-        return features
+        Extract temporal features from dates.
+        """
+        dates = pd.to_datetime(dates)
+        month = dates.dt.month
+        day = dates.dt.day
+        weekday = dates.dt.weekday
+
+        return pd.DataFrame({
+            'month': month,
+            'quarter': (month - 1) // 3 + 1,
+            'day_of_week': weekday,
+            'day_of_month': day,
+            'is_month_start': (day <= 7).astype(int),
+            'is_month_end': (day >= 23).astype(int),
+            'is_quarter_end': (month.isin([3, 6, 9, 12]) & (day >= 23)).astype(int),
+            'is_weekend': (weekday >= 5).astype(int),
+        }, index=dates.index)
 
     def create_feature_vector(self, invoice: Invoice) -> dict:
         """
         Create complete feature vector for an invoice.
         """
-        customer_features = self.extract_customer_features(invoice.customer_id)
-        invoice_features = self.extract_invoice_features(invoice)
-        temporal_features = self.extract_temporal_features(invoice.due_date)
+        return self.create_feature_matrix([invoice]).to_dict('records')[0]
 
-        # Combine all features
-        features = {
-            **customer_features,
-            **invoice_features,
-            **temporal_features
-        }
+    def create_feature_matrix(
+        self,
+        invoices: List[Invoice],
+        feature_columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Create feature vectors for many invoices as of today, one row per
+        invoice indexed by invoice id.
 
+        Args:
+            invoices: Invoices to featurize
+            feature_columns: Column order to return (e.g. PaymentPredictor.feature_columns)
+        """
+        frame = pd.DataFrame(
+            [
+                {
+                    'customer_id': invoice.customer_id,
+                    'amount': invoice.amount,
+                    'invoice_date': invoice.invoice_date,
+                    'due_date': invoice.due_date,
+                }
+                for invoice in invoices
+            ],
+            index=pd.Index([invoice.id for invoice in invoices], name='invoice_id'),
+            columns=['customer_id', 'amount', 'invoice_date', 'due_date']
+        )
+
+        customer_features = feature_store.customer_features_as_of(
+            self.db,
+            pd.DataFrame({'customer_id': frame['customer_id'], 'as_of': datetime.now().date()}, index=frame.index)
+        )
+
+        features = pd.concat([
+            customer_features,
+            self.extract_invoice_features(frame, customer_features),
+            self.extract_temporal_features(frame['due_date']),
+        ], axis=1)
+
+        if feature_columns is not None:
+            features = features[feature_columns]
         return features
 
     def _default_customer_features(self) -> dict:
         """Default features for customers with no history."""
-        return {
-            'avg_payment_delay_days': 0,
-            'payment_delay_std': 0,
-            'on_time_payment_rate': 0.5,
-            'late_payment_rate': 0.5,
-            'very_late_payment_rate': 0,
-            'avg_payment_amount': 0,
-            'payment_count_total': 0,
-            'payment_count_last_3_months': 0,
-            'payment_count_last_6_months': 0,
-            'recency_days': 999,
-        }
+        return dict(feature_store.CUSTOMER_FEATURE_DEFAULTS)
 
     def prepare_training_data(self) -> pd.DataFrame:
         """
         Prepare training dataset from historical data.
+
+        Every paid invoice is featurized as of a scoring date drawn between
+        its invoice date and its payment, as pending invoices are scored on
+        some day before they are paid: customer history covers payments made
+        before that day and due/age day counts are taken on it, so features
+        never see the payment being predicted and match what scoring sees.
+        The draw is seeded, so the same data gives the same training set.
+        Invoices, targets and payment history are each loaded with a single
+        query.
         """
-        # Get all paid invoices
-        invoices = self.db.query(Invoice).filter(
-            Invoice.status == 'paid'
+        # Paid invoices with their first payment (simplified) as the target
+        first_payment = select(
+            Payment.invoice_id,
+            func.min(Payment.id).label('payment_id')
+        ).group_by(Payment.invoice_id).subquery()
+
+        rows = self.db.execute(
+            select(
+                Invoice.id,
+                Invoice.customer_id,
+                Invoice.amount,
+                Invoice.invoice_date,
+                Invoice.due_date,
+                Payment.payment_date,
+                Payment.delay_days,
+            )
+            .join(first_payment, first_payment.c.invoice_id == Invoice.id)
+            .join(Payment, Payment.id == first_payment.c.payment_id)
+            .where(Invoice.status == 'paid')
+            .order_by(Invoice.id)
         ).all()
 
-        data = []
-
-        for invoice in invoices:
-            payments = invoice.payments
-            if not payments:
-                continue
-
-            # Use first payment (simplified)
-            payment = payments[0]
-
-            features = self.create_feature_vector(invoice)
-            features['target_delay_days'] = payment.delay_days
-            features['target_on_time'] = 1 if payment.delay_days <= 0 else 0
-
-            data.append(features)
-
-        return pd.DataFrame(data)
+        frame = pd.DataFrame(
+            rows,
+            columns=['invoice_id', 'customer_id', 'amount', 'invoice_date', 'due_date', 'payment_date', 'delay_days']
+        ).set_index('invoice_id')
+        if frame.empty:
+            return pd.DataFrame()
+
+        # Scoring day: invoice date plus a random number of days it stayed open (0 if paid on issue)
+        invoice_dates = pd.to_datetime(frame['invoice_date']).dt.normalize()
+        open_days = (pd.to_datetime(frame['payment_date']).dt.normalize() - invoice_dates).dt.days.clip(lower=0)
+        offsets = np.floor(np.random.default_rng(42).random(len(frame)) * open_days.to_numpy())
+        scoring_dates = invoice_dates + pd.to_timedelta(offsets, unit='D')
+
+        customer_features = feature_store.customer_features_as_of(
+            self.db,
+            pd.DataFrame({'customer_id': frame['customer_id'], 'as_of': scoring_dates}),
+            snapshots=feature_store.payment_snapshots(self.db),
+            exclusive=True
+        )
+
+        features = pd.concat([
+            customer_features,
+            self.extract_invoice_features(frame, customer_features, as_of=scoring_dates),
+            self.extract_temporal_features(frame['due_date']),
+        ], axis=1)
+
+        delays = frame['delay_days']
+        features['target_delay_days'] = delays
+        features['target_on_time'] = (delays <= 0).astype(int)
+
+        return features.reset_index(drop=True)
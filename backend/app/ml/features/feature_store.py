@@ -0,0 +1,294 @@
+"""
+Customer payment-behaviour feature store.
+
+Keeps running per-customer payment aggregates in customer_payment_features,
+one row per customer and payment date. New payments are folded in
+incrementally; features are read as of any date, which gives inference the
+current state and training the state before each invoice without leakage.
+"""
+
+from datetime import date, datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, delete, func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.customer_features import CustomerPaymentFeatures
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+
+AGGREGATE_COLUMNS = [
+    'payment_count', 'amount_sum', 'delay_count', 'delay_sum', 'delay_sum_sq',
+    'on_time_count', 'late_count', 'very_late_count',
+]
+
+CUSTOMER_FEATURE_DEFAULTS = {
+    'avg_payment_delay_days': 0,
+    'payment_delay_std': 0,
+    'on_time_payment_rate': 0.5,
+    'late_payment_rate': 0.5,
+    'very_late_payment_rate': 0,
+    'avg_payment_amount': 0,
+    'payment_count_total': 0,
+    'payment_count_last_3_months': 0,
+    'payment_count_last_6_months': 0,
+    'recency_days': 999,
+}
+
+
+def _daily_aggregates(payments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate payments (customer_id, payment_date, amount, delay_days) per customer and day.
+    """
+    delay = payments['delay_days'].astype(float)
+    known = delay.notna()
+    daily = pd.DataFrame({
+        'customer_id': payments['customer_id'].astype(int),
+        'as_of_date': pd.to_datetime(payments['payment_date']).dt.date,
+        'payment_count': 1,
+        'amount_sum': payments['amount'].astype(float),
+        'delay_count': known.astype(int),
+        'delay_sum': delay.fillna(0),
+        'delay_sum_sq': (delay ** 2).fillna(0),
+        'on_time_count': (delay <= 0).astype(int),
+        'late_count': (delay > 0).astype(int),
+        'very_late_count': (delay > 30).astype(int),
+    })
+    return daily.groupby(['customer_id', 'as_of_date'], as_index=False)[AGGREGATE_COLUMNS].sum()
+
+
+def _running_totals(daily: pd.DataFrame, base: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Turn daily aggregates into running totals per customer.
+
+    Args:
+        daily: Daily aggregates, one row per (customer_id, as_of_date)
+        base: Latest existing totals per customer (indexed by customer_id) to continue from
+    """
+    snapshots = daily.sort_values(['customer_id', 'as_of_date']).reset_index(drop=True)
+    snapshots[AGGREGATE_COLUMNS] = snapshots.groupby('customer_id')[AGGREGATE_COLUMNS].cumsum()
+
+    if base is not None and not base.empty:
+        offsets = base[AGGREGATE_COLUMNS].reindex(snapshots['customer_id']).fillna(0).to_numpy()
+        snapshots[AGGREGATE_COLUMNS] = snapshots[AGGREGATE_COLUMNS].to_numpy() + offsets
+
+    return snapshots
+
+
+def _insert_snapshots(db: Session, snapshots: pd.DataFrame) -> int:
+    """Insert running totals into the store."""
+    if snapshots.empty:
+        return 0
+
+    records = snapshots.assign(updated_at=datetime.now()).astype(object).to_dict('records')
+    db.execute(insert(CustomerPaymentFeatures), records)
+    return len(records)
+
+
+def payment_snapshots(db: Session, customer_ids: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Compute running totals straight from the payments table in one grouped
+    query, without reading or writing the store.
+
+    Args:
+        customer_ids: Customers to include (default: all)
+
+    Returns:
+        DataFrame with customer_id, as_of_date and AGGREGATE_COLUMNS, one row
+        per customer and payment date
+    """
+    delay = Payment.delay_days
+    query = select(
+        Invoice.customer_id,
+        Payment.payment_date,
+        func.count(Payment.id),
+        func.sum(Payment.amount),
+        func.count(delay),
+        func.coalesce(func.sum(delay), 0),
+        func.coalesce(func.sum(delay * delay), 0),
+        func.sum(case((delay <= 0, 1), else_=0)),
+        func.sum(case((delay > 0, 1), else_=0)),
+        func.sum(case((delay > 30, 1), else_=0)),
+    ).join(
+        Invoice, Invoice.id == Payment.invoice_id
+    ).group_by(Invoice.customer_id, Payment.payment_date)
+
+    if customer_ids is not None:
+        query = query.where(Invoice.customer_id.in_(customer_ids))
+
+    daily = pd.DataFrame(db.execute(query).all(), columns=['customer_id', 'as_of_date'] + AGGREGATE_COLUMNS)
+    return _running_totals(daily)
+
+
+def rebuild_customer_features(db: Session, customer_ids: Optional[List[int]] = None) -> int:
+    """
+    Recompute the stored running totals from the payments table.
+    Rebuilds the given customers, or every customer when customer_ids is None.
+    Does not commit.
+
+    Returns:
+        Number of snapshot rows written
+    """
+    stale = delete(CustomerPaymentFeatures)
+    if customer_ids is not None:
+        stale = stale.where(CustomerPaymentFeatures.customer_id.in_(customer_ids))
+
+    db.execute(stale.execution_options(synchronize_session=False))
+    return _insert_snapshots(db, payment_snapshots(db, customer_ids))
+
+
+def _latest_snapshots(db: Session, customer_ids: List[int]) -> pd.DataFrame:
+    """Latest stored totals per customer, indexed by customer_id."""
+    latest = select(
+        CustomerPaymentFeatures.customer_id,
+        func.max(CustomerPaymentFeatures.as_of_date)
+    ).where(
+        CustomerPaymentFeatures.customer_id.in_(customer_ids)
+    ).group_by(CustomerPaymentFeatures.customer_id)
+
+    rows = db.execute(
+        select(
+            CustomerPaymentFeatures.customer_id,
+            CustomerPaymentFeatures.as_of_date,
+            *[getattr(CustomerPaymentFeatures, col) for col in AGGREGATE_COLUMNS]
+        ).where(
+            tuple_(CustomerPaymentFeatures.customer_id, CustomerPaymentFeatures.as_of_date).in_(latest)
+        )
+    ).all()
+    return pd.DataFrame(rows, columns=['customer_id', 'as_of_date'] + AGGREGATE_COLUMNS).set_index('customer_id')
+
+
+def record_payments(db: Session, payments: pd.DataFrame) -> int:
+    """
+    Fold newly inserted payments into the store. Does not commit.
+
+    Payments dated after a customer's latest snapshot are appended by adding
+    their running totals to that snapshot. Customers with back-dated
+    payments are rebuilt from the payments table, so the new payments must
+    already be flushed.
+
+    Args:
+        payments: DataFrame with customer_id, payment_date, amount and delay_days
+
+    Returns:
+        Number of snapshot rows written
+    """
+    if payments.empty:
+        return 0
+
+    daily = _daily_aggregates(payments)
+    latest = _latest_snapshots(db, daily['customer_id'].unique().tolist())
+
+    first_new = daily.groupby('customer_id')['as_of_date'].min()
+    latest_date = latest['as_of_date'].reindex(first_new.index)
+    backdated = first_new.index[latest_date.notna() & (first_new <= latest_date)].tolist()
+
+    written = rebuild_customer_features(db, backdated) if backdated else 0
+    appended = daily[~daily['customer_id'].isin(backdated)]
+    return written + _insert_snapshots(db, _running_totals(appended, base=latest))
+
+
+def customer_features_as_of(
+    db: Session,
+    requests: pd.DataFrame,
+    snapshots: Optional[pd.DataFrame] = None,
+    exclusive: bool = False
+) -> pd.DataFrame:
+    """
+    Customer payment-behaviour features as of the end of given days.
+
+    Args:
+        db: Database session
+        requests: DataFrame with customer_id and as_of (date) columns
+        snapshots: Running totals to read instead of the store (e.g. from
+            payment_snapshots)
+        exclusive: Leave out payments made on the as_of day itself
+
+    Returns:
+        DataFrame with the same index and one column per feature in
+        CUSTOMER_FEATURE_DEFAULTS; customers without payments up to as_of
+        get the defaults
+    """
+    if requests.empty:
+        return pd.DataFrame(columns=list(CUSTOMER_FEATURE_DEFAULTS), index=requests.index)
+
+    if snapshots is None:
+        customer_ids = requests['customer_id'].astype(int).unique().tolist()
+        rows = db.execute(
+            select(
+                CustomerPaymentFeatures.customer_id,
+                CustomerPaymentFeatures.as_of_date,
+                *[getattr(CustomerPaymentFeatures, col) for col in AGGREGATE_COLUMNS]
+            ).where(CustomerPaymentFeatures.customer_id.in_(customer_ids))
+        ).all()
+        snapshots = pd.DataFrame(rows, columns=['customer_id', 'as_of_date'] + AGGREGATE_COLUMNS)
+
+    snapshots = snapshots.rename(columns={'as_of_date': 'snapshot_date'})
+    snapshots['customer_id'] = snapshots['customer_id'].astype('int64')
+    # Numeric columns (and all columns of an empty store) come back as objects
+    snapshots[AGGREGATE_COLUMNS] = snapshots[AGGREGATE_COLUMNS].astype(float)
+    snapshots['snapshot_date'] = pd.to_datetime(snapshots['snapshot_date']).astype('datetime64[ns]')
+    snapshots = snapshots.sort_values('snapshot_date')
+
+    work = pd.DataFrame({
+        '_row': np.arange(len(requests)),
+        'customer_id': requests['customer_id'].astype('int64').to_numpy(),
+        'as_of': pd.to_datetime(requests['as_of']).astype('datetime64[ns]').to_numpy(),
+    })
+
+    def totals_at(offset_days: int) -> pd.DataFrame:
+        """Running totals at the end of (as_of - offset_days), in request order."""
+        keyed = work.assign(key=work['as_of'] - pd.Timedelta(days=offset_days)).sort_values('key')
+        matched = pd.merge_asof(
+            keyed, snapshots, left_on='key', right_on='snapshot_date', by='customer_id', direction='backward'
+        )
+        return matched.sort_values('_row').reset_index(drop=True)
+
+    current = totals_at(1 if exclusive else 0)
+    # (today - payment_date).days <= 90  <=>  paid after the end of (as_of - 91)
+    before_3_months = totals_at(91)['payment_count'].fillna(0)
+    before_6_months = totals_at(181)['payment_count'].fillna(0)
+
+    payments = current['payment_count'].astype(float)
+    delays = current['delay_count'].astype(float).where(lambda d: d > 0)
+    mean_delay = current['delay_sum'] / delays
+    # Population std (as np.std) from the sum of squares
+    variance = (current['delay_sum_sq'] / delays - mean_delay ** 2).clip(lower=0)
+
+    features = pd.DataFrame({
+        'avg_payment_delay_days': mean_delay.fillna(0),
+        'payment_delay_std': np.sqrt(variance).where(delays > 1, 0).fillna(0),
+        'on_time_payment_rate': (current['on_time_count'] / delays).fillna(0.5),
+        'late_payment_rate': (current['late_count'] / delays).fillna(0.5),
+        'very_late_payment_rate': (current['very_late_count'] / delays).fillna(0),
+        'avg_payment_amount': (current['amount_sum'] / payments).fillna(0),
+        'payment_count_total': payments.fillna(0),
+        'payment_count_last_3_months': payments.fillna(0) - before_3_months,
+        'payment_count_last_6_months': payments.fillna(0) - before_6_months,
+        'recency_days': (current['as_of'] - current['snapshot_date']).dt.days.fillna(999),
+    })
+
+    features = features.astype({
+        'payment_count_total': int,
+        'payment_count_last_3_months': int,
+        'payment_count_last_6_months': int,
+        'recency_days': int,
+    })
+    features.index = requests.index
+    return features
+
+
+def customer_features(db: Session, customer_ids: List[int], as_of: Optional[date] = None) -> pd.DataFrame:
+    """
+    Features of the given customers as of the end of a day (default: today).
+
+    Returns:
+        DataFrame indexed by customer_id
+    """
+    as_of = as_of or datetime.now().date()
+    requests = pd.DataFrame({'customer_id': customer_ids, 'as_of': [as_of] * len(customer_ids)})
+    features = customer_features_as_of(db, requests)
+    features.index = pd.Index(customer_ids, name='customer_id')
+    return features
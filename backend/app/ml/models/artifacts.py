@@ -0,0 +1,176 @@
+"""
+Versioned model artifact format.
+
+An artifact is a directory holding the model in the libraries' native,
+version-portable formats (XGBoost UBJSON, Prophet JSON) and a
+manifest.json describing it:
+
+    {
+        "format_version": 1,
+        "model_class": "PaymentPredictor",
+        "sha256": "...",                  # over the files' hashes, in name order
+        "files": {"classifier.ubj": {"sha256": "...", "bytes": 123, "size": 123, "compression": null}},
+        "feature_columns": [...],
+        "training_window": {"start": "2025-01-02", "end": "2026-09-30"},
+        "metrics": {...},
+        "trained_at": "...",
+        "library_versions": {"xgboost": "2.0.2"}
+    }
+
+Files can be gzip-compressed (smaller artifacts, slower loads). Uncompressed
+files are read straight into the buffer handed to the model library.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def is_artifact(path: str) -> bool:
+    """True for artifact directories (as opposed to legacy joblib files)."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def _window(training_window: Optional[Tuple[date, date]]) -> Optional[Dict[str, str]]:
+    if training_window is None:
+        return None
+    start, end = training_window
+    return {"start": str(start)[:10], "end": str(end)[:10]}
+
+
+def write_artifact(
+    path: str,
+    model_class: str,
+    files: Dict[str, bytes],
+    feature_columns: Optional[list] = None,
+    training_window: Optional[Tuple[date, date]] = None,
+    metrics: Optional[Dict] = None,
+    library_versions: Optional[Dict[str, str]] = None,
+    extra: Optional[Dict] = None,
+    compress: bool = False
+) -> Dict:
+    """
+    Write an artifact directory. The directory appears atomically: files are
+    written to a temporary directory next to it, which is then renamed.
+
+    Args:
+        path: Artifact directory (must not exist)
+        model_class: Name of the class that reads the artifact
+        files: File name -> contents
+        feature_columns: Input features, in model order
+        training_window: First and last date of the training data
+        metrics: Training metrics
+        library_versions: Versions of the libraries that wrote the files
+        extra: Further model-specific manifest entries
+        compress: gzip the files
+
+    Returns:
+        The manifest
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".artifact-")
+
+    try:
+        file_entries = {}
+        for name, contents in sorted(files.items()):
+            stored = gzip.compress(contents, compresslevel=6) if compress else contents
+            with open(os.path.join(staging, name), 'wb') as f:
+                f.write(stored)
+            file_entries[name] = {
+                "sha256": hashlib.sha256(stored).hexdigest(),
+                "bytes": len(stored),
+                "size": len(contents),
+                "compression": "gzip" if compress else None,
+            }
+
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "model_class": model_class,
+            "sha256": hashlib.sha256("".join(entry["sha256"] for entry in file_entries.values()).encode()).hexdigest(),
+            "files": file_entries,
+            "feature_columns": feature_columns,
+            "training_window": _window(training_window),
+            "metrics": metrics or {},
+            "trained_at": datetime.now().isoformat(),
+            "library_versions": library_versions or {},
+            **(extra or {}),
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+
+        os.rename(staging, path)
+        return manifest
+
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def read_manifest(path: str, model_class: Optional[str] = None) -> Dict:
+    """
+    Read and check an artifact's manifest.
+
+    Raises:
+        ValueError: Unsupported format version or artifact of another class
+    """
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+    if model_class is not None and manifest.get("model_class") != model_class:
+        raise ValueError(f"Artifact holds a {manifest.get('model_class')}, not a {model_class}")
+    return manifest
+
+
+def model_size(path: str) -> int:
+    """
+    Uncompressed size in bytes of the files a model was stored in (an
+    artifact's files, or a legacy joblib file), used to estimate its
+    memory footprint without serializing the loaded model again.
+    """
+    if not is_artifact(path):
+        return os.path.getsize(path)
+    # Older manifests lack "size"; their stored size is the best estimate
+    return sum(entry.get("size", entry["bytes"]) for entry in read_manifest(path)["files"].values())
+
+
+def read_file(path: str, manifest: Dict, name: str, verify: bool = True) -> bytearray:
+    """
+    Contents of an artifact file, decompressed and checked against the manifest hash.
+
+    Args:
+        path: Artifact directory
+        manifest: The artifact's manifest
+        name: File name
+        verify: Check the SHA-256 recorded in the manifest
+
+    Returns:
+        File contents (bytearray, as the XGBoost loaders expect)
+    """
+    entry = manifest["files"][name]
+    file_path = os.path.join(path, name)
+
+    with open(file_path, 'rb') as f:
+        if entry["compression"] == "gzip":
+            stored = f.read()
+            digest = hashlib.sha256(stored).hexdigest() if verify else None
+            contents = bytearray(gzip.decompress(stored))
+        else:
+            # Read into the returned buffer, no intermediate bytes copy
+            contents = bytearray(os.fstat(f.fileno()).st_size)
+            f.readinto(contents)
+            digest = hashlib.sha256(contents).hexdigest() if verify else None
+
+    if verify and digest != entry["sha256"]:
+        raise ValueError(f"Artifact file {file_path} does not match its manifest hash")
+    return contents
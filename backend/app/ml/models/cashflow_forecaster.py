@@ -4,11 +4,15 @@ Cash flow forecasting using Prophet time series model.
 
 import pandas as pd
 import numpy as np
+import prophet
 from prophet import Prophet
-from datetime import datetime, timedelta, date
+from prophet.serialize import model_from_json, model_to_json
+from datetime import timedelta, date
 from typing import Dict, List, Tuple
 import joblib
 
+from app.ml.models import artifacts
+
 
 class CashFlowForecaster:
     """
@@ -19,7 +23,13 @@ class CashFlowForecaster:
     def __init__(self):
         self.model = None
         self.training_end_date = None
+        self.training_window = None  # (first, last) day of the training series
         self.metrics = {}
+        self._clear_cache()
+
+    def _clear_cache(self):
+        self._daily_forecast = None    # Longest forecast made so far (see forecast())
+        self._trend_analysis = None
 
     def prepare_time_series(self, payments_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -73,7 +83,9 @@ class CashFlowForecaster:
         train_data = ts_data[ts_data['ds'] <= split_date].copy()
         val_data = ts_data[ts_data['ds'] > split_date].copy()
 
+        self._clear_cache()
         self.training_end_date = train_data['ds'].max()
+        self.training_window = (train_data['ds'].min(), self.training_end_date)
 
         # Configure Prophet model
         self.model = Prophet(
@@ -130,16 +142,8 @@ class CashFlowForecaster:
 
         return self.metrics
 
-    def forecast(self, days_ahead: int = 90) -> pd.DataFrame:
-        """
-        Generate cash flow forecast for the specified period.
-
-        Args:
-            days_ahead: Number of days to forecast
-
-        Returns:
-            DataFrame with columns: ds (date), yhat (prediction), yhat_lower, yhat_upper
-        """
+    def _predict_daily(self, days_ahead: int) -> pd.DataFrame:
+        """Run Prophet over the days_ahead days after the training data."""
         if not self.model:
             raise ValueError("Model not trained yet")
 
@@ -166,6 +170,34 @@ class CashFlowForecaster:
 
         return result
 
+    def forecast(self, days_ahead: int = 90) -> pd.DataFrame:
+        """
+        Generate cash flow forecast for the specified period.
+
+        The forecast always starts the day after the training data, so it
+        only depends on the model: the longest forecast made so far is kept
+        and shorter horizons are sliced from it.
+
+        Args:
+            days_ahead: Number of days to forecast
+
+        Returns:
+            DataFrame with columns: ds (date), yhat (prediction), yhat_lower, yhat_upper
+        """
+        daily = self._daily_forecast
+        if daily is None or len(daily) < days_ahead:
+            daily = self._predict_daily(days_ahead)
+            # Concurrent callers may race here; keep the longer forecast
+            if self._daily_forecast is None or len(daily) > len(self._daily_forecast):
+                self._daily_forecast = daily
+
+        return daily.iloc[:days_ahead].copy()
+
+    def precompute(self, days_ahead: int = 365) -> None:
+        """Compute and keep the forecast and trend analysis (e.g. when the model is activated)."""
+        self.forecast(days_ahead)
+        self.get_trend_analysis()
+
     def forecast_aggregate(
         self,
         days_ahead: int = 90,
@@ -211,6 +243,9 @@ class CashFlowForecaster:
         Returns:
             Dictionary with trend insights
         """
+        if self._trend_analysis is not None:
+            return dict(self._trend_analysis)
+
         if not self.model:
             raise ValueError("Model not trained yet")
 
@@ -235,27 +270,46 @@ class CashFlowForecaster:
         # Average daily cash flow
         avg_daily = forecast['yhat'].mean()
 
-        return {
+        self._trend_analysis = {
             'trend_direction': 'increasing' if trend_change > 0 else 'decreasing',
             'trend_change_pct': float(trend_change_pct),
             'avg_daily_cashflow': float(avg_daily),
             'trend_strength': 'strong' if abs(trend_change_pct) > 10 else 'moderate' if abs(trend_change_pct) > 5 else 'weak'
         }
+        return dict(self._trend_analysis)
 
-    def save(self, path: str):
-        """Save model to file."""
-        model_data = {
-            'model': self.model,
-            'training_end_date': self.training_end_date,
-            'metrics': self.metrics,
-            'version': '1.0.0',
-            'trained_at': datetime.now().isoformat(),
-        }
-        joblib.dump(model_data, path)
+    def save(self, path: str, compress: bool = False) -> Dict:
+        """
+        Save model as a versioned artifact directory (Prophet JSON plus
+        manifest, see app.ml.models.artifacts).
+
+        Returns:
+            The artifact manifest
+        """
+        return artifacts.write_artifact(
+            path,
+            model_class=type(self).__name__,
+            files={'prophet.json': model_to_json(self.model).encode()},
+            feature_columns=['ds', 'is_month_end'],
+            training_window=self.training_window,
+            metrics=self.metrics,
+            library_versions={'prophet': prophet.__version__},
+            extra={'training_end_date': self.training_end_date.isoformat()},
+            compress=compress
+        )
 
     def load(self, path: str):
-        """Load model from file."""
-        model_data = joblib.load(path)
-        self.model = model_data['model']
-        self.training_end_date = model_data['training_end_date']
-        self.metrics = model_data['metrics']
+        """Load model from an artifact directory, or from a legacy joblib file."""
+        self._clear_cache()
+        if not artifacts.is_artifact(path):
+            model_data = joblib.load(path)
+            self.model = model_data['model']
+            self.training_end_date = model_data['training_end_date']
+            self.metrics = model_data['metrics']
+            return
+
+        manifest = artifacts.read_manifest(path, model_class=type(self).__name__)
+        self.model = model_from_json(artifacts.read_file(path, manifest, 'prophet.json').decode())
+        self.training_end_date = pd.Timestamp(manifest['training_end_date'])
+        self.training_window = manifest['training_window']
+        self.metrics = manifest['metrics']
@@ -0,0 +1,195 @@
+"""
+Monte Carlo simulation of receivable collections.
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import date
+from typing import Dict, Optional, Sequence
+
+# Keep each sampled (scenario x invoice) block around this many elements
+SAMPLE_BLOCK_SIZE = 5_000_000
+
+
+class CashFlowSimulator:
+    """
+    Simulates when open invoices get paid by sampling payment delays from
+    each customer's empirical delay distribution (or the pooled distribution
+    of all customers when a customer has too little history).
+
+    All scenarios are sampled as arrays: delays are drawn by indexing into a
+    flat pool of observed delays, and collections are summed per scenario and
+    day with a single bincount per block.
+    """
+
+    def __init__(self, min_customer_samples: int = 5):
+        self.min_customer_samples = min_customer_samples
+        self.pool = None            # Observed delays, grouped by customer (pooled delays last)
+        self.customer_slots = {}    # customer_id -> (offset, count) into pool
+        self.pooled_slot = None
+
+    def fit(self, payments_df: pd.DataFrame) -> 'CashFlowSimulator':
+        """
+        Build delay distributions from payment history.
+
+        Args:
+            payments_df: DataFrame with customer_id and delay_days columns
+        """
+        delays = payments_df.dropna(subset=['delay_days'])
+        if delays.empty:
+            # No history: everything is paid on the due date
+            self.pool = np.zeros(1, dtype=np.int64)
+            self.customer_slots = {}
+            self.pooled_slot = (0, 1)
+            return self
+
+        delays = delays.sort_values('customer_id')
+        counts = delays.groupby('customer_id').size()
+        eligible = counts[counts >= self.min_customer_samples]
+
+        customer_delays = delays[delays['customer_id'].isin(eligible.index)]
+        self.pool = np.concatenate([
+            customer_delays['delay_days'].to_numpy(dtype=np.int64),
+            delays['delay_days'].to_numpy(dtype=np.int64),
+        ])
+
+        offsets = np.concatenate([[0], np.cumsum(eligible.to_numpy())[:-1]])
+        self.customer_slots = {
+            customer_id: (int(offset), int(count))
+            for customer_id, offset, count in zip(eligible.index, offsets, eligible.to_numpy())
+        }
+        self.pooled_slot = (len(customer_delays), len(delays))
+        return self
+
+    def simulate(
+        self,
+        invoices_df: pd.DataFrame,
+        start_date: date,
+        days_ahead: int,
+        n_scenarios: int = 10000,
+        seed: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Simulate daily collections.
+
+        Invoices are paid on due_date + sampled delay. Payments that would
+        fall before start_date (overdue invoices) are collected on start_date;
+        payments after the horizon are dropped.
+
+        Args:
+            invoices_df: DataFrame with customer_id, amount and due_date columns
+            start_date: First simulated day
+            days_ahead: Number of simulated days
+            n_scenarios: Number of scenarios
+            seed: Random seed for reproducible runs
+
+        Returns:
+            Array of shape (n_scenarios, days_ahead) with collected amounts per day
+        """
+        if self.pool is None:
+            raise ValueError("Simulator not fitted. Call fit() first.")
+
+        collections = np.zeros(n_scenarios * days_ahead)
+        n_invoices = len(invoices_df)
+        if n_invoices == 0:
+            return collections.reshape(n_scenarios, days_ahead)
+
+        slots = [self.customer_slots.get(customer_id, self.pooled_slot) for customer_id in invoices_df['customer_id']]
+        offsets = np.array([offset for offset, _ in slots], dtype=np.int64)
+        counts = np.array([count for _, count in slots], dtype=np.int64)
+
+        due_offsets = (pd.to_datetime(invoices_df['due_date']) - pd.Timestamp(start_date)).dt.days.to_numpy()
+        amounts = invoices_df['amount'].to_numpy(dtype=float)
+
+        rng = np.random.default_rng(seed)
+        block = max(1, SAMPLE_BLOCK_SIZE // n_invoices)
+
+        for first in range(0, n_scenarios, block):
+            size = min(block, n_scenarios - first)
+
+            # Sample one observed delay per (scenario, invoice)
+            picks = offsets + (rng.random((size, n_invoices)) * counts).astype(np.int64)
+            days = np.maximum(due_offsets + self.pool[picks], 0)
+
+            # Flat (scenario, day) bin per payment; payments past the horizon are dropped
+            in_horizon = days < days_ahead
+            bins = (np.arange(first, first + size)[:, None] * days_ahead + days)[in_horizon]
+            weights = np.broadcast_to(amounts, (size, n_invoices))[in_horizon]
+            collections += np.bincount(bins, weights=weights, minlength=n_scenarios * days_ahead)
+
+        return collections.reshape(n_scenarios, days_ahead)
+
+    @staticmethod
+    def summarize(
+        collections: np.ndarray,
+        start_date: date,
+        granularity: str = "day",
+        opening_balance: float = 0.0,
+        minimum_balance: float = 0.0,
+        daily_outflow: float = 0.0,
+        percentiles: Sequence[float] = (10, 50, 90)
+    ) -> Dict:
+        """
+        Percentile bands per bucket and the probability of the cash balance
+        falling below minimum_balance.
+
+        The balance is opening_balance plus collections to date minus
+        daily_outflow for every elapsed day, evaluated at the end of each day.
+
+        Args:
+            collections: Output of simulate()
+            start_date: First simulated day
+            granularity: Bucket size (day/week/month; weeks start on Monday)
+            opening_balance: Cash at the start of start_date
+            minimum_balance: Balance to stay above
+            daily_outflow: Expected outgoing payments per day
+            percentiles: Percentiles to report
+
+        Returns:
+            Dictionary with per-bucket bands and breach probabilities
+        """
+        n_scenarios, days_ahead = collections.shape
+        days = pd.date_range(start_date, periods=days_ahead, freq='D')
+
+        if granularity == "day":
+            buckets = days
+        elif granularity == "week":
+            buckets = days - pd.to_timedelta(days.weekday, unit='D')
+        elif granularity == "month":
+            buckets = days.to_period('M').start_time
+        else:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        bucket_starts, bucket_index = np.unique(buckets, return_inverse=True)
+        bucket_ends = np.r_[np.flatnonzero(np.diff(bucket_index)), days_ahead - 1]
+
+        cumulative = np.cumsum(collections, axis=1)
+        # Per-bucket totals from the running totals at bucket ends
+        totals = np.diff(cumulative[:, bucket_ends], axis=1, prepend=0.0)
+        balance = opening_balance + cumulative - daily_outflow * np.arange(1, days_ahead + 1)
+        below = balance < minimum_balance
+
+        # Probability that the balance has dipped below the minimum by the end of each bucket
+        breached_by = np.logical_or.accumulate(below, axis=1)[:, bucket_ends].mean(axis=0)
+
+        amount_bands = np.percentile(totals, percentiles, axis=0)
+        cumulative_bands = np.percentile(cumulative[:, bucket_ends], percentiles, axis=0)
+        balance_bands = np.percentile(balance[:, bucket_ends], percentiles, axis=0)
+
+        labels = [f"p{p:g}" for p in percentiles]
+        return {
+            "scenarios": n_scenarios,
+            "expected_total": float(cumulative[:, -1].mean()),
+            "probability_below_minimum": float(below.any(axis=1).mean()),
+            "buckets": [
+                {
+                    "date": pd.Timestamp(bucket_starts[i]).date(),
+                    "expected_amount": float(totals[:, i].mean()),
+                    "amount": {label: float(amount_bands[k, i]) for k, label in enumerate(labels)},
+                    "cumulative": {label: float(cumulative_bands[k, i]) for k, label in enumerate(labels)},
+                    "balance": {label: float(balance_bands[k, i]) for k, label in enumerate(labels)},
+                    "probability_below_minimum": float(breached_by[i]),
+                }
+                for i in range(len(bucket_starts))
+            ],
+        }
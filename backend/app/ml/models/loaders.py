@@ -0,0 +1,69 @@
+"""
+Model artifact loaders keyed by MLModel.model_type.
+
+A loader knows which class reads an artifact and how to warm a loaded model
+up with a dummy inference, so that the first real request does not pay for
+lazy initialization. New model types register a loader with
+register_model_loader().
+"""
+
+from typing import Callable, Dict
+
+import pandas as pd
+
+from app.core.config import settings
+from app.ml.models.cashflow_forecaster import CashFlowForecaster
+from app.ml.models.payment_predictor import PaymentPredictor
+
+XGBOOST_ENSEMBLE = "xgboost_ensemble"
+PROPHET_TIMESERIES = "prophet_timeseries"
+
+
+class ModelLoader:
+    """
+    Loads artifacts of one model type.
+    """
+
+    def __init__(self, model_class: type, warm_up: Callable[[object], None]):
+        self.model_class = model_class
+        self.warm_up = warm_up
+
+    def load(self, path: str):
+        """Load an artifact into a new model instance."""
+        model = self.model_class()
+        model.load(path)
+        return model
+
+
+def _warm_up_payment_predictor(model: PaymentPredictor) -> None:
+    row = pd.DataFrame([dict.fromkeys(model.feature_columns + ['days_until_due'], 0.0)])
+    model.predict_many(row)
+    # predict_many only runs the regressor for late invoices
+    if model.regressor:
+        model.regressor.predict(row[model.feature_columns].to_numpy(dtype=float))
+
+
+def _warm_up_cashflow_forecaster(model: CashFlowForecaster) -> None:
+    if settings.TIMESERIES_PRECOMPUTE_DAYS > 0:
+        # Requests up to this horizon are then sliced from the precomputed forecast
+        model.precompute(settings.TIMESERIES_PRECOMPUTE_DAYS)
+    else:
+        model.forecast(days_ahead=1)
+
+
+MODEL_LOADERS: Dict[str, ModelLoader] = {
+    XGBOOST_ENSEMBLE: ModelLoader(PaymentPredictor, _warm_up_payment_predictor),
+    PROPHET_TIMESERIES: ModelLoader(CashFlowForecaster, _warm_up_cashflow_forecaster),
+}
+
+
+def register_model_loader(model_type: str, model_class: type, warm_up: Callable[[object], None]) -> None:
+    """Register (or replace) the loader of a model type."""
+    MODEL_LOADERS[model_type] = ModelLoader(model_class, warm_up)
+
+
+def get_model_loader(model_type: str) -> ModelLoader:
+    """Loader of a model type; raises ValueError for unknown types."""
+    if model_type not in MODEL_LOADERS:
+        raise ValueError(f"No loader registered for model type: {model_type}")
+    return MODEL_LOADERS[model_type]
@@ -4,12 +4,20 @@ Payment prediction model using XGBoost.
 
 import xgboost as xgb
 import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, mean_absolute_error, r2_score
 import joblib
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Tuple
 
+from app.ml.models import artifacts
+
+PREDICTION_COLUMNS = [
+    'predicted_payment_date', 'on_time_probability', 'predicted_delay_days', 'risk_score',
+    'confidence', 'optimistic_date', 'realistic_date', 'pessimistic_date',
+]
+
 
 class PaymentPredictor:
     """
@@ -20,11 +28,18 @@ class PaymentPredictor:
         self.classifier = None  # Predicts on-time vs late
         self.regressor = None   # Predicts delay days
         self.feature_columns = None
+        self.training_window = None  # (first, last) invoice date of the training data
+        self.metrics = {}
 
-    def train(self, df, test_size=0.2):
+    def train(self, df, test_size=0.2, training_window=None):
         """
         Train both classifier and regressor.
+
+        training_window ((first, last) invoice date of df) is only recorded
+        in the saved artifact.
         """
+        self.training_window = training_window
+
         # Prepare features
         feature_cols = [col for col in df.columns if col not in ['target_delay_days', 'target_on_time']]
         self.feature_columns = feature_cols
@@ -91,74 +106,117 @@ class PaymentPredictor:
         else:
             reg_metrics = {'mae': 0, 'r2': 0}
 
-        return {
+        self.metrics = {
             'classifier_metrics': class_metrics,
             'regressor_metrics': reg_metrics,
             'training_samples': len(X_train),
             'test_samples': len(X_test),
         }
+        return self.metrics
 
     def predict(self, features: Dict) -> Dict:
         """
         Predict payment behavior for an invoice.
         """
+        return self.predict_many(pd.DataFrame([features])).to_dict('records')[0]
+
+    def predict_many(self, features: pd.DataFrame) -> pd.DataFrame:
+        """
+        Predict payment behavior for many invoices at once.
+
+        Args:
+            features: One row of features per invoice (must contain
+                feature_columns and days_until_due)
+
+        Returns:
+            DataFrame with the same index and the keys returned by predict() as columns
+        """
         if not self.classifier:
             raise ValueError("Model not trained yet")
 
-        # Prepare feature vector
-        X = np.array([[features[col] for col in self.feature_columns]])
+        if features.empty:
+            return pd.DataFrame(index=features.index, columns=PREDICTION_COLUMNS)
+
+        X = features[self.feature_columns].to_numpy(dtype=float)
 
         # Predict on-time probability
-        on_time_prob = self.classifier.predict_proba(X)[0][1]
+        on_time_prob = self.classifier.predict_proba(X)[:, 1]
 
-        # Predict delay days if likely late
-        if on_time_prob < 0.5 and self.regressor:
-            predicted_delay = max(0, int(self.regressor.predict(X)[0]))
-        else:
-            predicted_delay = 0
+        # Predict delay days for invoices likely to be late
+        late = on_time_prob < 0.5
+        predicted_delay = np.zeros(len(X), dtype=int)
+        if self.regressor and late.any():
+            predicted_delay[late] = np.maximum(0, self.regressor.predict(X[late]).astype(int))
 
-        # Calculate predicted payment date
-        invoice_due_date = datetime.now().date() + timedelta(days=int(features['days_until_due']))
-        predicted_payment_date = invoice_due_date + timedelta(days=predicted_delay)
+        # Calculate predicted payment dates
+        today = np.datetime64(datetime.now().date(), 'D')
+        invoice_due_date = today + features['days_until_due'].to_numpy(dtype=int).astype('timedelta64[D]')
+        delay = predicted_delay.astype('timedelta64[D]')
+        half_delay = (predicted_delay // 2).astype('timedelta64[D]')
+        predicted_payment_date = invoice_due_date + delay
 
         # Calculate confidence intervals (P10, P50, P90)
-        # Simplified: use probability distribution
-        if on_time_prob >= 0.5:
-            # Likely on time
-            optimistic_date = invoice_due_date - timedelta(days=3)
-            realistic_date = invoice_due_date
-            pessimistic_date = invoice_due_date + timedelta(days=7)
-        else:
-            # Likely late
-            optimistic_date = invoice_due_date + timedelta(days=predicted_delay // 2)
-            realistic_date = predicted_payment_date
-            pessimistic_date = predicted_payment_date + timedelta(days=predicted_delay // 2)
-
-        return {
-            'predicted_payment_date': predicted_payment_date,
-            'on_time_probability': float(on_time_prob),
+        # Simplified: on time -> around the due date, late -> spread around the predicted delay
+        optimistic_date = np.where(late, invoice_due_date + half_delay, invoice_due_date - np.timedelta64(3, 'D'))
+        realistic_date = np.where(late, predicted_payment_date, invoice_due_date)
+        pessimistic_date = np.where(late, predicted_payment_date + half_delay, invoice_due_date + np.timedelta64(7, 'D'))
+
+        def to_dates(values):
+            return values.astype('datetime64[D]').astype(object)
+
+        return pd.DataFrame({
+            'predicted_payment_date': to_dates(predicted_payment_date),
+            'on_time_probability': on_time_prob.astype(float),
             'predicted_delay_days': predicted_delay,
-            'risk_score': float(1 - on_time_prob),
-            'confidence': float(max(on_time_prob, 1 - on_time_prob)),
-            'optimistic_date': optimistic_date,  # P10
-            'realistic_date': realistic_date,     # P50
-            'pessimistic_date': pessimistic_date, # P90
-        }
+            'risk_score': 1 - on_time_prob.astype(float),
+            'confidence': np.maximum(on_time_prob, 1 - on_time_prob).astype(float),
+            'optimistic_date': to_dates(optimistic_date),    # P10
+            'realistic_date': to_dates(realistic_date),      # P50
+            'pessimistic_date': to_dates(pessimistic_date),  # P90
+        }, index=features.index)
+
+    def save(self, path: str, compress: bool = False) -> Dict:
+        """
+        Save model as a versioned artifact directory (native XGBoost UBJSON
+        boosters plus manifest, see app.ml.models.artifacts).
 
-    def save(self, path: str):
-        """Save model to file."""
-        model_data = {
-            'classifier': self.classifier,
-            'regressor': self.regressor,
-            'feature_columns': self.feature_columns,
-            'version': '1.0.0',
-            'trained_at': datetime.now().isoformat(),
-        }
-        joblib.dump(model_data, path)
+        Returns:
+            The artifact manifest
+        """
+        files = {'classifier.ubj': self.classifier.get_booster().save_raw(raw_format='ubj')}
+        if self.regressor:
+            files['regressor.ubj'] = self.regressor.get_booster().save_raw(raw_format='ubj')
+
+        return artifacts.write_artifact(
+            path,
+            model_class=type(self).__name__,
+            files={name: bytes(contents) for name, contents in files.items()},
+            feature_columns=self.feature_columns,
+            training_window=self.training_window,
+            metrics=self.metrics,
+            library_versions={'xgboost': xgb.__version__},
+            compress=compress
+        )
 
     def load(self, path: str):
-        """Load model from file."""
-        model_data = joblib.load(path)
-        self.classifier = model_data['classifier']
-        self.regressor = model_data['regressor']
-        self.feature_columns = model_data['feature_columns']
+        """Load model from an artifact directory, or from a legacy joblib file."""
+        if not artifacts.is_artifact(path):
+            model_data = joblib.load(path)
+            self.classifier = model_data['classifier']
+            self.regressor = model_data['regressor']
+            self.feature_columns = model_data['feature_columns']
+            return
+
+        manifest = artifacts.read_manifest(path, model_class=type(self).__name__)
+
+        self.classifier = xgb.XGBClassifier()
+        self.classifier.load_model(artifacts.read_file(path, manifest, 'classifier.ubj'))
+
+        self.regressor = None
+        if 'regressor.ubj' in manifest['files']:
+            self.regressor = xgb.XGBRegressor()
+            self.regressor.load_model(artifacts.read_file(path, manifest, 'regressor.ubj'))
+
+        self.feature_columns = manifest['feature_columns']
+        self.training_window = manifest['training_window']
+        self.metrics = manifest['metrics']
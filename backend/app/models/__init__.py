@@ -1,26 +1,33 @@
 """Database models."""
 
 from app.models.customer import Customer
+from app.models.customer_features import CustomerPaymentFeatures
+from app.models.forecast_snapshot import CashflowForecastSnapshot
 from app.models.invoice import Invoice, InvoiceLineItem
 from app.models.payment import Payment
 from app.models.prediction import Prediction
 from app.models.ml_model import MLModel
+from app.models.training_job import TrainingJob
 from app.models.upload_history import UploadHistory
-from app.models.product import Product, Industry, ProductBasePrice, CustomerProductPrice, IndustryProductionFactor
+from app.models.product import Product, Industry, ProductBasePrice, CustomerProductPrice, IndustryProductionFactor, ProductPriceThreshold
 from app.models.supplier import Supplier
 
 __all__ = [
     "Customer",
+    "CustomerPaymentFeatures",
+    "CashflowForecastSnapshot",
     "Invoice",
     "InvoiceLineItem",
     "Payment",
     "Prediction",
     "MLModel",
+    "TrainingJob",
     "UploadHistory",
     "Product",
     "Industry",
     "ProductBasePrice",
     "CustomerProductPrice",
     "IndustryProductionFactor",
+    "ProductPriceThreshold",
     "Supplier",
 ]
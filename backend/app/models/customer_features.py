@@ -0,0 +1,45 @@
+"""
+Customer payment-behaviour feature store model.
+"""
+
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, func, Index
+
+from app.core.database import Base
+
+
+class CustomerPaymentFeatures(Base):
+    """
+    Cumulative payment statistics of a customer as of the end of a day.
+
+    One row is stored per customer and payment date, holding running counts,
+    sums and sums of squares over all payments up to and including that date,
+    so means and standard deviations are O(1) to derive and features can be
+    read as of any past date without looking at later payments.
+    """
+
+    __tablename__ = "customer_payment_features"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    as_of_date = Column(Date, nullable=False)  # Payments dated on or before this day are included
+
+    # Running aggregates
+    payment_count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Float, nullable=False, default=0)
+    delay_count = Column(Integer, nullable=False, default=0)  # Payments with a known delay
+    delay_sum = Column(Float, nullable=False, default=0)
+    delay_sum_sq = Column(Float, nullable=False, default=0)
+    on_time_count = Column(Integer, nullable=False, default=0)  # delay <= 0
+    late_count = Column(Integer, nullable=False, default=0)  # delay > 0
+    very_late_count = Column(Integer, nullable=False, default=0)  # delay > 30
+
+    # Metadata
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Indexes
+    __table_args__ = (
+        Index('ix_customer_payment_features_customer_as_of', 'customer_id', 'as_of_date', unique=True),
+    )
+
+    def __repr__(self):
+        return f"<CustomerPaymentFeatures {self.customer_id} as of {self.as_of_date}: {self.payment_count} payments>"
@@ -0,0 +1,45 @@
+"""
+Cash flow forecast snapshot model.
+"""
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, func, JSON, Index
+
+from app.core.database import Base
+
+
+class CashflowForecastSnapshot(Base):
+    """
+    Materialized cash flow forecast for one model version, as-of date,
+    horizon and granularity.
+
+    kind is "invoices" (invoice-level payment predictions bucketed per
+    scenario) or "timeseries" (Prophet trend forecast).
+    """
+
+    __tablename__ = "cashflow_forecast_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)
+    ml_model_id = Column(Integer, ForeignKey("ml_models.id"), nullable=False)
+    model_version = Column(String(50), nullable=False)
+    as_of_date = Column(Date, nullable=False)
+    horizon_days = Column(Integer, nullable=False)
+    granularity = Column(String(10), nullable=False)  # day, week, month
+
+    # Response body as served by the snapshot endpoints
+    payload = Column(JSON, nullable=False)
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Indexes
+    __table_args__ = (
+        Index(
+            'ix_cashflow_forecast_snapshots_key',
+            'kind', 'ml_model_id', 'as_of_date', 'horizon_days', 'granularity',
+            unique=True
+        ),
+    )
+
+    def __repr__(self):
+        return f"<CashflowForecastSnapshot {self.kind} {self.model_version} {self.as_of_date} {self.horizon_days}d/{self.granularity}>"
@@ -2,7 +2,7 @@
 Invoice model.
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -25,6 +25,10 @@ class Invoice(Base):
     product_category = Column(String(50), nullable=True)
     status = Column(String(20), default="pending")  # pending, paid, overdue, cancelled
 
+    # Latest prediction, denormalized so at-risk invoices can be read from one index
+    current_prediction_id = Column(Integer, nullable=True)
+    current_risk_score = Column(Float, nullable=True)
+
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -34,6 +38,16 @@ class Invoice(Base):
     payments = relationship("Payment", back_populates="invoice", cascade="all, delete-orphan")
     predictions = relationship("Prediction", back_populates="invoice", cascade="all, delete-orphan")
     line_items = relationship("InvoiceLineItem", back_populates="invoice", cascade="all, delete-orphan")
+    current_prediction = relationship(
+        "Prediction",
+        primaryjoin="foreign(Invoice.current_prediction_id) == Prediction.id",
+        viewonly=True
+    )
+
+    # Indexes
+    __table_args__ = (
+        Index('ix_invoices_status_current_risk', 'status', 'current_risk_score'),
+    )
 
     def __repr__(self):
         return f"<Invoice {self.invoice_number}: €{self.amount}>"
@@ -2,7 +2,7 @@
 Product model for pricing system.
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, func, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, func, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -123,6 +123,16 @@ class ProductBasePrice(Base):
     # Relationships
     product = relationship("Product", back_populates="base_prices")
 
+    # Indexes for point-in-time price resolution
+    __table_args__ = (
+        Index('ix_product_base_prices_product_valid_from', 'product_id', 'valid_from'),
+        Index(
+            'ix_product_base_prices_open', 'product_id',
+            postgresql_where=text('valid_to IS NULL'),
+            sqlite_where=text('valid_to IS NULL'),
+        ),
+    )
+
     def __repr__(self):
         return f"<ProductBasePrice {self.product_id}: LC={self.lc}, valid_from={self.valid_from}>"
 
@@ -173,5 +183,39 @@ class CustomerProductPrice(Base):
     product = relationship("Product", back_populates="customer_prices")
     customer = relationship("Customer", back_populates="product_prices")
 
+    # Indexes for point-in-time price resolution
+    __table_args__ = (
+        Index('ix_customer_product_prices_product_customer_valid_from', 'product_id', 'customer_id', 'valid_from'),
+        Index(
+            'ix_customer_product_prices_open', 'product_id', 'customer_id',
+            postgresql_where=text('valid_to IS NULL'),
+            sqlite_where=text('valid_to IS NULL'),
+        ),
+    )
+
     def __repr__(self):
         return f"<CustomerProductPrice {self.product_id}-{self.customer_id}: CP={self.cp}>"
+
+
+class ProductPriceThreshold(Base):
+    """
+    Precomputed production price threshold per product
+    (LC of the open base price × industry production factor).
+    Rebuilt by app.services.price_thresholds whenever a base price or factor changes.
+    """
+
+    __tablename__ = "product_price_thresholds"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    industry_id = Column(Integer, ForeignKey("industries.id"), nullable=False, index=True)
+    base_price_id = Column(Integer, ForeignKey("product_base_prices.id"), nullable=False)
+
+    lc = Column(Float, nullable=False)
+    production_factor = Column(Float, nullable=False)
+    threshold = Column(Float, nullable=False)  # LC × production_factor
+
+    # Metadata
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ProductPriceThreshold {self.product_id}: {self.threshold}>"
@@ -0,0 +1,36 @@
+"""
+Model training job model.
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+
+from app.core.database import Base
+
+
+class TrainingJob(Base):
+    """
+    Queued or running model training, executed in a separate process.
+    """
+
+    __tablename__ = "training_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_type = Column(String(100), nullable=False)  # payment_predictor, cashflow_forecaster
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, completed, failed, cancelled, timed_out
+    error = Column(Text)
+
+    # Result
+    ml_model_id = Column(Integer, ForeignKey("ml_models.id"))
+
+    # Background job state
+    worker_id = Column(String(100))  # Worker supervising the training process
+    heartbeat_at = Column(DateTime(timezone=True))  # Last liveness update from the worker
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    requested_by = Column(String(100))
+
+    def __repr__(self):
+        return f"<TrainingJob {self.id} {self.model_type}: {self.status}>"
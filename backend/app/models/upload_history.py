@@ -2,7 +2,8 @@
 Upload history model for tracking data uploads.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, func, JSON
+from sqlalchemy import Column, Integer, String, DateTime, func, JSON, LargeBinary
+from sqlalchemy.orm import deferred
 
 from app.core.database import Base
 
@@ -19,9 +20,17 @@ class UploadHistory(Base):
     data_type = Column(String(50), nullable=False)  # customers, invoices, payments
     rows_uploaded = Column(Integer, default=0)
     rows_failed = Column(Integer, default=0)
-    status = Column(String(20), default="processing")  # processing, completed, failed
+    status = Column(String(20), default="processing")  # queued, processing, completed, failed
     errors = Column(JSON)  # List of error messages
 
+    # Background job state (pricing upload jobs)
+    file_contents = deferred(Column(LargeBinary))  # Uploaded file, kept until the job completes
+    rows_total = Column(Integer)
+    rows_processed = Column(Integer, default=0)  # Rows in committed chunks; resume point after restart
+    result = Column(JSON)  # Counters accumulated over committed chunks
+    worker_id = Column(String(100))  # Worker currently running the job
+    heartbeat_at = Column(DateTime(timezone=True))  # Last progress update from the worker
+
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True))
@@ -0,0 +1,194 @@
+"""
+Cash flow aggregation of predicted invoice payments.
+
+Predicted payment dates are bucketed by day, week (starting Monday) or
+month, summed per bucket and currency, and turned into running totals in a
+single vectorized pass per scenario.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session, joinedload
+
+from app.ml.models.cashflow_forecaster import CashFlowForecaster
+from app.ml.models.payment_predictor import PaymentPredictor
+from app.models.invoice import Invoice
+from app.services.prediction_cache import predictions_for_invoices
+
+SCENARIOS = ["optimistic", "realistic", "pessimistic"]
+GRANULARITIES = ["day", "week", "month"]
+
+# Invoice.currency default
+DEFAULT_CURRENCY = "EUR"
+
+
+PAYMENT_COLUMNS = ["invoice_id", "invoice_number", "customer", "amount", "currency", "due_date"]
+
+
+def predicted_invoice_payments(
+    db: Session,
+    model: PaymentPredictor,
+    ml_model_id: Optional[int],
+    start_date: date,
+    end_date: date
+) -> pd.DataFrame:
+    """
+    Pending invoices due in [start_date, end_date] with their predicted
+    payment date under every scenario. Does not commit (new predictions are
+    stored through the prediction cache).
+
+    Returns:
+        DataFrame with PAYMENT_COLUMNS and one '<scenario>_date' column per scenario
+    """
+    pending_invoices = db.query(Invoice).options(
+        joinedload(Invoice.customer)
+    ).filter(
+        Invoice.status == 'pending',
+        Invoice.due_date >= start_date,
+        Invoice.due_date <= end_date
+    ).all()
+
+    payments = pd.DataFrame(
+        [
+            {
+                "invoice_id": invoice.id,
+                "invoice_number": invoice.invoice_number,
+                "customer": invoice.customer.name,
+                "amount": invoice.amount,
+                "currency": invoice.currency or DEFAULT_CURRENCY,
+                "due_date": invoice.due_date,
+            }
+            for invoice in pending_invoices
+        ],
+        columns=PAYMENT_COLUMNS
+    )
+
+    scenario_columns = [f"{scenario}_date" for scenario in SCENARIOS]
+    if pending_invoices:
+        results = predictions_for_invoices(db, pending_invoices, model, ml_model_id)
+        payments[scenario_columns] = results[scenario_columns].to_numpy()
+    else:
+        payments = payments.reindex(columns=PAYMENT_COLUMNS + scenario_columns)
+    return payments
+
+
+def bucket_starts(dates: pd.Series, granularity: str) -> pd.Series:
+    """Map dates to the first day of their day/week/month bucket."""
+    dates = pd.to_datetime(dates)
+    if granularity == "day":
+        return dates.dt.normalize()
+    if granularity == "week":
+        return dates.dt.normalize() - pd.to_timedelta(dates.dt.weekday, unit="D")
+    if granularity == "month":
+        return dates.dt.to_period("M").dt.start_time
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _bucket_rows(amounts: pd.DataFrame) -> List[Dict]:
+    """
+    Response rows from per-bucket amounts (index: bucket start, one column
+    per currency, sorted by bucket).
+    """
+    cumulative = amounts.cumsum()
+    total = amounts.sum(axis=1)
+    total_cumulative = total.cumsum()
+    currencies = list(amounts.columns)
+
+    return [
+        {
+            "date": bucket.date(),
+            "amount": float(total.iloc[i]),
+            "cumulative": float(total_cumulative.iloc[i]),
+            "by_currency": {
+                currency: {
+                    "amount": float(amounts.iat[i, j]),
+                    "cumulative": float(cumulative.iat[i, j]),
+                }
+                for j, currency in enumerate(currencies)
+            },
+        }
+        for i, bucket in enumerate(amounts.index)
+    ]
+
+
+def aggregate_cashflow(
+    payments: pd.DataFrame,
+    granularity: str = "day",
+    scenarios: List[str] = SCENARIOS
+) -> Dict[str, Dict]:
+    """
+    Aggregate predicted payments into cash flow buckets with running totals.
+
+    Args:
+        payments: DataFrame with amount, currency and one '<scenario>_date'
+            column per requested scenario
+        granularity: Bucket size (day/week/month)
+        scenarios: Scenarios to aggregate
+
+    Returns:
+        Dictionary of scenario -> {"cashflow": bucket rows, "totals_by_currency": {...}}.
+        Bucket rows hold the amount and running total over all currencies
+        plus the same per currency.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    if payments.empty:
+        return {scenario: {"cashflow": [], "totals_by_currency": {}} for scenario in scenarios}
+
+    currency = payments["currency"].fillna(DEFAULT_CURRENCY)
+    amount = payments["amount"].astype(float)
+    totals_by_currency = {cur: float(total) for cur, total in amount.groupby(currency).sum().items()}
+
+    aggregated = {}
+    for scenario in scenarios:
+        buckets = bucket_starts(payments[f"{scenario}_date"], granularity)
+        amounts = amount.groupby([buckets, currency]).sum().unstack(fill_value=0.0).sort_index()
+        aggregated[scenario] = {
+            "cashflow": _bucket_rows(amounts),
+            "totals_by_currency": totals_by_currency,
+        }
+    return aggregated
+
+
+def forecast_timeseries(model: CashFlowForecaster, days_ahead: int, granularity: str) -> Dict:
+    """
+    Prophet trend forecast for the next days_ahead days, per day or
+    aggregated per week/month, with the model's trend analysis and metrics.
+    """
+    if granularity == "day":
+        forecast_df = model.forecast(days_ahead)
+
+        forecast_data = [
+            {
+                "date": row['ds'].strftime('%Y-%m-%d'),
+                "predicted_amount": float(row['yhat']),
+                "lower_bound": float(row['yhat_lower']),
+                "upper_bound": float(row['yhat_upper'])
+            }
+            for _, row in forecast_df.iterrows()
+        ]
+    else:
+        # Weekly or monthly aggregation
+        forecast_df = model.forecast_aggregate(days_ahead, granularity)
+
+        forecast_data = [
+            {
+                "period": row['period_str'],
+                "start_date": row['ds'].strftime('%Y-%m-%d'),
+                "predicted_amount": float(row['yhat']),
+                "lower_bound": float(row['yhat_lower']),
+                "upper_bound": float(row['yhat_upper'])
+            }
+            for _, row in forecast_df.iterrows()
+        ]
+
+    return {
+        "forecast": forecast_data,
+        "granularity": granularity,
+        "days_ahead": days_ahead,
+        "trend_analysis": model.get_trend_analysis(),
+        "model_metrics": model.metrics
+    }
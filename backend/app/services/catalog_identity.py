@@ -0,0 +1,78 @@
+"""
+Per-worker cache of catalogue identities (product and industry code -> id).
+
+Pricing endpoints address products and industries by code but work with ids.
+Resolved codes are kept in bounded TTL caches; lookups that miss use
+statements built once at import time with bound parameters, so SQLAlchemy
+reuses their compiled form instead of building a new ORM query per call.
+Unknown codes are not cached, so newly created rows are found immediately.
+"""
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.product import Product, Industry
+
+_PRODUCT_ID_BY_CODE = select(Product.id).where(Product.code == bindparam("code"))
+_PRODUCT_IDS_BY_CODES = select(Product.code, Product.id).where(
+    Product.code.in_(bindparam("codes", expanding=True))
+)
+_INDUSTRY_ID_BY_CODE = select(Industry.id).where(Industry.code == bindparam("code"))
+
+_product_ids = TTLCache(
+    maxsize=settings.PRICING_IDENTITY_CACHE_SIZE,
+    ttl_seconds=settings.PRICING_IDENTITY_CACHE_TTL_SECONDS
+)
+_industry_ids = TTLCache(
+    maxsize=settings.PRICING_IDENTITY_CACHE_SIZE,
+    ttl_seconds=settings.PRICING_IDENTITY_CACHE_TTL_SECONDS
+)
+
+
+def product_id_for_code(db: Session, code: str) -> Optional[int]:
+    """Return the id of the product with the given code, or None if unknown."""
+    product_id = _product_ids.get(code)
+    if product_id is None:
+        product_id = db.execute(_PRODUCT_ID_BY_CODE, {"code": code}).scalar()
+        if product_id is not None:
+            _product_ids.set(code, product_id)
+    return product_id
+
+
+def product_ids_for_codes(db: Session, codes: Iterable[str]) -> Dict[str, int]:
+    """Resolve many product codes at once; unknown codes are left out."""
+    resolved = {}
+    missing = []
+    for code in set(codes):
+        product_id = _product_ids.get(code)
+        if product_id is None:
+            missing.append(code)
+        else:
+            resolved[code] = product_id
+
+    if missing:
+        for code, product_id in db.execute(_PRODUCT_IDS_BY_CODES, {"codes": missing}).all():
+            _product_ids.set(code, product_id)
+            resolved[code] = product_id
+
+    return resolved
+
+
+def industry_id_for_code(db: Session, code: str) -> Optional[int]:
+    """Return the id of the industry with the given code, or None if unknown."""
+    industry_id = _industry_ids.get(code)
+    if industry_id is None:
+        industry_id = db.execute(_INDUSTRY_ID_BY_CODE, {"code": code}).scalar()
+        if industry_id is not None:
+            _industry_ids.set(code, industry_id)
+    return industry_id
+
+
+def invalidate_catalog_identity() -> None:
+    """Drop cached identities. Call after products or industries are written."""
+    _product_ids.invalidate()
+    _industry_ids.invalidate()
@@ -0,0 +1,141 @@
+"""
+Per-customer payment forecasts with caching.
+
+A customer's forecast (pending invoices with predicted payment dates) is
+cached per worker together with a state key: the active model and
+aggregates of the customer's invoices and payments. The key is read for
+all requested customers with two grouped queries, so a new invoice, a new
+payment, a changed invoice or a model activation in any worker makes the
+cached forecast miss. All customers that miss are scored in one model call.
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.ml.models.payment_predictor import PaymentPredictor
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.services.model_registry import model_registry
+from app.services.prediction_cache import predictions_for_invoices
+
+_forecast_cache = TTLCache(
+    maxsize=settings.CUSTOMER_FORECAST_CACHE_SIZE,
+    ttl_seconds=settings.CUSTOMER_FORECAST_CACHE_TTL_SECONDS
+)
+
+
+def _customer_states(db: Session, customer_ids: List[int]) -> Dict[int, tuple]:
+    """State key per customer: invoice and payment counts and latest changes."""
+    invoice_states = dict.fromkeys(customer_ids, (0, None, None))
+    for customer_id, count, last_id, last_change in db.execute(
+        select(
+            Invoice.customer_id,
+            func.count(Invoice.id),
+            func.max(Invoice.id),
+            func.max(func.coalesce(Invoice.updated_at, Invoice.created_at)),
+        ).where(Invoice.customer_id.in_(customer_ids)).group_by(Invoice.customer_id)
+    ).all():
+        invoice_states[customer_id] = (count, last_id, last_change)
+
+    payment_states = dict.fromkeys(customer_ids, (0, None))
+    for customer_id, count, last_id in db.execute(
+        select(Invoice.customer_id, func.count(Payment.id), func.max(Payment.id))
+        .join(Invoice, Invoice.id == Payment.invoice_id)
+        .where(Invoice.customer_id.in_(customer_ids))
+        .group_by(Invoice.customer_id)
+    ).all():
+        payment_states[customer_id] = (count, last_id)
+
+    return {
+        customer_id: (invoice_states[customer_id], payment_states[customer_id])
+        for customer_id in customer_ids
+    }
+
+
+def _forecast(customer: Customer, invoices: List[Invoice], results: Dict[int, Dict]) -> Dict:
+    predictions = [
+        {
+            "invoice_id": invoice.id,
+            "invoice_number": invoice.invoice_number,
+            "amount": invoice.amount,
+            "due_date": invoice.due_date,
+            "predicted_payment_date": results[invoice.id]['predicted_payment_date'],
+            "on_time_probability": results[invoice.id]['on_time_probability'],
+            "risk_score": results[invoice.id]['risk_score']
+        }
+        for invoice in invoices
+    ]
+
+    return {
+        "customer_id": customer.id,
+        "customer_name": customer.name,
+        "customer_segment": customer.segment,
+        "customer_risk_score": customer.risk_score,
+        "pending_invoices": len(invoices),
+        "total_outstanding": sum(invoice.amount for invoice in invoices),
+        "predictions": predictions
+    }
+
+
+def customer_forecasts(
+    db: Session,
+    customer_ids: List[int],
+    load_model: Callable[[], Tuple[int, PaymentPredictor]]
+) -> Dict[int, Dict]:
+    """
+    Forecasts for many customers. Commits predictions stored on the way.
+
+    Args:
+        db: Database session
+        customer_ids: Customers to forecast; unknown ids are left out
+        load_model: Returns the active payment predictor's MLModel id and
+            the model; only called when some invoice has to be scored
+
+    Returns:
+        Dictionary of customer id -> forecast
+    """
+    # Version this worker serves; forecasts are keyed by the version that scored them
+    ml_model_id = model_registry.active_id("payment_predictor")
+    states = _customer_states(db, customer_ids)
+
+    forecasts = {}
+    misses = []
+    for customer_id in customer_ids:
+        cached = _forecast_cache.get(customer_id)
+        if cached is not None and cached[0] == (ml_model_id, states[customer_id]):
+            forecasts[customer_id] = cached[1]
+        else:
+            misses.append(customer_id)
+
+    if not misses:
+        return forecasts
+
+    customers = db.query(Customer).filter(Customer.id.in_(misses)).all()
+    pending_invoices = db.query(Invoice).filter(
+        Invoice.customer_id.in_(misses),
+        Invoice.status == 'pending'
+    ).order_by(Invoice.id).all()
+
+    results = {}
+    if pending_invoices:
+        ml_model_id, model = load_model()
+        results = predictions_for_invoices(db, pending_invoices, model, ml_model_id).to_dict('index')
+
+    invoices_by_customer = defaultdict(list)
+    for invoice in pending_invoices:
+        invoices_by_customer[invoice.customer_id].append(invoice)
+
+    for customer in customers:
+        forecast = _forecast(customer, invoices_by_customer[customer.id], results)
+        _forecast_cache.set(customer.id, ((ml_model_id, states[customer.id]), forecast))
+        forecasts[customer.id] = forecast
+
+    # Commit newly stored predictions only now: committing expires the loaded rows
+    db.commit()
+    return forecasts
@@ -0,0 +1,254 @@
+"""
+Daily cash flow forecast snapshots.
+
+The invoice-level and Prophet forecasts for 90/180/365 days, every scenario
+and every granularity are materialized into cashflow_forecast_snapshots,
+keyed by model and as-of date. Dashboards read the snapshots instead of
+rescoring; snapshots are taken by a daily background job and retaken when
+invoices or payments are loaded. Runs are serialized across workers, so
+workers scheduled at the same hour take the snapshots only once.
+"""
+
+import json
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.forecast_snapshot import CashflowForecastSnapshot
+from app.models.ml_model import MLModel
+from app.services.model_registry import model_registry
+from app.services.cashflow import (
+    GRANULARITIES, SCENARIOS, aggregate_cashflow, forecast_timeseries, predicted_invoice_payments,
+)
+
+SNAPSHOT_HORIZONS = [90, 180, 365]
+
+INVOICES_KIND = "invoices"
+TIMESERIES_KIND = "timeseries"
+
+# Snapshot kind -> name of the model (MLModel.name) it is built from
+KIND_MODELS = {
+    INVOICES_KIND: "payment_predictor",
+    TIMESERIES_KIND: "cashflow_forecaster",
+}
+
+# Key of the PostgreSQL advisory lock held during snapshot runs (any constant unique to this job)
+SNAPSHOT_LOCK_KEY = 7_017_001
+
+_refresh_lock = threading.Lock()
+
+
+@contextmanager
+def _workers_lock():
+    """
+    Hold a PostgreSQL advisory lock across workers. A worker that waited
+    for it finds today's snapshots present and skips them (only_missing).
+    Other databases get only the per-process lock.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    # Own autocommit connection: the lock must outlive the session's commits
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SNAPSHOT_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SNAPSHOT_LOCK_KEY})
+
+
+def _store_snapshot(
+    db: Session,
+    kind: str,
+    ml_model: MLModel,
+    as_of: date,
+    horizon_days: int,
+    granularity: str,
+    payload: Dict
+) -> None:
+    """Replace the snapshot with the same key."""
+    db.execute(delete(CashflowForecastSnapshot).where(
+        CashflowForecastSnapshot.kind == kind,
+        CashflowForecastSnapshot.ml_model_id == ml_model.id,
+        CashflowForecastSnapshot.as_of_date == as_of,
+        CashflowForecastSnapshot.horizon_days == horizon_days,
+        CashflowForecastSnapshot.granularity == granularity,
+    ))
+    db.add(CashflowForecastSnapshot(
+        kind=kind,
+        ml_model_id=ml_model.id,
+        model_version=ml_model.version,
+        as_of_date=as_of,
+        horizon_days=horizon_days,
+        granularity=granularity,
+        # Dates become ISO strings, as in the API responses
+        payload=json.loads(json.dumps(payload, default=str)),
+        created_at=datetime.now()
+    ))
+
+
+def _invoice_snapshots(db: Session, model, ml_model: MLModel, as_of: date) -> int:
+    """Score pending invoices once for the longest horizon and bucket every horizon from it."""
+    payments = predicted_invoice_payments(db, model, ml_model.id, as_of, as_of + timedelta(days=max(SNAPSHOT_HORIZONS)))
+    due_dates = payments['due_date']
+
+    written = 0
+    for horizon_days in SNAPSHOT_HORIZONS:
+        end_date = as_of + timedelta(days=horizon_days)
+        in_horizon = payments[due_dates <= end_date]
+
+        for granularity in GRANULARITIES:
+            aggregated = aggregate_cashflow(in_horizon, granularity, SCENARIOS)
+            _store_snapshot(db, INVOICES_KIND, ml_model, as_of, horizon_days, granularity, {
+                "start_date": as_of,
+                "end_date": end_date,
+                "granularity": granularity,
+                "scenarios": {scenario: aggregated[scenario]["cashflow"] for scenario in SCENARIOS},
+                "summary": {
+                    "total_expected": float(in_horizon['amount'].sum()),
+                    "totals_by_currency": aggregated[SCENARIOS[0]]["totals_by_currency"],
+                    "invoice_count": len(in_horizon),
+                },
+            })
+            written += 1
+    return written
+
+
+def _timeseries_snapshots(db: Session, model, ml_model: MLModel, as_of: date) -> int:
+    written = 0
+    for horizon_days in SNAPSHOT_HORIZONS:
+        for granularity in GRANULARITIES:
+            payload = forecast_timeseries(model, horizon_days, granularity)
+            _store_snapshot(db, TIMESERIES_KIND, ml_model, as_of, horizon_days, granularity, payload)
+            written += 1
+    return written
+
+
+def take_forecast_snapshots(
+    db: Session,
+    models: Dict[str, Optional[Tuple[int, object]]],
+    as_of: Optional[date] = None,
+    only_missing: bool = False
+) -> Dict[str, int]:
+    """
+    Materialize forecasts of the active models. Commits.
+
+    Args:
+        db: Database session
+        models: (ml_model_id, loaded model) by name (payment_predictor,
+            cashflow_forecaster); snapshots are keyed to that id, and kinds
+            whose model is missing are skipped
+        as_of: Snapshot date (default: today)
+        only_missing: Skip kinds that already have snapshots for this model and date
+
+    Returns:
+        Number of snapshots written per kind
+    """
+    as_of = as_of or datetime.now().date()
+    builders = {INVOICES_KIND: _invoice_snapshots, TIMESERIES_KIND: _timeseries_snapshots}
+    written = {}
+
+    for kind, name in KIND_MODELS.items():
+        entry = models.get(name)
+        ml_model = db.get(MLModel, entry[0]) if entry is not None else None
+        if ml_model is None:
+            continue
+        model = entry[1]
+
+        if only_missing and db.execute(
+            select(CashflowForecastSnapshot.id).where(
+                CashflowForecastSnapshot.kind == kind,
+                CashflowForecastSnapshot.ml_model_id == ml_model.id,
+                CashflowForecastSnapshot.as_of_date == as_of,
+            ).limit(1)
+        ).first() is not None:
+            continue
+
+        written[kind] = builders[kind](db, model, ml_model, as_of)
+        db.commit()
+
+    return written
+
+
+def latest_snapshot(
+    db: Session,
+    kind: str,
+    horizon_days: int,
+    granularity: str,
+    as_of: Optional[date] = None
+) -> Optional[CashflowForecastSnapshot]:
+    """
+    Most recent snapshot of the model this worker serves, taken on or
+    before as_of (default: today).
+    """
+    ml_model_id = model_registry.active_id(KIND_MODELS[kind])
+    if ml_model_id is None:
+        return None
+
+    return db.execute(
+        select(CashflowForecastSnapshot)
+        .where(
+            CashflowForecastSnapshot.kind == kind,
+            CashflowForecastSnapshot.ml_model_id == ml_model_id,
+            CashflowForecastSnapshot.horizon_days == horizon_days,
+            CashflowForecastSnapshot.granularity == granularity,
+            CashflowForecastSnapshot.as_of_date <= (as_of or datetime.now().date()),
+        )
+        .order_by(CashflowForecastSnapshot.as_of_date.desc())
+        .limit(1)
+    ).scalar()
+
+
+def _loaded_models() -> Dict[str, Optional[Tuple[int, object]]]:
+    # Runs off the request path, so it may load models the poller has not loaded yet
+    model_registry.sync()
+    return {name: model_registry.get_with_id(name) for name in KIND_MODELS.values()}
+
+
+def refresh_forecast_snapshots(only_missing: bool = False) -> Dict[str, int]:
+    """Take today's snapshots with the loaded models in a fresh session, one worker at a time."""
+    with _refresh_lock, _workers_lock():
+        db = SessionLocal()
+        try:
+            return take_forecast_snapshots(db, _loaded_models(), only_missing=only_missing)
+        finally:
+            db.close()
+
+
+def _refresh_in_background(only_missing: bool = False) -> None:
+    try:
+        refresh_forecast_snapshots(only_missing=only_missing)
+    except Exception:
+        traceback.print_exc()
+
+
+def refresh_forecast_snapshots_async() -> None:
+    """Retake today's snapshots in a background thread (after invoices or payments are loaded)."""
+    threading.Thread(target=_refresh_in_background, name="forecast-snapshots", daemon=True).start()
+
+
+def start_forecast_snapshot_scheduler() -> None:
+    """
+    Take missing snapshots now and then every day at FORECAST_SNAPSHOT_HOUR
+    (server local time) in a background thread.
+    """
+    def run():
+        while True:
+            _refresh_in_background(only_missing=True)
+
+            now = datetime.now()
+            next_run = now.replace(hour=settings.FORECAST_SNAPSHOT_HOUR, minute=0, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            time.sleep((next_run - now).total_seconds())
+
+    threading.Thread(target=run, name="forecast-snapshot-scheduler", daemon=True).start()
@@ -0,0 +1,44 @@
+"""
+Identity and liveness of background job workers.
+
+Jobs record the worker that claimed them as "<host>:<pid>:<start time>". A
+worker on another host is only known to be gone once its heartbeat goes
+stale, but a worker on this host can be checked directly, so the jobs it
+left behind are taken over right after a restart instead of after the
+stale timeout. The start time tells a restarted process apart from an
+earlier one that had the same pid (e.g. pid 1 in a restarted container).
+"""
+
+import os
+import socket
+import time
+from typing import Optional
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{int(time.time())}"
+
+
+def is_dead_local_worker(worker_id: Optional[str]) -> bool:
+    """True if worker_id names a process on this host that no longer runs."""
+    parts = (worker_id or "").rsplit(":", 2)
+    if len(parts) != 3 or parts[0] != socket.gethostname() or not parts[1].isdigit():
+        return False
+    if worker_id == WORKER_ID:
+        return False
+
+    pid = int(parts[1])
+    if pid == os.getpid():
+        # This pid now belongs to us, so that process is gone
+        return True
+    if os.name != "posix":
+        # os.kill() would terminate the process instead of probing it
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # Exists but belongs to another user
+        return False
+    # Alive, or the pid was reused: wait for the heartbeat to go stale
+    return False
@@ -0,0 +1,173 @@
+"""
+Realized margin and coverage analytics over invoice line items.
+
+Every sold line is compared with the C0 and Cmin valid on its invoice date.
+Lines are aggregated per month to (customer, product) facts which are cached
+per month, so dashboards re-aggregate small cached frames instead of
+rescanning line items.
+"""
+
+from datetime import datetime, time, timezone
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.invoice import Invoice, InvoiceLineItem
+from app.models.product import Product, Industry
+from app.services.price_resolution import resolve_prices_batch
+
+# Dimension name -> fact column
+GROUP_COLUMNS = {
+    "customer": "customer_id",
+    "product": "product_code",
+    "industry": "industry_code",
+    "month": "month",
+}
+
+FACT_KEYS = ["month", "customer_id", "product_code", "industry_code"]
+FACT_MEASURES = ["lines", "lines_without_price", "quantity", "revenue", "priced_revenue", "cost_c0", "cost_cmin"]
+
+_month_cache = TTLCache(maxsize=240, ttl_seconds=settings.PRICING_ANALYTICS_CACHE_TTL_SECONDS)
+
+
+def _load_line_items(db: Session, start: datetime, end: datetime) -> pd.DataFrame:
+    """Load the sold lines of non-cancelled invoices dated in [start, end)."""
+    rows = db.execute(
+        select(
+            Invoice.invoice_date,
+            Invoice.customer_id,
+            InvoiceLineItem.product_id,
+            Product.code,
+            Industry.code,
+            InvoiceLineItem.quantity,
+            InvoiceLineItem.line_net_total,
+        )
+        .join(Invoice, Invoice.id == InvoiceLineItem.invoice_id)
+        .join(Product, Product.id == InvoiceLineItem.product_id)
+        .join(Industry, Industry.id == Product.industry_id)
+        .where(
+            Invoice.invoice_date >= start.date(),
+            Invoice.invoice_date < end.date(),
+            Invoice.status != "cancelled"
+        )
+    ).all()
+
+    return pd.DataFrame(rows, columns=[
+        'invoice_date', 'customer_id', 'product_id', 'product_code', 'industry_code',
+        'quantity', 'revenue',
+    ])
+
+
+def _month_facts(db: Session, months: pd.PeriodIndex) -> pd.DataFrame:
+    """
+    Aggregate line items of the given contiguous months to
+    (month, customer, product) facts.
+
+    Prices are resolved once per distinct (product, invoice date), as of the
+    start of the invoice date.
+    """
+    start = months[0].start_time.to_pydatetime()
+    end = (months[-1] + 1).start_time.to_pydatetime()
+    lines = _load_line_items(db, start, end)
+
+    if lines.empty:
+        return pd.DataFrame(columns=FACT_KEYS + FACT_MEASURES)
+
+    sales_days = lines[['product_id', 'invoice_date']].drop_duplicates()
+    sales_days['at'] = [datetime.combine(day, time.min, tzinfo=timezone.utc) for day in sales_days['invoice_date']]
+    sales_days = resolve_prices_batch(db, sales_days)
+
+    lines = lines.merge(sales_days[['product_id', 'invoice_date', 'c0', 'cmin']],
+                        on=['product_id', 'invoice_date'], how='left', sort=False)
+
+    priced = lines['c0'].notna().to_numpy()
+    lines['month'] = pd.PeriodIndex(pd.to_datetime(lines['invoice_date']), freq='M').astype(str)
+    lines['lines'] = 1
+    lines['lines_without_price'] = (~priced).astype(int)
+    lines['priced_revenue'] = np.where(priced, lines['revenue'], 0.0)
+    lines['cost_c0'] = np.where(priced, lines['quantity'] * lines['c0'], 0.0)
+    lines['cost_cmin'] = np.where(priced, lines['quantity'] * lines['cmin'], 0.0)
+
+    return lines.groupby(FACT_KEYS, as_index=False, sort=False)[FACT_MEASURES].sum()
+
+
+def _facts_for_months(db: Session, months: pd.PeriodIndex) -> pd.DataFrame:
+    """Return cached facts for the months, computing all missing months in one pass."""
+    cached = {month: _month_cache.get(str(month)) for month in months}
+    missing = pd.PeriodIndex([month for month, facts in cached.items() if facts is None], freq='M')
+
+    if len(missing):
+        computed = _month_facts(db, pd.period_range(missing.min(), missing.max(), freq='M'))
+        for month in missing:
+            facts = computed[computed['month'] == str(month)].reset_index(drop=True)
+            _month_cache.set(str(month), facts)
+            cached[month] = facts
+
+    return pd.concat(cached.values(), ignore_index=True)
+
+
+def _add_ratios(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive margins (absolute and % of revenue) and coverage (% of cost) from summed measures."""
+    df['margin_vs_c0'] = df['priced_revenue'] - df['cost_c0']
+    df['margin_vs_cmin'] = df['priced_revenue'] - df['cost_cmin']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['margin_pct_vs_c0'] = np.where(df['priced_revenue'] > 0, df['margin_vs_c0'] / df['priced_revenue'] * 100, np.nan)
+        df['margin_pct_vs_cmin'] = np.where(df['priced_revenue'] > 0, df['margin_vs_cmin'] / df['priced_revenue'] * 100, np.nan)
+        df['coverage_vs_c0'] = np.where(df['cost_c0'] > 0, df['priced_revenue'] / df['cost_c0'] * 100, np.nan)
+        df['coverage_vs_cmin'] = np.where(df['cost_cmin'] > 0, df['priced_revenue'] / df['cost_cmin'] * 100, np.nan)
+    return df
+
+
+def margin_analytics(db: Session, period_from: str, period_to: str, group_by: List[str]) -> Dict:
+    """
+    Realized margin and coverage against C0/Cmin, aggregated by the given dimensions.
+
+    Args:
+        db: Database session
+        period_from: First month, 'YYYY-MM'
+        period_to: Last month (inclusive), 'YYYY-MM'
+        group_by: Dimensions from GROUP_COLUMNS (customer, product, industry, month)
+
+    Returns:
+        Dictionary with 'rows' (one per group) and 'totals'
+    """
+    unknown = set(group_by) - set(GROUP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown group_by dimensions: {sorted(unknown)}")
+
+    months = pd.period_range(pd.Period(period_from, freq='M'), pd.Period(period_to, freq='M'), freq='M')
+    if months.empty:
+        raise ValueError("period_from must not be after period_to")
+
+    facts = _facts_for_months(db, months)
+    for col in FACT_MEASURES:
+        facts[col] = pd.to_numeric(facts[col])
+
+    keys = [GROUP_COLUMNS[dim] for dim in group_by]
+    if keys:
+        grouped = facts.groupby(keys, as_index=False, sort=True)[FACT_MEASURES].sum()
+    else:
+        grouped = pd.DataFrame(columns=FACT_MEASURES)
+
+    totals = facts[FACT_MEASURES].sum().to_frame().T.astype({'lines': int, 'lines_without_price': int})
+    totals = _add_ratios(totals)
+    grouped = _add_ratios(grouped)
+
+    def records(df):
+        df = df.astype(object)
+        return df.where(pd.notna(df), None).to_dict('records')
+
+    return {
+        "rows": records(grouped),
+        "totals": records(totals)[0],
+    }
+
+
+def invalidate_margin_analytics() -> None:
+    """Drop cached month facts. Call after invoices or historical prices change."""
+    _month_cache.invalidate()
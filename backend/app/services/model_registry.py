@@ -0,0 +1,255 @@
+"""
+Registry of loaded ML models.
+
+The active MLModel row of each model name is the source of truth. Every
+worker polls ml_models every MODEL_REGISTRY_POLL_SECONDS (starting at
+startup); when another version becomes active (training or activation in
+any worker) the new artifact is loaded in the polling thread and swapped
+in with a single assignment, so requests keep using the previous model
+until the new one is ready. Requests never load artifacts: until the
+first poll has loaded a model, there is no active model to serve. The last
+MODEL_REGISTRY_MAX_LOADED versions stay loaded, which makes re-activating
+a recent version (rollback) instant.
+
+Artifacts are read by the loader registered for the row's model_type
+(app.ml.models.loaders) on a pool of MODEL_LOAD_WORKERS threads, and each
+model is warmed up with a dummy inference before it is served. A version
+that fails to load is retried on later polls with exponential backoff.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.ml.models import artifacts
+from app.ml.models.loaders import get_model_loader
+from app.models.ml_model import MLModel
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of the backoff between load attempts of a version that failed to load
+MAX_LOAD_RETRY_SECONDS = 600
+
+
+class ModelVersion(NamedTuple):
+    """Active MLModel row as seen by the registry."""
+    ml_model_id: int
+    name: str
+    version: str
+    model_type: str
+    path: str
+
+
+class ModelRegistry:
+    """
+    Thread-safe per-worker registry of active models with a bounded LRU of
+    loaded versions.
+    """
+
+    def __init__(self, max_loaded: int = 4, poll_seconds: float = 10, load_workers: int = 2):
+        self.max_loaded = max_loaded
+        self.poll_seconds = poll_seconds
+        self._active: Dict[str, Tuple[int, object]] = {}     # name -> (ml_model_id, model)
+        self._loaded: "OrderedDict[int, object]" = OrderedDict()  # ml_model_id -> model
+        self._stats: Dict[int, Dict] = {}    # ml_model_id -> load statistics of loaded versions
+        self._lock = threading.Lock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self._failed: Dict[int, Tuple[float, float]] = {}   # ml_model_id -> (monotonic retry time, backoff)
+        self._load_executor = ThreadPoolExecutor(max_workers=load_workers, thread_name_prefix="model-load")
+        self._poller: Optional[threading.Thread] = None
+
+    def _cached(self, ml_model_id: int):
+        with self._lock:
+            model = self._loaded.get(ml_model_id)
+            if model is not None:
+                self._loaded.move_to_end(ml_model_id)
+            return model
+
+    def _remember(self, ml_model_id: int, model, stats: Dict) -> None:
+        with self._lock:
+            self._loaded[ml_model_id] = model
+            self._loaded.move_to_end(ml_model_id)
+            self._stats[ml_model_id] = stats
+
+            # Evict least recently used versions, never an active one
+            active_ids = {active_id for active_id, _ in self._active.values()} | {ml_model_id}
+            for old_id in list(self._loaded):
+                if len(self._loaded) <= self.max_loaded:
+                    break
+                if old_id not in active_ids:
+                    del self._loaded[old_id]
+                    self._stats.pop(old_id, None)
+
+    def _load(self, version: ModelVersion):
+        """Loaded and warmed-up model of a version; concurrent callers wait for a single load."""
+        model = self._cached(version.ml_model_id)
+        if model is not None:
+            return model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(version.ml_model_id, threading.Lock())
+
+        with load_lock:
+            model = self._cached(version.ml_model_id)
+            if model is None:
+                loader = get_model_loader(version.model_type)
+
+                started = time.perf_counter()
+                model = loader.load(version.path)
+                loaded = time.perf_counter()
+                loader.warm_up(model)
+                warmed_up = time.perf_counter()
+
+                self._remember(version.ml_model_id, model, {
+                    "ml_model_id": version.ml_model_id,
+                    "name": version.name,
+                    "version": version.version,
+                    "model_type": version.model_type,
+                    "load_seconds": loaded - started,
+                    "warm_up_seconds": warmed_up - loaded,
+                    # Estimate: uncompressed size of the stored model files
+                    "memory_bytes": artifacts.model_size(version.path),
+                    "loaded_at": datetime.now(),
+                })
+
+        with self._lock:
+            self._load_locks.pop(version.ml_model_id, None)
+        return model
+
+    def preload(self, ml_model: MLModel) -> None:
+        """Load and warm up a version without activating it (raises if it cannot be loaded)."""
+        self._load(ModelVersion(ml_model.id, ml_model.name, ml_model.version, ml_model.model_type, ml_model.s3_path))
+        self._failed.pop(ml_model.id, None)
+
+    def _active_versions(self, db: Session) -> Dict[str, ModelVersion]:
+        """name -> version of the active rows (newest wins)."""
+        rows = db.execute(
+            select(MLModel.id, MLModel.name, MLModel.version, MLModel.model_type, MLModel.s3_path)
+            .where(MLModel.is_active == True)
+            .order_by(MLModel.id)
+        ).all()
+        return {row.name: ModelVersion(*row) for row in rows}
+
+    def sync(self, db: Optional[Session] = None) -> Dict[str, int]:
+        """
+        Load and swap in the active version of every model name. Versions
+        are loaded in parallel on the load pool.
+
+        A version that fails to load is logged and the previous version
+        kept; it is retried after a backoff that starts at poll_seconds and
+        doubles on every failure up to MAX_LOAD_RETRY_SECONDS.
+
+        Args:
+            db: Database session (default: a fresh session)
+
+        Returns:
+            Dictionary of model name -> active ml_model_id in this worker
+        """
+        if db is None:
+            db = SessionLocal()
+            try:
+                return self.sync(db)
+            finally:
+                db.close()
+
+        active_versions = self._active_versions(db)
+        now = time.monotonic()
+
+        loads = {
+            name: (version, self._load_executor.submit(self._load, version))
+            for name, version in active_versions.items()
+            if self.active_id(name) != version.ml_model_id
+            and now >= self._failed.get(version.ml_model_id, (now, 0.0))[0]
+        }
+
+        for name, (version, future) in loads.items():
+            try:
+                model = future.result()
+            except Exception:
+                _, backoff = self._failed.get(version.ml_model_id, (now, 0.0))
+                backoff = min(max(backoff * 2, self.poll_seconds), MAX_LOAD_RETRY_SECONDS)
+                self._failed[version.ml_model_id] = (time.monotonic() + backoff, backoff)
+                logger.exception("Could not load %s model %s from %s; retrying in %s seconds",
+                                 name, version.ml_model_id, version.path, backoff)
+                continue
+            self._failed.pop(version.ml_model_id, None)
+            self._active[name] = (version.ml_model_id, model)
+
+        for name in list(self._active):
+            if name not in active_versions:
+                self._active.pop(name, None)
+
+        return {name: ml_model_id for name, (ml_model_id, _) in self._active.items()}
+
+    def get_with_id(self, name: str) -> Optional[Tuple[int, object]]:
+        """
+        (ml_model_id, model) of the active model of the given name, or None
+        if there is none. Both come from the same entry, so results can be
+        labeled with the version that actually produced them.
+
+        Never loads or touches the database, so it is safe on the request
+        path; a model is only returned once sync() (the poller) loaded it.
+        """
+        return self._active.get(name)
+
+    def get(self, name: str):
+        """Active model of the given name, or None if there is none (see get_with_id)."""
+        entry = self.get_with_id(name)
+        return entry[1] if entry is not None else None
+
+    def active_id(self, name: str) -> Optional[int]:
+        """ml_model_id of the model get() returns, or None."""
+        entry = self._active.get(name)
+        return entry[0] if entry is not None else None
+
+    def activate(self, name: str, ml_model_id: int, model) -> None:
+        """Swap in an already loaded model (e.g. trained in this process)."""
+        self._remember(ml_model_id, model, {"ml_model_id": ml_model_id, "name": name, "loaded_at": datetime.now()})
+        self._active[name] = (ml_model_id, model)
+
+    def discard(self, ml_model_id: int) -> None:
+        """Drop a version from the LRU (e.g. after deleting it)."""
+        with self._lock:
+            self._loaded.pop(ml_model_id, None)
+            self._stats.pop(ml_model_id, None)
+
+    def loaded_versions(self) -> List[Dict]:
+        """Load time, warm-up time and memory estimate of loaded versions, most recently used last."""
+        with self._lock:
+            active_ids = {active_id for active_id, _ in self._active.values()}
+            return [
+                {**self._stats.get(ml_model_id, {}), "is_active": ml_model_id in active_ids}
+                for ml_model_id in self._loaded
+            ]
+
+    def start_polling(self) -> None:
+        """Sync now and then every poll_seconds in a background thread."""
+        if self._poller is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.sync()
+                except Exception:
+                    logger.exception("Could not sync the model registry")
+                time.sleep(self.poll_seconds)
+
+        self._poller = threading.Thread(target=run, name="model-registry", daemon=True)
+        self._poller.start()
+
+
+model_registry = ModelRegistry(
+    max_loaded=settings.MODEL_REGISTRY_MAX_LOADED,
+    poll_seconds=settings.MODEL_REGISTRY_POLL_SECONDS,
+    load_workers=settings.MODEL_LOAD_WORKERS
+)
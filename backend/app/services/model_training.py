@@ -0,0 +1,408 @@
+"""
+Background model training jobs.
+
+POST /models/train records a queued TrainingJob and returns at once. Jobs
+run on a pool of MODEL_TRAINING_WORKERS supervisor threads per API worker;
+each job is claimed atomically (so only one worker runs it) and trained in
+a separate process, which keeps feature engineering and model fitting off
+the event loop and the GIL. The supervisor terminates the process when the
+job is cancelled (from any worker) or runs longer than
+MODEL_TRAINING_TIMEOUT_SECONDS. Every worker rescans for jobs left behind
+by dead workers every STALE_JOB_SECONDS. A training process only completes
+its job while its worker's claim holds, so a process that outlived its
+supervisor cannot register a model once another worker took the job over.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional
+
+import pandas as pd
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.ml.features.feature_engineering import FeatureEngineer
+from app.ml.models.cashflow_forecaster import CashFlowForecaster
+from app.ml.models.loaders import PROPHET_TIMESERIES, XGBOOST_ENSEMBLE
+from app.ml.models.payment_predictor import PaymentPredictor
+from app.models.invoice import Invoice
+from app.models.ml_model import MLModel
+from app.models.payment import Payment
+from app.models.training_job import TrainingJob
+from app.services.job_workers import WORKER_ID, is_dead_local_worker
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Model name -> MLModel.model_type label
+MODEL_TYPE_LABELS = {
+    "payment_predictor": XGBOOST_ENSEMBLE,
+    "cashflow_forecaster": PROPHET_TIMESERIES,
+}
+
+# How often a supervisor checks its training process and refreshes the heartbeat
+SUPERVISE_INTERVAL_SECONDS = 1
+# A running job without a heartbeat for this long lost its worker and may be taken over
+STALE_JOB_SECONDS = 60
+
+_executor = ThreadPoolExecutor(max_workers=settings.MODEL_TRAINING_WORKERS, thread_name_prefix="model-training")
+# Jobs submitted to _executor and not finished yet, so rescans do not queue them twice
+_submitted = set()
+_submitted_lock = threading.Lock()
+
+
+class Claim(NamedTuple):
+    """A worker's ownership of a running job; a later claim of the same job supersedes it."""
+    job_id: int
+    worker_id: str
+    started_at: datetime
+
+
+def check_training_data(db: Session, model_type: str) -> None:
+    """
+    Raise ValueError if the model type is unknown or there is too little data to train it.
+    """
+    if model_type == "payment_predictor":
+        paid_invoices = db.query(Invoice).filter(Invoice.status == 'paid').count()
+        if paid_invoices < 50:
+            raise ValueError(f"Insufficient training data. Need at least 50 paid invoices, found {paid_invoices}")
+
+    elif model_type == "cashflow_forecaster":
+        payments = db.query(Payment).count()
+        if payments < 60:
+            raise ValueError(f"Insufficient payment history. Need at least 60 days, found {payments}")
+
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+
+def train_model(db: Session, model_type: str) -> MLModel:
+    """
+    Train a model on historical data, save the artifact and make it the
+    active version. Does not commit.
+
+    Args:
+        db: Database session
+        model_type: "payment_predictor" (XGBoost invoice payment prediction)
+            or "cashflow_forecaster" (Prophet cash flow trend)
+
+    Returns:
+        The new active MLModel row
+    """
+    check_training_data(db, model_type)
+    started = time.monotonic()
+
+    if model_type == "payment_predictor":
+        logger.info("Preparing training data for %s", model_type)
+        training_df = FeatureEngineer(db).prepare_training_data()
+
+        if len(training_df) < 50:
+            raise ValueError(f"After feature engineering, only {len(training_df)} samples. Need at least 50.")
+
+        training_window = db.query(func.min(Invoice.invoice_date), func.max(Invoice.invoice_date)).filter(
+            Invoice.status == 'paid'
+        ).one()
+
+        logger.info("Training %s", model_type)
+        model = PaymentPredictor()
+        metrics = model.train(training_df, test_size=0.2, training_window=tuple(training_window))
+
+    else:
+        logger.info("Preparing time series data for %s", model_type)
+        payments_df = pd.DataFrame(
+            db.query(Payment.payment_date, Payment.amount).all(),
+            columns=['payment_date', 'amount']
+        )
+
+        logger.info("Training %s", model_type)
+        model = CashFlowForecaster()
+        metrics = model.train(payments_df, validation_days=30)
+
+    os.makedirs(settings.MODEL_STORAGE_DIR, exist_ok=True)
+    version = f"v_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    model_path = os.path.join(settings.MODEL_STORAGE_DIR, f"{model_type}_{version}")
+    model.save(model_path, compress=settings.MODEL_ARTIFACT_COMPRESSION)
+
+    ml_model = MLModel(
+        name=model_type,
+        version=version,
+        model_type=MODEL_TYPE_LABELS[model_type],
+        purpose="cashflow",
+        s3_path=model_path,  # In production, upload to S3
+        metrics=metrics,
+        is_active=True,
+        training_samples=metrics.get('training_samples', metrics.get('training_days', 0)),
+        training_duration_seconds=time.monotonic() - started
+    )
+
+    # Deactivate previous models
+    db.query(MLModel).filter(
+        MLModel.name == model_type,
+        MLModel.is_active == True
+    ).update({"is_active": False})
+
+    db.add(ml_model)
+    db.flush()
+    return ml_model
+
+
+def enqueue_training_job(db: Session, model_type: str, requested_by: str = None) -> TrainingJob:
+    """Create a queued training job and submit it to this worker's pool."""
+    job = TrainingJob(model_type=model_type, status="queued", requested_by=requested_by)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    _submit(job.id)
+    return job
+
+
+def _submit(job_id: int, dead_worker: Optional[str] = None) -> None:
+    """Run a job on this worker's pool unless it is already waiting or running there."""
+    with _submitted_lock:
+        if job_id in _submitted:
+            return
+        _submitted.add(job_id)
+
+    def run():
+        try:
+            run_training_job(job_id, dead_worker)
+        finally:
+            with _submitted_lock:
+                _submitted.discard(job_id)
+
+    _executor.submit(run)
+
+
+def _claim_job(db: Session, job_id: int, dead_worker: Optional[str] = None) -> Optional[Claim]:
+    """
+    Atomically take ownership of a queued job, or of a running job whose
+    worker stopped sending heartbeats or is dead_worker.
+
+    Returns:
+        The claim, or None if the job is not available
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=STALE_JOB_SECONDS)
+
+    orphaned = or_(TrainingJob.heartbeat_at == None, TrainingJob.heartbeat_at < stale_before)
+    if dead_worker is not None:
+        orphaned = or_(orphaned, TrainingJob.worker_id == dead_worker)
+
+    result = db.execute(
+        update(TrainingJob)
+        .where(
+            TrainingJob.id == job_id,
+            or_(
+                TrainingJob.status == "queued",
+                and_(TrainingJob.status == "running", orphaned)
+            )
+        )
+        .values(status="running", worker_id=WORKER_ID, heartbeat_at=now, started_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return Claim(job_id, WORKER_ID, now) if result.rowcount == 1 else None
+
+
+def _error_with_traceback(error: Exception) -> str:
+    """Job error text: the message, then the traceback of the exception being handled."""
+    return f"{error}\n\n{traceback.format_exc()}"
+
+
+def _owned(claim: Claim):
+    """SQL condition: the job is still running under this claim (not cancelled, finished or taken over)."""
+    return and_(
+        TrainingJob.id == claim.job_id,
+        TrainingJob.status == "running",
+        TrainingJob.worker_id == claim.worker_id,
+        TrainingJob.started_at == claim.started_at
+    )
+
+
+def _finish(db: Session, claim: Claim, status: str, error: str = None) -> bool:
+    """Move a job running under claim to a final status; False if the claim no longer holds."""
+    result = db.execute(
+        update(TrainingJob)
+        .where(_owned(claim))
+        .values(status=status, error=error, completed_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _train_in_process(claim: Claim, model_type: str) -> None:
+    """
+    Entry point of the training process: train and complete the job in one
+    transaction. The process can outlive a killed supervisor, so the job is
+    only completed (and the model registered) while the claim still holds.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            ml_model = train_model(db, model_type)
+            completed = db.execute(
+                update(TrainingJob)
+                .where(_owned(claim))
+                .values(status="completed", ml_model_id=ml_model.id, completed_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if completed == 0:
+                # Cancelled or taken over by another worker while finishing: do not register the model
+                db.rollback()
+                shutil.rmtree(ml_model.s3_path, ignore_errors=True)
+                return
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.exception("Training job %s failed", claim.job_id)
+            _finish(db, claim, "failed", _error_with_traceback(e))
+    finally:
+        db.close()
+
+
+def run_training_job(job_id: int, dead_worker: Optional[str] = None) -> None:
+    """
+    Run a training job in a child process and supervise it until it
+    finishes, is cancelled or times out. Does nothing if another worker
+    owns the job.
+
+    Args:
+        job_id: TrainingJob id
+        dead_worker: Worker known to be dead; its running job is taken over
+            without waiting for the heartbeat to go stale
+    """
+    db = SessionLocal()
+    claim = None
+    try:
+        claim = _claim_job(db, job_id, dead_worker)
+        if claim is None:
+            return
+
+        job = db.get(TrainingJob, job_id)
+        # Spawned (not forked): the child must not share this worker's threads or DB connections
+        process = multiprocessing.get_context("spawn").Process(
+            target=_train_in_process, args=(claim, job.model_type), name=f"training-job-{job_id}", daemon=True
+        )
+        process.start()
+        deadline = time.monotonic() + settings.MODEL_TRAINING_TIMEOUT_SECONDS
+
+        while True:
+            process.join(SUPERVISE_INTERVAL_SECONDS)
+            if not process.is_alive():
+                break
+
+            still_owned = db.execute(
+                update(TrainingJob)
+                .where(_owned(claim))
+                .values(heartbeat_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+
+            if still_owned == 0:
+                # Cancelled (by any worker) or taken over by another worker
+                process.terminate()
+                process.join()
+                return
+
+            if time.monotonic() > deadline:
+                process.terminate()
+                process.join()
+                _finish(db, claim, "timed_out",
+                        f"Training exceeded {settings.MODEL_TRAINING_TIMEOUT_SECONDS} seconds")
+                return
+
+        if process.exitcode != 0:
+            _finish(db, claim, "failed", f"Training process exited with code {process.exitcode}")
+            return
+
+        # Serve the new version in this worker right away; others pick it up when polling
+        model_registry.sync(db)
+
+    except Exception as e:
+        db.rollback()
+        logger.exception("Supervising training job %s failed", job_id)
+        if claim is not None:
+            _finish(db, claim, "failed", _error_with_traceback(e))
+    finally:
+        db.close()
+
+
+def cancel_training_job(db: Session, job: TrainingJob) -> bool:
+    """
+    Cancel a queued or running job. The worker supervising a running job
+    terminates its process on its next check.
+
+    Returns:
+        False if the job had already finished
+    """
+    result = db.execute(
+        update(TrainingJob)
+        .where(TrainingJob.id == job.id, TrainingJob.status.in_(["queued", "running"]))
+        .values(status="cancelled", completed_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(job)
+    return result.rowcount == 1
+
+
+def submit_unowned_training_jobs() -> None:
+    """
+    Submit queued jobs and running jobs whose worker is gone: dead on this
+    host, or silent for STALE_JOB_SECONDS. Interrupted jobs are retrained
+    from scratch; jobs of live workers are left to them.
+    """
+    db = SessionLocal()
+    try:
+        jobs = db.query(TrainingJob.id, TrainingJob.status, TrainingJob.worker_id).filter(
+            TrainingJob.status.in_(["queued", "running"])
+        ).order_by(TrainingJob.id).all()
+    finally:
+        db.close()
+
+    for job_id, status, worker_id in jobs:
+        dead = status == "running" and is_dead_local_worker(worker_id)
+        _submit(job_id, worker_id if dead else None)
+
+
+def resume_training_jobs() -> None:
+    """
+    Pick up jobs left queued or interrupted by a restart, then keep
+    rescanning every STALE_JOB_SECONDS for jobs of workers that died
+    meanwhile. Runs in a background thread.
+    """
+    def run():
+        while True:
+            try:
+                submit_unowned_training_jobs()
+            except Exception:
+                logger.exception("Could not resume training jobs")
+            time.sleep(STALE_JOB_SECONDS)
+
+    threading.Thread(target=run, name="training-job-resume", daemon=True).start()
+
+
+def job_status(job: TrainingJob) -> Dict:
+    """Serialize a job for the status endpoints."""
+    return {
+        "job_id": job.id,
+        "model_type": job.model_type,
+        "status": job.status,
+        "error": job.error,
+        "model_id": job.ml_model_id,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "completed_at": job.completed_at,
+    }
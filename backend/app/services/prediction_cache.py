@@ -0,0 +1,150 @@
+"""
+Reuse of stored invoice predictions.
+
+Forecast endpoints need a prediction for every open invoice. The latest
+stored prediction of each invoice is fetched with one window-function query
+and reused while it is still valid: made by the active model version, after
+the invoice was last changed, and not older than
+PREDICTION_REUSE_MAX_AGE_HOURS. Invoices without a valid prediction are
+scored in one model call and the new predictions are stored for next time.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.ml.features.feature_engineering import FeatureEngineer
+from app.ml.models.payment_predictor import PREDICTION_COLUMNS, PaymentPredictor
+from app.models.invoice import Invoice
+from app.models.prediction import Prediction
+
+
+def latest_predictions(db: Session, invoice_ids: List[int], ml_model_id: int) -> Dict[int, Prediction]:
+    """
+    Latest stored prediction per invoice, for invoices where it is still valid.
+
+    Returns:
+        Dictionary of invoice id -> Prediction; invoices whose latest
+        prediction is missing or stale are left out
+    """
+    cutoff = datetime.now() - timedelta(hours=settings.PREDICTION_REUSE_MAX_AGE_HOURS)
+    found = {}
+
+    for start in range(0, len(invoice_ids), settings.PREDICTION_BATCH_SIZE):
+        chunk = invoice_ids[start:start + settings.PREDICTION_BATCH_SIZE]
+
+        ranked = select(
+            Prediction.id,
+            func.row_number().over(
+                partition_by=Prediction.invoice_id,
+                order_by=(Prediction.created_at.desc(), Prediction.id.desc())
+            ).label('rank')
+        ).where(Prediction.invoice_id.in_(chunk)).subquery()
+
+        predictions = db.execute(
+            select(Prediction)
+            .join(ranked, ranked.c.id == Prediction.id)
+            .join(Invoice, Invoice.id == Prediction.invoice_id)
+            .where(
+                ranked.c.rank == 1,
+                Prediction.ml_model_id == ml_model_id,
+                Prediction.created_at >= cutoff,
+                Prediction.created_at >= func.coalesce(Invoice.updated_at, Invoice.created_at)
+            )
+        ).scalars().all()
+
+        found.update({prediction.invoice_id: prediction for prediction in predictions})
+
+    return found
+
+
+def refresh_current_predictions(db: Session, invoice_ids: List[int]) -> None:
+    """
+    Point Invoice.current_prediction_id / current_risk_score at the latest
+    prediction of each given invoice. Call after storing predictions; does not commit.
+    """
+    latest_id = select(Prediction.id).where(
+        Prediction.invoice_id == Invoice.id
+    ).order_by(Prediction.created_at.desc(), Prediction.id.desc()).limit(1).scalar_subquery()
+
+    latest_risk = select(Prediction.risk_score).where(
+        Prediction.invoice_id == Invoice.id
+    ).order_by(Prediction.created_at.desc(), Prediction.id.desc()).limit(1).scalar_subquery()
+
+    for start in range(0, len(invoice_ids), settings.PREDICTION_BATCH_SIZE):
+        db.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(invoice_ids[start:start + settings.PREDICTION_BATCH_SIZE]))
+            # Keep updated_at: a new prediction is not a change of the invoice
+            .values(current_prediction_id=latest_id, current_risk_score=latest_risk, updated_at=Invoice.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def store_predictions(db: Session, results: pd.DataFrame, features: pd.DataFrame, ml_model_id: int) -> int:
+    """
+    Insert predictions (PaymentPredictor.predict_many output indexed by
+    invoice id) with the features they were made from, and make them the
+    invoices' current predictions. Does not commit.
+    """
+    if results.empty:
+        return 0
+
+    created_at = datetime.now()
+    features_by_invoice = features.to_dict('index')
+    records = [
+        {
+            'invoice_id': invoice_id,
+            'ml_model_id': ml_model_id,
+            **result,
+            'features': features_by_invoice[invoice_id],
+            'created_at': created_at,
+        }
+        for invoice_id, result in results.astype(object).to_dict('index').items()
+    ]
+    db.execute(insert(Prediction), records)
+    refresh_current_predictions(db, list(results.index))
+    return len(records)
+
+
+def predictions_for_invoices(
+    db: Session,
+    invoices: List[Invoice],
+    model: PaymentPredictor,
+    ml_model_id: Optional[int]
+) -> pd.DataFrame:
+    """
+    Predictions for the given invoices, reusing valid stored ones. Does not commit.
+
+    Args:
+        db: Database session
+        invoices: Invoices to predict
+        model: Active payment predictor
+        ml_model_id: Id of the active model's MLModel row; without it nothing
+            is reused or stored
+
+    Returns:
+        DataFrame indexed by invoice id (in the order of invoices) with PREDICTION_COLUMNS
+    """
+    invoice_ids = [invoice.id for invoice in invoices]
+    stored = latest_predictions(db, invoice_ids, ml_model_id) if ml_model_id is not None else {}
+
+    results = pd.DataFrame(
+        [{col: getattr(prediction, col) for col in PREDICTION_COLUMNS} for prediction in stored.values()],
+        index=pd.Index(list(stored), name='invoice_id'),
+        columns=PREDICTION_COLUMNS
+    )
+
+    misses = [invoice for invoice in invoices if invoice.id not in stored]
+    if misses:
+        features = FeatureEngineer(db).create_feature_matrix(misses, model.feature_columns)
+        scored = model.predict_many(features)
+        if ml_model_id is not None:
+            store_predictions(db, scored, features, ml_model_id)
+        results = pd.concat([results, scored]) if stored else scored
+
+    return results.reindex(invoice_ids)
@@ -0,0 +1,59 @@
+"""
+Vectorized price calculations shared by imports and what-if evaluation.
+
+C0   = LC x OH factor
+Cmin = C0 / (1 - min profit margin)
+CP   = strategic Cmin / (1 - total discounts / 100)
+"""
+
+import pandas as pd
+
+# Default factors used when the upload does not provide them
+DEFAULT_OH_FACTOR = 1.25
+DEFAULT_MIN_PROFIT_MARGIN = 0.0425
+
+
+def add_base_price_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Derive C0 and Cmin from LC for every row.
+
+    Args:
+        df: DataFrame with an 'lc' column and optional 'oh_factor' and
+            'min_profit_margin' columns (defaults are used when missing)
+
+    Returns:
+        Copy of df with oh_factor, min_profit_margin, c0 and cmin columns
+    """
+    df = df.copy()
+    if 'oh_factor' not in df.columns:
+        df['oh_factor'] = DEFAULT_OH_FACTOR
+    if 'min_profit_margin' not in df.columns:
+        df['min_profit_margin'] = DEFAULT_MIN_PROFIT_MARGIN
+
+    df['c0'] = df['lc'] * df['oh_factor']
+    df['cmin'] = df['c0'] / (1 - df['min_profit_margin'])
+    return df
+
+
+def add_customer_price_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Derive CP, realized price and coverage for every row.
+
+    Args:
+        df: DataFrame with strategic_cmin, discount_invoice, discount_marketing,
+            discount_yearend, c0 and cmin columns
+
+    Returns:
+        Copy of df with total_discounts, cp, realized_price, coverage_vs_c0
+        and coverage_vs_cmin columns
+    """
+    df = df.copy()
+    df['total_discounts'] = df['discount_invoice'] + df['discount_marketing'] + df['discount_yearend']
+
+    discount_factor = 1 - df['total_discounts'] / 100
+    df['cp'] = df['strategic_cmin'] / discount_factor
+    df['realized_price'] = df['cp'] * discount_factor
+
+    df['coverage_vs_c0'] = (df['realized_price'] / df['c0']) * 100
+    df['coverage_vs_cmin'] = (df['realized_price'] / df['cmin']) * 100
+    return df
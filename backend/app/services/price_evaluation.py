@@ -0,0 +1,77 @@
+"""
+What-if evaluation of proposed customer prices.
+
+Evaluates a whole customers x products matrix of proposed strategic Cmin and
+discount terms against base prices in one vectorized pass, without writing
+anything to the database.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.services.catalog_identity import product_ids_for_codes
+from app.services.price_calculations import add_customer_price_columns
+from app.services.price_resolution import resolve_prices_batch
+
+RESULT_COLUMNS = [
+    'product_code', 'customer_id', 'strategic_cmin', 'discount_invoice', 'discount_marketing',
+    'discount_yearend', 'total_discounts', 'cp', 'realized_price', 'c0', 'cmin',
+    'coverage_vs_c0', 'coverage_vs_cmin',
+]
+
+
+def evaluate_price_matrix(
+    db: Session,
+    cells: pd.DataFrame,
+    at: Optional[datetime] = None
+) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Compute CP, realized price and coverage for every proposed price.
+
+    Args:
+        db: Database session
+        cells: DataFrame with product_code, customer_id, strategic_cmin,
+            discount_invoice, discount_marketing and discount_yearend columns
+        at: Moment whose base prices are used (default: now)
+
+    Returns:
+        Tuple of (evaluated cells, summary). Cells whose product is unknown or
+        has no base price at `at` are left out of the result and reported in
+        the summary.
+    """
+    at = at or datetime.now(timezone.utc)
+    codes = cells['product_code'].unique().tolist()
+
+    product_ids = product_ids_for_codes(db, codes)
+
+    # Resolve each distinct product once, not once per cell
+    products = pd.DataFrame({
+        'product_code': list(product_ids.keys()),
+        'product_id': list(product_ids.values()),
+    })
+    products['at'] = at
+    products = resolve_prices_batch(db, products)
+    priced = products.dropna(subset=['c0'])
+
+    evaluated = cells.merge(priced[['product_code', 'c0', 'cmin']], on='product_code', how='inner', sort=False)
+    evaluated = add_customer_price_columns(evaluated)
+
+    # Discounts of 100% or more have no finite CP
+    evaluated = evaluated.replace([np.inf, -np.inf], np.nan)
+
+    avg_coverage = evaluated['coverage_vs_cmin'].mean()
+    summary = {
+        "cells": len(cells),
+        "evaluated": len(evaluated),
+        "below_c0": int((evaluated['coverage_vs_c0'] < 100).sum()),
+        "below_cmin": int((evaluated['coverage_vs_cmin'] < 100).sum()),
+        "avg_coverage_vs_cmin": float(avg_coverage) if pd.notna(avg_coverage) else None,
+        "unknown_products": sorted(set(codes) - set(product_ids.keys())),
+        "products_without_price": sorted(set(products['product_code']) - set(priced['product_code'])),
+    }
+
+    return evaluated[RESULT_COLUMNS], summary
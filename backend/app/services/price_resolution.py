@@ -0,0 +1,216 @@
+"""
+Point-in-time price resolution for base and customer prices.
+
+A price period is valid at moment `at` when
+valid_from <= at AND (valid_to IS NULL OR valid_to > at).
+When periods overlap, the one with the latest valid_from wins.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.product import ProductBasePrice, CustomerProductPrice
+
+
+def base_price_valid_at(at: datetime):
+    """SQL condition selecting base prices valid at the given moment."""
+    return and_(
+        ProductBasePrice.valid_from <= at,
+        or_(
+            ProductBasePrice.valid_to == None,
+            ProductBasePrice.valid_to > at
+        )
+    )
+
+
+def customer_price_valid_at(at: datetime):
+    """SQL condition selecting customer prices valid at the given moment."""
+    return and_(
+        CustomerProductPrice.valid_from <= at,
+        or_(
+            CustomerProductPrice.valid_to == None,
+            CustomerProductPrice.valid_to > at
+        )
+    )
+
+
+def resolve_base_price(db: Session, product_id: int, at: Optional[datetime] = None) -> Optional[ProductBasePrice]:
+    """Return the base price of a product valid at `at` (default: now)."""
+    at = at or datetime.now(timezone.utc)
+    return db.query(ProductBasePrice).filter(
+        ProductBasePrice.product_id == product_id,
+        base_price_valid_at(at)
+    ).order_by(ProductBasePrice.valid_from.desc()).first()
+
+
+def resolve_customer_price(
+    db: Session,
+    product_id: int,
+    customer_id: int,
+    at: Optional[datetime] = None
+) -> Optional[CustomerProductPrice]:
+    """Return the customer price of a product valid at `at` (default: now)."""
+    at = at or datetime.now(timezone.utc)
+    return db.query(CustomerProductPrice).filter(
+        CustomerProductPrice.product_id == product_id,
+        CustomerProductPrice.customer_id == customer_id,
+        customer_price_valid_at(at)
+    ).order_by(CustomerProductPrice.valid_from.desc()).first()
+
+
+def resolve_price(
+    db: Session,
+    product_id: int,
+    customer_id: Optional[int] = None,
+    at: Optional[datetime] = None
+) -> Tuple[Optional[ProductBasePrice], Optional[CustomerProductPrice]]:
+    """
+    Resolve the prices of a product at a given moment.
+
+    Args:
+        db: Database session
+        product_id: Product ID
+        customer_id: Customer ID, or None to resolve the base price only
+        at: Point in time (default: now)
+
+    Returns:
+        Tuple of (base price, customer price); either may be None
+    """
+    at = at or datetime.now(timezone.utc)
+    base_price = resolve_base_price(db, product_id, at)
+    customer_price = resolve_customer_price(db, product_id, customer_id, at) if customer_id is not None else None
+    return base_price, customer_price
+
+
+def _to_utc(values) -> pd.Series:
+    """Normalize datetimes to tz-aware UTC (naive values are taken as UTC)."""
+    return pd.to_datetime(pd.Series(values, dtype=object), utc=True).astype('datetime64[ns, UTC]')
+
+
+def _asof_join(requests: pd.DataFrame, periods: pd.DataFrame, by) -> pd.DataFrame:
+    """
+    Attach to each request the period with the latest valid_from <= at,
+    dropping matches whose period already ended.
+    """
+    periods = periods.sort_values('valid_from')
+    matched = pd.merge_asof(
+        requests.sort_values('at'),
+        periods,
+        left_on='at',
+        right_on='valid_from',
+        by=by,
+        direction='backward'
+    )
+    expired = matched['valid_to'].notna() & (matched['valid_to'] <= matched['at'])
+    price_columns = [c for c in periods.columns if c not in by]
+    matched.loc[expired, price_columns] = None
+    return matched.drop(columns=['valid_from', 'valid_to'])
+
+
+def resolve_prices_batch(db: Session, requests: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resolve base and customer prices for many (product, customer, moment) triples.
+
+    Issues one range query per price table covering every requested product
+    and time span, then resolves validity in memory with an as-of join.
+
+    Args:
+        db: Database session
+        requests: DataFrame with product_id, at and optional customer_id columns
+
+    Returns:
+        Copy of requests (same index and order) with base_price_id, lc, c0, cmin
+        and, when customer_id is given, customer_price_id, strategic_cmin,
+        total_discounts, cp and realized_price columns (NaN where unresolved)
+    """
+    result = requests.copy()
+    with_customer = 'customer_id' in requests.columns
+
+    base_columns = ['base_price_id', 'lc', 'c0', 'cmin']
+    customer_columns = ['customer_price_id', 'strategic_cmin', 'total_discounts', 'cp', 'realized_price']
+
+    if requests.empty:
+        for col in base_columns + (customer_columns if with_customer else []):
+            result[col] = pd.Series(dtype=float)
+        return result
+
+    work = pd.DataFrame({
+        '_row': range(len(requests)),
+        'product_id': requests['product_id'].astype(int).to_numpy(),
+    })
+    work['at'] = _to_utc(requests['at'].to_numpy())
+    if with_customer:
+        work['customer_id'] = requests['customer_id'].to_numpy()
+
+    product_ids = work['product_id'].unique().tolist()
+    earliest, latest = work['at'].min().to_pydatetime(), work['at'].max().to_pydatetime()
+
+    # Base prices
+    base_rows = db.execute(
+        select(
+            ProductBasePrice.product_id,
+            ProductBasePrice.id,
+            ProductBasePrice.lc,
+            ProductBasePrice.c0,
+            ProductBasePrice.cmin,
+            ProductBasePrice.valid_from,
+            ProductBasePrice.valid_to,
+        ).where(
+            ProductBasePrice.product_id.in_(product_ids),
+            ProductBasePrice.valid_from <= latest,
+            or_(ProductBasePrice.valid_to == None, ProductBasePrice.valid_to > earliest)
+        )
+    ).all()
+    base = pd.DataFrame(base_rows, columns=['product_id', 'base_price_id', 'lc', 'c0', 'cmin', 'valid_from', 'valid_to'])
+    base['valid_from'] = _to_utc(base['valid_from'])
+    base['valid_to'] = _to_utc(base['valid_to'])
+    base['product_id'] = base['product_id'].astype(int)
+
+    resolved = _asof_join(work, base, by='product_id')
+
+    # Customer prices
+    if with_customer:
+        customer_rows = db.execute(
+            select(
+                CustomerProductPrice.product_id,
+                CustomerProductPrice.customer_id,
+                CustomerProductPrice.id,
+                CustomerProductPrice.strategic_cmin,
+                CustomerProductPrice.total_discounts,
+                CustomerProductPrice.cp,
+                CustomerProductPrice.realized_price,
+                CustomerProductPrice.valid_from,
+                CustomerProductPrice.valid_to,
+            ).where(
+                CustomerProductPrice.product_id.in_(product_ids),
+                CustomerProductPrice.valid_from <= latest,
+                or_(CustomerProductPrice.valid_to == None, CustomerProductPrice.valid_to > earliest)
+            )
+        ).all()
+        customer = pd.DataFrame(customer_rows, columns=[
+            'product_id', 'customer_id', 'customer_price_id', 'strategic_cmin',
+            'total_discounts', 'cp', 'realized_price', 'valid_from', 'valid_to'
+        ])
+        customer['valid_from'] = _to_utc(customer['valid_from'])
+        customer['valid_to'] = _to_utc(customer['valid_to'])
+        customer['product_id'] = customer['product_id'].astype(int)
+
+        has_customer = resolved['customer_id'].notna()
+        with_price = resolved[has_customer].copy()
+        with_price['customer_id'] = with_price['customer_id'].astype(int)
+        customer['customer_id'] = customer['customer_id'].astype(int)
+
+        matched = _asof_join(with_price, customer, by=['product_id', 'customer_id'])
+        resolved = pd.concat([matched, resolved[~has_customer]], ignore_index=True)
+        for col in customer_columns:
+            if col not in resolved.columns:
+                resolved[col] = None
+
+    resolved = resolved.sort_values('_row').set_index(requests.index)
+    for col in base_columns + (customer_columns if with_customer else []):
+        result[col] = pd.to_numeric(resolved[col], errors='coerce')
+    return result
@@ -0,0 +1,181 @@
+"""
+Precomputed production price thresholds.
+
+The threshold of a product is the LC of its base price valid today times
+the production factor of its industry. Thresholds are stored in
+product_price_thresholds and rebuilt only for the products affected by a
+base price or production factor change, or by a scheduled base price
+taking effect, so below-threshold customer prices can be found with a
+single join.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.product import (
+    Product, Industry, ProductBasePrice, CustomerProductPrice,
+    IndustryProductionFactor, ProductPriceThreshold,
+)
+from app.services.price_resolution import base_price_valid_at, customer_price_valid_at
+
+# Used for industries without an IndustryProductionFactor row (matches the model default)
+DEFAULT_PRODUCTION_FACTOR = 1.20
+
+
+def refresh_price_thresholds(
+    db: Session,
+    product_ids: Optional[List[int]] = None,
+    industry_id: Optional[int] = None
+) -> int:
+    """
+    Recompute thresholds for the given products, an industry, or (with no
+    arguments) the whole catalogue. Does not commit.
+
+    Args:
+        db: Database session
+        product_ids: Products whose base price changed
+        industry_id: Industry whose production factor changed
+
+    Returns:
+        Number of thresholds written
+    """
+    scope = []
+    if product_ids is not None:
+        if not product_ids:
+            return 0
+        scope.append(Product.id.in_(product_ids))
+    if industry_id is not None:
+        scope.append(Product.industry_id == industry_id)
+
+    now = datetime.now(timezone.utc)
+    rows = db.execute(
+        select(
+            ProductBasePrice.product_id,
+            Product.industry_id,
+            ProductBasePrice.id,
+            ProductBasePrice.lc,
+            IndustryProductionFactor.production_factor,
+        )
+        .join(Product, Product.id == ProductBasePrice.product_id)
+        .outerjoin(IndustryProductionFactor, IndustryProductionFactor.industry_id == Product.industry_id)
+        .where(base_price_valid_at(now), *scope)
+        .order_by(ProductBasePrice.product_id, ProductBasePrice.valid_from.desc())
+    ).all()
+
+    thresholds = pd.DataFrame(rows, columns=['product_id', 'industry_id', 'base_price_id', 'lc', 'production_factor'])
+    thresholds = thresholds.drop_duplicates('product_id', keep='first')
+    thresholds['production_factor'] = thresholds['production_factor'].fillna(DEFAULT_PRODUCTION_FACTOR)
+    thresholds['threshold'] = thresholds['lc'] * thresholds['production_factor']
+    thresholds['updated_at'] = now
+
+    # Products without a valid base price drop out of the table too
+    stale = delete(ProductPriceThreshold)
+    if product_ids is not None:
+        stale = stale.where(ProductPriceThreshold.product_id.in_(product_ids))
+    if industry_id is not None:
+        stale = stale.where(ProductPriceThreshold.industry_id == industry_id)
+    db.execute(stale.execution_options(synchronize_session=False))
+
+    if thresholds.empty:
+        return 0
+
+    db.execute(insert(ProductPriceThreshold), thresholds.to_dict('records'))
+    return len(thresholds)
+
+
+def refresh_due_price_thresholds(db: Session) -> int:
+    """
+    Recompute thresholds whose base price changed with time: a scheduled
+    base price took effect, or the one they were computed from expired
+    since. Does not commit.
+
+    Returns:
+        Number of thresholds written
+    """
+    now = datetime.now(timezone.utc)
+    product_ids = db.execute(
+        select(ProductPriceThreshold.product_id)
+        .join(ProductBasePrice, ProductBasePrice.id == ProductPriceThreshold.base_price_id)
+        .where(ProductBasePrice.valid_to <= now)
+        .union(
+            select(ProductBasePrice.product_id)
+            .outerjoin(ProductPriceThreshold, ProductPriceThreshold.product_id == ProductBasePrice.product_id)
+            .where(
+                ProductBasePrice.valid_from <= now,
+                or_(ProductBasePrice.valid_to.is_(None), ProductBasePrice.valid_to > now),
+                ProductPriceThreshold.updated_at < ProductBasePrice.valid_from
+            )
+        )
+    ).scalars().all()
+
+    if not product_ids:
+        return 0
+    return refresh_price_thresholds(db, product_ids=list(product_ids))
+
+
+def below_threshold_prices(
+    db: Session,
+    industry_code: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = 1000
+) -> List[Dict]:
+    """
+    Customer prices valid today whose realized price is below the production
+    threshold. Refreshes thresholds that are due first (see
+    refresh_due_price_thresholds); does not commit.
+
+    Results are ordered by customer price id; pass the last id as after_id
+    to get the next page.
+    """
+    refresh_due_price_thresholds(db)
+
+    conditions = [
+        customer_price_valid_at(datetime.now(timezone.utc)),
+        CustomerProductPrice.realized_price < ProductPriceThreshold.threshold,
+    ]
+    if industry_code:
+        conditions.append(Industry.code == industry_code)
+    if customer_id is not None:
+        conditions.append(CustomerProductPrice.customer_id == customer_id)
+    if after_id:
+        conditions.append(CustomerProductPrice.id > after_id)
+
+    rows = db.execute(
+        select(
+            CustomerProductPrice.id,
+            CustomerProductPrice.customer_id,
+            Product.code,
+            Industry.code,
+            CustomerProductPrice.realized_price,
+            ProductPriceThreshold.lc,
+            ProductPriceThreshold.production_factor,
+            ProductPriceThreshold.threshold,
+        )
+        .join(ProductPriceThreshold, ProductPriceThreshold.product_id == CustomerProductPrice.product_id)
+        .join(Product, Product.id == CustomerProductPrice.product_id)
+        .join(Industry, Industry.id == ProductPriceThreshold.industry_id)
+        .where(*conditions)
+        .order_by(CustomerProductPrice.id)
+        .limit(limit)
+    ).all()
+
+    return [
+        {
+            "customer_price_id": price_id,
+            "customer_id": price_customer_id,
+            "product_code": product_code,
+            "industry_code": price_industry_code,
+            "realized_price": realized_price,
+            "lc": lc,
+            "production_factor": production_factor,
+            "threshold": threshold,
+            "shortfall": threshold - realized_price,
+        }
+        for (price_id, price_customer_id, product_code, price_industry_code,
+             realized_price, lc, production_factor, threshold) in rows
+    ]
@@ -0,0 +1,113 @@
+"""
+Cached "products with prices" catalogue used by the pricing UI.
+
+The catalogue is assembled from a single joined query and kept in an
+in-process cache together with an ETag, so repeated requests are served
+without touching the database and unchanged payloads can be answered
+with 304 Not Modified.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.product import Product, Industry, ProductBasePrice
+from app.services.price_resolution import base_price_valid_at
+
+_CATALOG_KEY = "products-with-prices"
+
+_catalog_cache = TTLCache(maxsize=1, ttl_seconds=settings.PRICING_CATALOG_CACHE_TTL_SECONDS)
+
+
+def build_products_with_prices(db: Session) -> Dict:
+    """
+    Build the industry -> products payload with current base prices.
+
+    Returns:
+        Dictionary with 'industries' (each with its products) and 'products'
+    """
+    now = datetime.now(timezone.utc)
+
+    rows = db.query(
+        Industry.id,
+        Industry.code,
+        Industry.name_sl,
+        Industry.name_hr,
+        Industry.icon,
+        Product.id,
+        Product.code,
+        Product.name_sl,
+        Product.name_hr,
+        Product.unit,
+        ProductBasePrice.lc,
+    ).join(
+        Product, Product.industry_id == Industry.id
+    ).join(
+        ProductBasePrice, ProductBasePrice.product_id == Product.id
+    ).filter(
+        and_(
+            Industry.is_active == True,
+            Product.is_active == True,
+            base_price_valid_at(now)
+        )
+    ).order_by(
+        Industry.id, Product.id, ProductBasePrice.valid_from.desc()
+    ).all()
+
+    industries = {}
+    seen_products = set()
+
+    for (industry_id, industry_code, industry_name_sl, industry_name_hr, icon,
+         product_id, product_code, product_name_sl, product_name_hr, unit, lc) in rows:
+        # Overlapping price periods: keep the most recent one
+        if product_id in seen_products:
+            continue
+        seen_products.add(product_id)
+
+        if industry_id not in industries:
+            industries[industry_id] = {
+                "id": industry_code,
+                "code": industry_code,
+                "nameSl": industry_name_sl,
+                "nameHr": industry_name_hr,
+                "icon": icon,
+                "products": []
+            }
+
+        industries[industry_id]["products"].append({
+            "id": f"db-{product_id}",
+            "code": product_code,
+            "nameSl": product_name_sl,
+            "nameHr": product_name_hr,
+            "unit": unit,
+            "lc": lc
+        })
+
+    return {
+        "industries": list(industries.values()),
+        "products": []
+    }
+
+
+def get_products_with_prices(db: Session) -> Tuple[Dict, str]:
+    """
+    Return the cached catalogue and its ETag, rebuilding it on a miss.
+    """
+    def build():
+        payload = build_products_with_prices(db)
+        body = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        return payload, etag
+
+    return _catalog_cache.get_or_set(_CATALOG_KEY, build)
+
+
+def invalidate_products_with_prices() -> None:
+    """Drop the cached catalogue. Call after any product, industry or base price write."""
+    _catalog_cache.invalidate()
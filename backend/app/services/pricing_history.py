@@ -0,0 +1,205 @@
+"""
+Streaming export of pricing history.
+
+History rows are read with a server-side cursor in batches and written out
+incrementally as NDJSON, CSV or Parquet, so multi-year exports of the whole
+catalogue never have to fit in worker memory.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import and_, or_, select
+
+from app.core.database import SessionLocal
+from app.models.product import Product, Industry, ProductBasePrice, CustomerProductPrice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EXPORT_BATCH_SIZE = 5000
+
+# Exported columns per history kind, with their Parquet types
+HISTORY_COLUMNS = {
+    "base": [
+        ("id", "int64"),
+        ("product_code", "string"),
+        ("industry_code", "string"),
+        ("lc", "float64"),
+        ("c0", "float64"),
+        ("cmin", "float64"),
+        ("oh_factor", "float64"),
+        ("min_profit_margin", "float64"),
+        ("valid_from", "timestamp"),
+        ("valid_to", "timestamp"),
+        ("created_at", "timestamp"),
+        ("notes", "string"),
+    ],
+    "customer": [
+        ("id", "int64"),
+        ("product_code", "string"),
+        ("industry_code", "string"),
+        ("customer_id", "int64"),
+        ("strategic_cmin", "float64"),
+        ("discount_invoice", "float64"),
+        ("discount_marketing", "float64"),
+        ("discount_yearend", "float64"),
+        ("total_discounts", "float64"),
+        ("cp", "float64"),
+        ("realized_price", "float64"),
+        ("coverage_vs_c0", "float64"),
+        ("coverage_vs_cmin", "float64"),
+        ("valid_from", "timestamp"),
+        ("valid_to", "timestamp"),
+        ("is_active", "bool"),
+        ("created_at", "timestamp"),
+        ("notes", "string"),
+    ],
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def history_query(
+    kind: str,
+    product_code: Optional[str] = None,
+    industry_code: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+):
+    """
+    Build the history SELECT for one product, one industry or the whole catalogue.
+
+    Price periods overlapping [date_from, date_to] are returned, ordered by id
+    so that `after_id` can be used as a keyset cursor.
+    """
+    model = ProductBasePrice if kind == "base" else CustomerProductPrice
+    joined = {
+        "product_code": Product.code.label("product_code"),
+        "industry_code": Industry.code.label("industry_code"),
+    }
+    columns = [joined.get(name, getattr(model, name, None)) for name, _ in HISTORY_COLUMNS[kind]]
+
+    conditions = []
+    if product_code:
+        conditions.append(Product.code == product_code)
+    if industry_code:
+        conditions.append(Industry.code == industry_code)
+    if date_to:
+        conditions.append(model.valid_from <= date_to)
+    if date_from:
+        conditions.append(or_(model.valid_to == None, model.valid_to > date_from))
+    if after_id:
+        conditions.append(model.id > after_id)
+
+    return (
+        select(*columns)
+        .select_from(model)
+        .join(Product, Product.id == model.product_id)
+        .join(Industry, Industry.id == Product.industry_id)
+        .where(and_(*conditions))
+        .order_by(model.id)
+    )
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stream_batches(stmt) -> Iterator[List[Dict]]:
+    """Execute stmt with a server-side cursor and yield batches of row dicts."""
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield [dict(row._mapping) for row in partition]
+    finally:
+        db.close()
+
+
+def _ndjson(batches: Iterator[List[Dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(row, default=_json_default) + "\n" for row in batch).encode("utf-8")
+
+
+def _csv(batches: Iterator[List[Dict]], columns: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow([
+                row[col].isoformat() if isinstance(row[col], (datetime, date)) else row[col]
+                for col in columns
+            ])
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _parquet_schema(kind: str):
+    types = {
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in HISTORY_COLUMNS[kind]])
+
+
+def _parquet(batches: Iterator[List[Dict]], kind: str) -> Iterator[bytes]:
+    """Write one Parquet row group per batch and yield the bytes as they are produced."""
+    schema = _parquet_schema(kind)
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    for batch in batches:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        data = drain()
+        if data:
+            yield data
+
+    writer.close()
+    yield drain()
+
+
+def export_history(stmt, kind: str, fmt: str) -> Iterator[bytes]:
+    """
+    Stream the rows of a history query in the requested format.
+
+    Args:
+        stmt: Query built by history_query
+        kind: 'base' or 'customer'
+        fmt: 'ndjson', 'csv' or 'parquet'
+    """
+    batches = _stream_batches(stmt)
+    if fmt == "csv":
+        return _csv(batches, [name for name, _ in HISTORY_COLUMNS[kind]])
+    if fmt == "parquet":
+        if not PYARROW_AVAILABLE:
+            raise ValueError("Parquet export requires pyarrow")
+        return _parquet(batches, kind)
+    return _ndjson(batches)
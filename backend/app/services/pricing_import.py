@@ -0,0 +1,508 @@
+"""
+Set-based import engine for pricing Excel uploads.
+
+Each sheet is read once into a DataFrame, prices are derived as vectorized
+columns, codes are resolved against preloaded dictionaries and the database
+is touched with a handful of bulk statements instead of per-row queries.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, select, update, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.product import Product, Industry, ProductBasePrice, CustomerProductPrice
+from app.services.price_calculations import add_base_price_columns, add_customer_price_columns
+from app.services.price_thresholds import refresh_price_thresholds
+
+# Values of the 'aktiven' column that mark a row as active
+ACTIVE_FLAGS = ['DA', 'YES', 'TRUE', '1']
+
+IMPORTED_INDUSTRY_CODE = 'imported-products'
+
+
+def _active_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep only rows whose 'aktiven' flag is set."""
+    return df[df['aktiven'].astype(str).str.upper().isin(ACTIVE_FLAGS)]
+
+
+def _records(df: pd.DataFrame, columns: List[str]) -> List[Dict]:
+    """Convert DataFrame columns to insert parameters (NaN becomes None)."""
+    subset = df[columns].astype(object)
+    return subset.where(pd.notna(subset), None).to_dict('records')
+
+
+def detect_simple_price_list_columns(headers: List) -> Tuple:
+    """
+    Find the article code, article name and LC columns of a simple price list.
+    Handles headerless sheets exported as __EMPTY / __EMPTY_1 / LC.
+
+    Returns:
+        Tuple of (code_col, name_col, lc_col); missing columns are None
+    """
+    code_col = None
+    name_col = None
+    lc_col = None
+
+    for h in headers:
+        h_str = str(h)
+        if h_str == '__EMPTY' and code_col is None:
+            code_col = h
+        elif h_str == '__EMPTY_1' and name_col is None:
+            name_col = h
+        elif h_str.upper() == 'LC':
+            lc_col = h
+        elif not code_col and any(x in h_str.lower() for x in ['šifra', 'artikel', 'article', 'number', 'broj']):
+            code_col = h
+        elif not name_col and any(x in h_str.lower() for x in ['naziv', 'name', 'ime']):
+            name_col = h
+        elif not lc_col and any(x in h_str.lower() for x in ['cena', 'price', 'cijena']):
+            lc_col = h
+
+    return code_col, name_col, lc_col
+
+
+def _simple_rows(df: pd.DataFrame, code_col, name_col, lc_col) -> pd.DataFrame:
+    """Normalize a simple price list and flag rows with a code, a name and a positive LC."""
+    rows = pd.DataFrame({
+        'code': df[code_col].where(pd.notna(df[code_col]), '').astype(str).str.strip(),
+        'name': df[name_col].where(pd.notna(df[name_col]), '').astype(str).str.strip(),
+        'lc': pd.to_numeric(df[lc_col], errors='coerce').fillna(0),
+    })
+    rows['valid'] = (rows['code'] != '') & (rows['name'] != '') & (rows['lc'] > 0)
+    return rows
+
+
+def simple_price_list_row_errors(df: pd.DataFrame, code_col, name_col, lc_col) -> Dict:
+    """
+    Report rows of a simple price list that will be skipped.
+
+    Returns:
+        Dictionary mapping row index to an error message
+    """
+    rows = _simple_rows(df, code_col, name_col, lc_col)
+    return {idx: "Missing article code, name or positive LC" for idx in rows.index[~rows['valid']]}
+
+
+class PricingImporter:
+    """
+    Bulk importer for product and customer price lists.
+    """
+
+    def __init__(self, db: Session, lc_tolerance: Optional[float] = None):
+        self.db = db
+        self.now = datetime.now(timezone.utc)
+        self.lc_tolerance = settings.PRICING_LC_CHANGE_TOLERANCE if lc_tolerance is None else lc_tolerance
+
+    # ------------------------------------------------------------------
+    # Catalogue lookups
+    # ------------------------------------------------------------------
+
+    def _product_ids_by_code(self) -> Dict[str, int]:
+        """Load the code -> id map for the whole product catalogue."""
+        return dict(self.db.execute(select(Product.code, Product.id)).all())
+
+    def _insert_products(self, products: pd.DataFrame) -> Dict[str, int]:
+        """Bulk insert new products and return their code -> id map."""
+        if products.empty:
+            return {}
+
+        rows = self.db.execute(
+            insert(Product).returning(Product.code, Product.id),
+            _records(products, ['code', 'name_sl', 'name_hr', 'unit', 'industry_id', 'is_active'])
+        ).all()
+        return dict(rows)
+
+    # ------------------------------------------------------------------
+    # Price periods
+    # ------------------------------------------------------------------
+
+    def _open_lc(self, product_ids: List[int]) -> pd.Series:
+        """Load the LC of the open base price of each product, indexed by product id."""
+        if not product_ids:
+            return pd.Series(dtype=float)
+
+        rows = self.db.execute(
+            select(ProductBasePrice.product_id, ProductBasePrice.lc)
+            .where(
+                ProductBasePrice.product_id.in_(product_ids),
+                ProductBasePrice.valid_to.is_(None)
+            )
+            .order_by(ProductBasePrice.product_id, ProductBasePrice.valid_from.desc())
+        ).all()
+
+        current = pd.DataFrame(rows, columns=['product_id', 'lc']).drop_duplicates('product_id', keep='first')
+        return current.set_index('product_id')['lc']
+
+    def _diff_base_prices(self, prices: pd.DataFrame, key: str = 'product_id') -> pd.DataFrame:
+        """
+        Compare incoming LC values with the open base prices.
+
+        Rows are expected in file order; only the last row of each `key` is
+        kept. Each row gets a status of 'new' (no open price, or an unknown
+        product with a missing product_id), 'changed' or 'unchanged' (LC within
+        lc_tolerance of the open price).
+        """
+        latest = prices.drop_duplicates(key, keep='last').copy()
+        current = self._open_lc(latest['product_id'].dropna().astype(int).tolist())
+
+        latest['current_lc'] = latest['product_id'].map(current)
+        latest['status'] = np.select(
+            [
+                latest['current_lc'].isna(),
+                (latest['lc'] - latest['current_lc']).abs() <= self.lc_tolerance,
+            ],
+            ['new', 'unchanged'],
+            default='changed'
+        )
+        return latest
+
+    def _replace_base_prices(self, prices: pd.DataFrame) -> Tuple[int, int]:
+        """
+        Write new base price periods for products whose LC changed.
+
+        Open prices of changed products are closed and a new period is
+        inserted; products whose LC is unchanged are left untouched.
+
+        Returns:
+            Tuple of (base prices created, products left unchanged)
+        """
+        if prices.empty:
+            return 0, 0
+
+        diff = self._diff_base_prices(prices)
+        unchanged = int((diff['status'] == 'unchanged').sum())
+        prices = diff[diff['status'] != 'unchanged'][['product_id', 'lc']]
+
+        changed_ids = diff.loc[diff['status'] == 'changed', 'product_id'].tolist()
+        if changed_ids:
+            self.db.execute(
+                update(ProductBasePrice)
+                .where(
+                    ProductBasePrice.product_id.in_(changed_ids),
+                    ProductBasePrice.valid_to.is_(None)
+                )
+                .values(valid_to=self.now)
+                .execution_options(synchronize_session=False)
+            )
+
+        if prices.empty:
+            return 0, unchanged
+
+        prices = add_base_price_columns(prices)
+        prices['valid_from'] = self.now
+        prices['valid_to'] = None
+
+        self.db.execute(
+            insert(ProductBasePrice),
+            _records(prices, ['product_id', 'lc', 'c0', 'cmin', 'oh_factor',
+                              'min_profit_margin', 'valid_from', 'valid_to'])
+        )
+        refresh_price_thresholds(self.db, product_ids=prices['product_id'].astype(int).tolist())
+        return len(prices), unchanged
+
+    def _diff_report(self, diff: pd.DataFrame) -> Dict:
+        """
+        Summarize a base price diff.
+
+        'missing' counts products that have an open base price but are not
+        in the uploaded rows.
+        """
+        open_products = self.db.execute(
+            select(func.count(func.distinct(ProductBasePrice.product_id)))
+            .where(ProductBasePrice.valid_to.is_(None))
+        ).scalar()
+        matched = int(diff['current_lc'].notna().sum())
+
+        return {
+            "rows": len(diff),
+            "changed": int((diff['status'] == 'changed').sum()),
+            "unchanged": int((diff['status'] == 'unchanged').sum()),
+            "new": int((diff['status'] == 'new').sum()),
+            "missing": open_products - matched,
+        }
+
+    def _open_base_prices(self, product_ids: List[int]) -> pd.DataFrame:
+        """Load the open (valid_to IS NULL) base price of each product."""
+        rows = self.db.execute(
+            select(ProductBasePrice.product_id, ProductBasePrice.c0, ProductBasePrice.cmin)
+            .where(
+                ProductBasePrice.product_id.in_(product_ids),
+                ProductBasePrice.valid_to.is_(None)
+            )
+            .order_by(ProductBasePrice.product_id, ProductBasePrice.valid_from.desc())
+        ).all()
+
+        base = pd.DataFrame(rows, columns=['product_id', 'c0', 'cmin'])
+        return base.drop_duplicates('product_id', keep='first')
+
+    def _replace_customer_prices(self, prices: pd.DataFrame) -> int:
+        """Close open customer prices of the given pairs and insert new ones."""
+        if prices.empty:
+            return 0
+
+        pairs = list(prices[['product_id', 'customer_id']].drop_duplicates().itertuples(index=False, name=None))
+        self.db.execute(
+            update(CustomerProductPrice)
+            .where(
+                tuple_(CustomerProductPrice.product_id, CustomerProductPrice.customer_id).in_(pairs),
+                CustomerProductPrice.valid_to.is_(None)
+            )
+            .values(valid_to=self.now, is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+
+        superseded = prices.duplicated(['product_id', 'customer_id'], keep='last')
+        prices = add_customer_price_columns(prices)
+        prices['valid_from'] = self.now
+        prices['valid_to'] = np.where(superseded, self.now, None)
+        prices['is_active'] = ~superseded
+
+        self.db.execute(
+            insert(CustomerProductPrice),
+            _records(prices, ['product_id', 'customer_id', 'strategic_cmin', 'discount_invoice',
+                              'discount_marketing', 'discount_yearend', 'total_discounts', 'cp',
+                              'realized_price', 'coverage_vs_c0', 'coverage_vs_cmin',
+                              'valid_from', 'valid_to', 'is_active'])
+        )
+        return len(prices)
+
+    # ------------------------------------------------------------------
+    # Public entry points
+    # ------------------------------------------------------------------
+
+    def _industry_ids(self, industry_names: pd.Series) -> pd.Series:
+        """Resolve industry names (Slovenian first, then Croatian) to ids."""
+        industries = self.db.execute(select(Industry.id, Industry.name_sl, Industry.name_hr)).all()
+        by_name_sl = {name_sl: industry_id for industry_id, name_sl, _ in industries}
+        by_name_hr = {name_hr: industry_id for industry_id, _, name_hr in industries}
+        return industry_names.map(by_name_sl).fillna(industry_names.map(by_name_hr))
+
+    def product_row_errors(self, izdelki_df: pd.DataFrame) -> Dict:
+        """
+        Validate active rows of the products sheet.
+
+        Returns:
+            Dictionary mapping row index to an error message
+        """
+        products = _active_rows(izdelki_df)
+        errors = {}
+
+        unknown = self._industry_ids(products['industrija']).isna()
+        for idx in products.index[unknown]:
+            errors[idx] = f"Unknown industry: {products.at[idx, 'industrija']}"
+
+        bad_lc = pd.to_numeric(products['lc'], errors='coerce').isna()
+        for idx in products.index[bad_lc & ~unknown]:
+            errors[idx] = f"Invalid LC value: {products.at[idx, 'lc']}"
+
+        return errors
+
+    def customer_price_row_errors(self, cene_kupci_df: pd.DataFrame) -> Dict:
+        """
+        Validate active rows of the customer prices sheet.
+
+        Returns:
+            Dictionary mapping row index to an error message
+        """
+        prices = _active_rows(cene_kupci_df)
+        errors = {}
+
+        numeric_cols = ['strategic_cmin', 'popust_faktura', 'popust_marketing', 'popust_letni']
+        for col in numeric_cols:
+            bad = pd.to_numeric(prices[col], errors='coerce').isna()
+            for idx in prices.index[bad]:
+                errors.setdefault(idx, f"Invalid {col} value: {prices.at[idx, col]}")
+
+        return errors
+
+    def import_products_sheet(self, izdelki_df: pd.DataFrame) -> Dict:
+        """
+        Import the 'Izdelki' sheet: create missing products and replace base prices.
+
+        Returns:
+            Dictionary with products_created and base_prices_created counters
+        """
+        products = _active_rows(izdelki_df).copy()
+        products['code'] = products['šifra'].astype(str).str.strip()
+        products['industry_id'] = self._industry_ids(products['industrija'])
+
+        unknown = products.loc[products['industry_id'].isna(), 'industrija']
+        if not unknown.empty:
+            raise ValueError(f"Unknown industry: {unknown.iloc[0]}")
+
+        product_ids = self._product_ids_by_code()
+
+        new_products = products[~products['code'].isin(product_ids.keys())].drop_duplicates('code', keep='first')
+        new_products = new_products.assign(
+            name_sl=new_products['naziv'],
+            name_hr=new_products['naziv'],
+            unit=new_products['enota'],
+            industry_id=new_products['industry_id'].astype(int),
+            is_active=True
+        )
+        product_ids.update(self._insert_products(new_products))
+
+        products['product_id'] = products['code'].map(product_ids)
+        products['lc'] = products['lc'].astype(float)
+        base_prices_created, base_prices_unchanged = self._replace_base_prices(products[['product_id', 'lc']])
+
+        return {
+            "products_created": len(new_products),
+            "base_prices_created": base_prices_created,
+            "base_prices_unchanged": base_prices_unchanged,
+        }
+
+    def diff_products_sheet(self, izdelki_df: pd.DataFrame) -> Dict:
+        """
+        Dry run of import_products_sheet: report how the LC values of the
+        'Izdelki' sheet compare with current base prices, without writing.
+
+        Returns:
+            Dictionary with rows, changed, unchanged, new and missing counts
+        """
+        products = _active_rows(izdelki_df).copy()
+        products['code'] = products['šifra'].astype(str).str.strip()
+        products['product_id'] = products['code'].map(self._product_ids_by_code())
+        products['lc'] = pd.to_numeric(products['lc'], errors='coerce')
+        products = products.dropna(subset=['lc'])
+
+        # Unknown products have no id yet, so rows are matched by code
+        return self._diff_report(self._diff_base_prices(products[['code', 'product_id', 'lc']], key='code'))
+
+    def import_customer_prices_sheet(self, cene_kupci_df: pd.DataFrame) -> Dict:
+        """
+        Import the 'Cene_Kupci' sheet against the currently open base prices.
+        Rows for unknown products or products without a base price are skipped.
+
+        Returns:
+            Dictionary with the customer_prices_created counter
+        """
+        product_ids = self._product_ids_by_code()
+
+        customer_prices = _active_rows(cene_kupci_df).copy()
+        customer_prices['product_id'] = customer_prices['šifra'].astype(str).str.strip().map(product_ids)
+        customer_prices = customer_prices.dropna(subset=['product_id'])
+        customer_prices['product_id'] = customer_prices['product_id'].astype(int)
+
+        customer_prices = customer_prices.rename(columns={
+            'kupec_id': 'customer_id',
+            'popust_faktura': 'discount_invoice',
+            'popust_marketing': 'discount_marketing',
+            'popust_letni': 'discount_yearend',
+        })
+        for col in ['strategic_cmin', 'discount_invoice', 'discount_marketing', 'discount_yearend']:
+            customer_prices[col] = customer_prices[col].astype(float)
+
+        base = self._open_base_prices(customer_prices['product_id'].unique().tolist())
+        customer_prices = customer_prices.merge(base, on='product_id', how='inner', sort=False)
+
+        return {
+            "customer_prices_created": self._replace_customer_prices(customer_prices),
+        }
+
+    def import_workbook(self, izdelki_df: pd.DataFrame, cene_kupci_df: pd.DataFrame) -> Dict:
+        """
+        Import the full pricing workbook ('Izdelki' and 'Cene_Kupci' sheets).
+
+        Args:
+            izdelki_df: Products sheet with šifra, naziv, enota, industrija, lc, aktiven
+            cene_kupci_df: Customer prices sheet with šifra, kupec_id, strategic_cmin,
+                popust_faktura, popust_marketing, popust_letni, aktiven
+
+        Returns:
+            Dictionary with products_created, base_prices_created and
+            customer_prices_created counters
+        """
+        return {
+            **self.import_products_sheet(izdelki_df),
+            **self.import_customer_prices_sheet(cene_kupci_df),
+        }
+
+    def _imported_products_industry(self) -> Industry:
+        """Get or create the industry used for simple price list uploads."""
+        industry = self.db.query(Industry).filter(Industry.code == IMPORTED_INDUSTRY_CODE).first()
+        if not industry:
+            industry = Industry(
+                code=IMPORTED_INDUSTRY_CODE,
+                name_sl='Uvoženi proizvodi',
+                name_hr='Uvezeni proizvodi',
+                icon='[Upload]',
+                is_active=True
+            )
+            self.db.add(industry)
+            self.db.flush()
+        return industry
+
+    def import_simple_price_list(self, df: pd.DataFrame, code_col, name_col, lc_col) -> Dict:
+        """
+        Import a simple 3-column price list (article code, article name, LC).
+
+        Rows without a code, a name or a positive LC are skipped. New products
+        are created in the 'imported-products' industry, existing ones are renamed
+        and reactivated.
+
+        Returns:
+            Dictionary with products_created, products_updated and
+            base_prices_created counters
+        """
+        rows = _simple_rows(df, code_col, name_col, lc_col)
+        rows = rows[rows['valid']]
+
+        if rows.empty:
+            return {"products_created": 0, "products_updated": 0, "base_prices_created": 0,
+                    "base_prices_unchanged": 0}
+
+        industry = self._imported_products_industry()
+        product_ids = self._product_ids_by_code()
+
+        # Later rows overwrite names of earlier ones, so the last name wins
+        latest_names = rows.drop_duplicates('code', keep='last')
+        is_new = ~latest_names['code'].isin(product_ids.keys())
+
+        new_products = latest_names[is_new].assign(
+            name_sl=lambda d: d['name'],
+            name_hr=lambda d: d['name'],
+            unit='kg',
+            industry_id=industry.id,
+            is_active=True
+        )
+        product_ids.update(self._insert_products(new_products))
+
+        existing_products = latest_names[~is_new]
+        if not existing_products.empty:
+            self.db.execute(
+                update(Product),
+                [
+                    {"id": product_ids[code], "name_sl": name, "name_hr": name, "is_active": True}
+                    for code, name in zip(existing_products['code'], existing_products['name'])
+                ]
+            )
+
+        rows['product_id'] = rows['code'].map(product_ids)
+        base_prices_created, base_prices_unchanged = self._replace_base_prices(rows[['product_id', 'lc']])
+
+        return {
+            "products_created": len(new_products),
+            "products_updated": len(rows) - len(new_products),
+            "base_prices_created": base_prices_created,
+            "base_prices_unchanged": base_prices_unchanged,
+        }
+
+    def diff_simple_price_list(self, df: pd.DataFrame, code_col, name_col, lc_col) -> Dict:
+        """
+        Dry run of import_simple_price_list: report how the uploaded LC values
+        compare with current base prices, without writing.
+
+        Returns:
+            Dictionary with rows, changed, unchanged, new and missing counts
+        """
+        rows = _simple_rows(df, code_col, name_col, lc_col)
+        rows = rows[rows['valid']].copy()
+
+        rows['product_id'] = rows['code'].map(self._product_ids_by_code())
+        return self._diff_report(self._diff_base_prices(rows[['code', 'product_id', 'lc']], key='code'))
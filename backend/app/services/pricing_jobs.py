@@ -0,0 +1,343 @@
+"""
+Background pricing upload jobs.
+
+An upload is stored in an UploadHistory row, file included, so that any
+worker on any host can run or resume it. A worker then parses the file and
+applies it in chunks; each chunk's writes and the job progress are
+committed in the same transaction, so after a restart the job resumes from
+the last committed chunk. Every worker rescans for jobs
+left behind by dead workers every PRICING_UPLOAD_STALE_SECONDS.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.upload_history import UploadHistory
+from app.services import pricing_catalog
+from app.services.job_workers import WORKER_ID, is_dead_local_worker
+from app.services.pricing_import import (
+    PricingImporter,
+    detect_simple_price_list_columns,
+    simple_price_list_row_errors,
+)
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK_JOB = "pricing_workbook"
+SIMPLE_JOB = "pricing_simple"
+
+REQUIRED_IZDELKI_COLUMNS = ['šifra', 'naziv', 'enota', 'industrija', 'lc', 'aktiven']
+REQUIRED_CENE_COLUMNS = ['šifra', 'kupec_id', 'kupec_naziv', 'kupec_tip', 'strategic_cmin',
+                         'popust_faktura', 'popust_marketing', 'popust_letni', 'aktiven']
+
+# Keep the errors JSON bounded for files with many bad rows
+MAX_RECORDED_ERRORS = 1000
+
+
+def enqueue_pricing_upload(db: Session, filename: str, contents: bytes, data_type: str) -> UploadHistory:
+    """
+    Create a queued job for an uploaded file.
+
+    Args:
+        db: Database session
+        filename: Original file name
+        contents: File bytes
+        data_type: WORKBOOK_JOB or SIMPLE_JOB
+
+    Returns:
+        The queued UploadHistory row
+    """
+    job = UploadHistory(
+        filename=filename,
+        data_type=data_type,
+        status="queued",
+        file_contents=contents,
+        rows_processed=0,
+        rows_uploaded=0,
+        rows_failed=0,
+        errors=[],
+        result={}
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _claim_job(db: Session, job_id: int, dead_worker: Optional[str] = None) -> bool:
+    """
+    Atomically take ownership of a queued job, or of a processing job whose
+    worker stopped sending heartbeats or is dead_worker.
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.PRICING_UPLOAD_STALE_SECONDS)
+
+    orphaned = or_(UploadHistory.heartbeat_at == None, UploadHistory.heartbeat_at < stale_before)
+    if dead_worker is not None:
+        orphaned = or_(orphaned, UploadHistory.worker_id == dead_worker)
+
+    result = db.execute(
+        update(UploadHistory)
+        .where(
+            UploadHistory.id == job_id,
+            or_(
+                UploadHistory.status == "queued",
+                and_(UploadHistory.status == "processing", orphaned)
+            )
+        )
+        .values(status="processing", worker_id=WORKER_ID, heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _load_segments(job: UploadHistory) -> List[Tuple[str, pd.DataFrame, Tuple]]:
+    """
+    Parse the stored file into ordered segments of rows.
+
+    Returns:
+        List of (segment name, rows, detected columns)
+    """
+    if job.data_type == WORKBOOK_JOB:
+        xl = pd.ExcelFile(BytesIO(job.file_contents))
+        for sheet in ['Izdelki', 'Cene_Kupci']:
+            if sheet not in xl.sheet_names:
+                raise ValueError(f"Missing required sheet: '{sheet}'")
+
+        izdelki_df = xl.parse('Izdelki')
+        cene_kupci_df = xl.parse('Cene_Kupci')
+
+        missing_izdelki = set(REQUIRED_IZDELKI_COLUMNS) - set(izdelki_df.columns)
+        missing_cene = set(REQUIRED_CENE_COLUMNS) - set(cene_kupci_df.columns)
+        if missing_izdelki:
+            raise ValueError(f"Missing columns in Izdelki: {missing_izdelki}")
+        if missing_cene:
+            raise ValueError(f"Missing columns in Cene_Kupci: {missing_cene}")
+
+        # Products must be applied before the customer prices that reference them
+        return [('Izdelki', izdelki_df, ()), ('Cene_Kupci', cene_kupci_df, ())]
+
+    if job.data_type == SIMPLE_JOB:
+        df = pd.read_excel(BytesIO(job.file_contents), sheet_name=0)
+        columns = detect_simple_price_list_columns(df.columns.tolist())
+        if not all(columns):
+            raise ValueError(f"Could not identify required columns. Found: {df.columns.tolist()}")
+        return [('simple', df, columns)]
+
+    raise ValueError(f"Unknown upload type: {job.data_type}")
+
+
+def _apply_chunk(db: Session, segment: str, chunk: pd.DataFrame, columns: Tuple) -> Tuple[Dict, Dict]:
+    """
+    Validate and import one chunk of rows (without committing).
+
+    Returns:
+        Tuple of (counters, row errors keyed by row index)
+    """
+    importer = PricingImporter(db)
+
+    if segment == 'Izdelki':
+        errors = importer.product_row_errors(chunk)
+        counters = importer.import_products_sheet(chunk.drop(index=list(errors)))
+    elif segment == 'Cene_Kupci':
+        errors = importer.customer_price_row_errors(chunk)
+        counters = importer.import_customer_prices_sheet(chunk.drop(index=list(errors)))
+    else:
+        errors = simple_price_list_row_errors(chunk, *columns)
+        counters = importer.import_simple_price_list(chunk, *columns)
+
+    return counters, errors
+
+
+def _fail(db: Session, job: UploadHistory, message: str) -> None:
+    """Mark a job failed; committed chunks stay applied and the job can be resumed."""
+    job.status = "failed"
+    job.errors = (job.errors or []) + [message]
+    job.heartbeat_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def _still_owned(db: Session, job_id: int) -> bool:
+    """
+    Refresh the heartbeat of a job this worker is running, in the current
+    transaction. False if another worker took the job over meanwhile; the
+    caller must then roll back instead of committing.
+    """
+    return db.execute(
+        update(UploadHistory)
+        .where(
+            UploadHistory.id == job_id,
+            UploadHistory.status == "processing",
+            UploadHistory.worker_id == WORKER_ID
+        )
+        .values(heartbeat_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def _keep_alive(job_id: int, stop: threading.Event) -> None:
+    """Refresh a job's heartbeat until stop is set, so that a slow chunk does not make the job look abandoned."""
+    db = SessionLocal()
+    try:
+        while not stop.wait(settings.PRICING_UPLOAD_STALE_SECONDS / 5):
+            owned = _still_owned(db, job_id)
+            db.commit()
+            if not owned:
+                return
+    except Exception:
+        logger.exception("Could not refresh the heartbeat of pricing upload job %s", job_id)
+    finally:
+        db.close()
+
+
+def run_pricing_upload_job(job_id: int, dead_worker: Optional[str] = None) -> None:
+    """
+    Run (or resume) a pricing upload job until it completes or fails.
+    Does nothing if another worker owns the job.
+
+    Args:
+        job_id: UploadHistory id
+        dead_worker: Worker known to be dead; its processing job is taken over
+            without waiting for the heartbeat to go stale
+    """
+    db = SessionLocal()
+    stop_heartbeat = threading.Event()
+    try:
+        if not _claim_job(db, job_id, dead_worker):
+            return
+
+        threading.Thread(
+            target=_keep_alive, args=(job_id, stop_heartbeat), name=f"pricing-upload-{job_id}-heartbeat", daemon=True
+        ).start()
+        job = db.get(UploadHistory, job_id)
+
+        try:
+            segments = _load_segments(job)
+        except Exception as e:
+            _fail(db, job, f"Error processing Excel file: {str(e)}")
+            return
+
+        job.rows_total = sum(len(rows) for _, rows, _ in segments)
+        db.commit()
+
+        chunk_size = settings.PRICING_UPLOAD_CHUNK_SIZE
+        segment_start = 0
+
+        for segment, rows, columns in segments:
+            segment_end = segment_start + len(rows)
+            resume_at = max((job.rows_processed or 0) - segment_start, 0)
+
+            for chunk_start in range(resume_at, len(rows), chunk_size):
+                chunk = rows.iloc[chunk_start:chunk_start + chunk_size]
+
+                try:
+                    counters, errors = _apply_chunk(db, segment, chunk, columns)
+                except Exception as e:
+                    db.rollback()
+                    first_row = chunk.index[0] + 2
+                    logger.exception("Pricing upload job %s failed in %s rows %s-%s",
+                                     job_id, segment, first_row, first_row + len(chunk) - 1)
+                    _fail(db, job, f"{segment} rows {first_row}-{first_row + len(chunk) - 1}: {str(e)}")
+                    return
+
+                # Progress is committed together with the chunk's writes
+                result = dict(job.result or {})
+                for key, value in counters.items():
+                    result[key] = result.get(key, 0) + value
+
+                row_errors = [f"{segment} row {idx + 2}: {message}" for idx, message in errors.items()]
+                job.errors = ((job.errors or []) + row_errors)[:MAX_RECORDED_ERRORS]
+                job.result = result
+                job.rows_failed = (job.rows_failed or 0) + len(errors)
+                job.rows_uploaded = (job.rows_uploaded or 0) + len(chunk) - len(errors)
+                job.rows_processed = segment_start + chunk_start + len(chunk)
+                if not _still_owned(db, job_id):
+                    # Taken over by another worker: its run applies this chunk
+                    db.rollback()
+                    return
+                db.commit()
+
+                pricing_catalog.invalidate_products_with_prices()
+
+            segment_start = segment_end
+
+        job.status = "completed"
+        job.completed_at = datetime.now(timezone.utc)
+        job.file_contents = None
+        if not _still_owned(db, job_id):
+            db.rollback()
+            return
+        db.commit()
+
+    finally:
+        stop_heartbeat.set()
+        db.close()
+
+
+def run_unowned_pricing_upload_jobs() -> None:
+    """
+    Run, one by one, queued jobs and processing jobs whose worker is gone:
+    dead on this host, or silent for PRICING_UPLOAD_STALE_SECONDS. Jobs of
+    live workers are left to them.
+    """
+    db = SessionLocal()
+    try:
+        jobs = db.query(UploadHistory.id, UploadHistory.status, UploadHistory.worker_id).filter(
+            UploadHistory.data_type.in_([WORKBOOK_JOB, SIMPLE_JOB]),
+            UploadHistory.status.in_(["queued", "processing"])
+        ).order_by(UploadHistory.id).all()
+    finally:
+        db.close()
+
+    for job_id, status, worker_id in jobs:
+        dead = status == "processing" and is_dead_local_worker(worker_id)
+        run_pricing_upload_job(job_id, worker_id if dead else None)
+
+
+def resume_pricing_upload_jobs() -> None:
+    """
+    Pick up jobs left queued or interrupted by a restart, then keep
+    rescanning every PRICING_UPLOAD_STALE_SECONDS for jobs of workers that
+    died meanwhile. Runs in a background thread.
+    """
+    def run():
+        while True:
+            try:
+                run_unowned_pricing_upload_jobs()
+            except Exception:
+                logger.exception("Could not resume pricing upload jobs")
+            time.sleep(settings.PRICING_UPLOAD_STALE_SECONDS)
+
+    threading.Thread(target=run, name="pricing-upload-resume", daemon=True).start()
+
+
+def job_status(job: UploadHistory) -> Dict:
+    """Serialize a job for the status endpoint."""
+    rows_total = job.rows_total or 0
+    rows_processed = job.rows_processed or 0
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "data_type": job.data_type,
+        "status": job.status,
+        "rows_total": job.rows_total,
+        "rows_processed": rows_processed,
+        "progress": round(rows_processed / rows_total, 4) if rows_total else 0.0,
+        "rows_uploaded": job.rows_uploaded,
+        "rows_failed": job.rows_failed,
+        "result": job.result or {},
+        "errors": job.errors or [],
+        "created_at": job.created_at,
+        "completed_at": job.completed_at,
+    }
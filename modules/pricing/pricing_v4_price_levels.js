@@ -1686,10 +1686,29 @@ CP - Prodajna cijena, povećana za sva (potencialna) odobrenja kupcu
                 throw new Error(errorData.detail || 'Upload failed');
             }
 
-            const result = await response.json();
-            console.log('Upload result:', result);
+            // The upload runs as a background job: poll it until it finishes
+            let job = await response.json();
+            console.log('Upload job:', job);
 
-            statusDiv.innerHTML = `<div class="success">✓ Success! Created ${result.products_created} products, updated ${result.products_updated}, added ${result.base_prices_created} prices.</div>`;
+            while (job.status === 'queued' || job.status === 'processing') {
+                statusDiv.innerHTML = `<div class="processing">⏳ Uploading to database... ${Math.round(job.progress * 100)}%</div>`;
+                await new Promise(resolve => setTimeout(resolve, 1000));
+
+                const jobResponse = await fetch(`${apiUrl}/pricing/upload-jobs/${job.job_id}`);
+                if (!jobResponse.ok) {
+                    throw new Error('Could not read upload job status');
+                }
+                job = await jobResponse.json();
+            }
+
+            console.log('Upload result:', job);
+
+            if (job.status !== 'completed') {
+                throw new Error(job.errors[job.errors.length - 1] || 'Upload failed');
+            }
+
+            const result = job.result;
+            statusDiv.innerHTML = `<div class="success">✓ Success! Created ${result.products_created || 0} products, updated ${result.products_updated || 0}, added ${result.base_prices_created || 0} prices.</div>`;
 
             // Reload products from database
             setTimeout(async () => {